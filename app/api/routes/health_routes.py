@@ -1,8 +1,30 @@
+from typing import Any, Dict
 from fastapi import APIRouter
 from app.api.schemas import HealthResponse
+from app.core.vector_store import vector_store
+from app.retrieval.company_cache import company_cache
+from app.retrieval.financial_cube import financial_cube_cache
+from app.retrieval.query_classifier import query_classifier
+from app.retrieval.context_builder import context_builder
+from app.llm.llm_service import llm_service
+from app.llm.rate_limiter import groq_rate_limiter
 
 router = APIRouter()
 
 @router.get("/", response_model=HealthResponse)
 async def health_check():
     return HealthResponse(status="ok", version="1.0.0")
+
+@router.get("/stats")
+async def component_stats() -> Dict[str, Any]:
+    """Runtime counters for caches, clients and pools (for capacity tuning)."""
+    return {
+        "vector_store": vector_store.get_stats(),
+        "vector_partitions": await vector_store.get_partition_stats(),
+        "company_cache": company_cache.get_stats(),
+        "financial_cube_cache": financial_cube_cache.get_stats(),
+        "query_classifier": query_classifier.get_stats(),
+        "context_builder": context_builder.get_stats(),
+        "answer_cache": llm_service.get_cache_stats(),
+        "groq_rate_limiter": groq_rate_limiter.get_stats()
+    }
@@ -2,6 +2,7 @@ from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy.ext.asyncio import AsyncSession
 from app.core.database import get_db
 from app.ingestion.ingestion_service import IngestionService
+from app.core.vector_store import vector_store
 from app.api.schemas import IngestRequest, IngestResponse
 
 router = APIRouter()
@@ -14,7 +15,7 @@ async def ingest_company(request: IngestRequest, db: AsyncSession = Depends(get_
     """
     service = IngestionService(db)
     try:
-        result = await service.ingest_company(request.ticker)
+        result = await service.ingest_company(request.ticker, rebuild_vectors=request.rebuild_vectors)
         
         if result.get("status") == "error":
             raise HTTPException(status_code=400, detail=result.get("message"))
@@ -26,6 +27,9 @@ async def ingest_company(request: IngestRequest, db: AsyncSession = Depends(get_
             company=result.get("company", "Unknown"),
             statements=result.get("statements", 0),
             chunks=result.get("chunks", 0),
+            chunks_added=result.get("chunks_added", 0),
+            chunks_skipped=result.get("chunks_skipped", 0),
+            chunks_removed=result.get("chunks_removed", 0),
             calculated_ratios=result.get("calculated_ratios", 0),  # NEW
             validation=result.get("validation"),  # NEW
             message="Successfully ingested financial data"
@@ -34,3 +38,12 @@ async def ingest_company(request: IngestRequest, db: AsyncSession = Depends(get_
         raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+
+@router.delete("/company/{ticker}/vectors")
+async def drop_company_vectors(ticker: str):
+    """
+    Drop a company's vector partition. Other companies are unaffected;
+    re-ingest the ticker to rebuild it.
+    """
+    dropped = await vector_store.drop_partition(ticker)
+    return {"status": "success", "ticker": ticker, "chunks_dropped": dropped}
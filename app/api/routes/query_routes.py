@@ -1,11 +1,18 @@
+import json
+import time
+from typing import Any, AsyncIterator, Dict, List
 from fastapi import APIRouter, Depends, HTTPException
+from fastapi.responses import StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
+from app.core.config import get_settings
 from app.core.database import get_db
+from app.core.deadline import Deadline
 from app.retrieval.hybrid_retriever import HybridRetriever
 from app.llm.llm_service import llm_service
 from app.api.schemas import QueryRequest, QueryResponse
 
 router = APIRouter()
+settings = get_settings()
 
 @router.post("/", response_model=QueryResponse)
 async def query_financials(request: QueryRequest, db: AsyncSession = Depends(get_db)):
@@ -15,9 +22,12 @@ async def query_financials(request: QueryRequest, db: AsyncSession = Depends(get
     """
     print(f"DEBUG: [QueryRoute] Received request: {request}", flush=True)
     try:
+        # Latency budget shared by every stage below
+        deadline = _request_deadline(request)
+
         # 1. Retrieve Context
         retriever = HybridRetriever(db)
-        retrieval_result = await retriever.retrieve(request.ticker, request.query)
+        retrieval_result = await retriever.retrieve(request.ticker, request.query, deadline=deadline)
         
         context_str = retrieval_result["context_str"]
         query_type = retrieval_result["query_type"]
@@ -25,20 +35,88 @@ async def query_financials(request: QueryRequest, db: AsyncSession = Depends(get
         
         # 2. Generate Answer
         # Use singleton instance
-        answer = await llm_service.generate_answer(request.query, context_str)
+        generate_started = time.perf_counter()
+        answer = await llm_service.generate_answer(request.query, context_str, deadline=deadline)
+        timings = dict(retrieval_result["timings"])
+        timings["generate_ms"] = (time.perf_counter() - generate_started) * 1000
+        timings["elapsed_ms"] = deadline.elapsed_ms()
+        timings["degraded"] = list(deadline.degraded)
         
         # 3. Format Response
         # Merge sources for citation
-        sources = []
-        sources.extend(retrieval_result["sql_results"])
-        sources.extend([{"text": r["text"], "source": "vector"} for r in retrieval_result["vector_results"]])
+        sources = _merge_sources(retrieval_result)
         
         return QueryResponse(
             answer=answer,
             query_type=query_type,
             sources=sources,
-            confidence="high" if sources else "low"
+            confidence="high" if sources else "low",
+            timings=timings
         )
         
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.post("/stream")
+async def stream_query(request: QueryRequest, db: AsyncSession = Depends(get_db)):
+    """
+    Streaming variant of the query endpoint (Server-Sent Events).
+
+    Retrieval runs before the response starts. The stream then sends a
+    `metadata` event (query type, sources, retrieval timings), one `token`
+    event per answer fragment as the LLM produces it, and a final `done`
+    event with the complete timings.
+    """
+    try:
+        deadline = _request_deadline(request)
+        retriever = HybridRetriever(db)
+        retrieval_result = await retriever.retrieve(request.ticker, request.query, deadline=deadline)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+    sources = _merge_sources(retrieval_result)
+    timings = dict(retrieval_result["timings"])
+
+    async def events() -> AsyncIterator[str]:
+        yield _sse("metadata", {
+            "query_type": retrieval_result["query_type"],
+            "sources": sources,
+            "confidence": "high" if sources else "low",
+            "timings": timings
+        })
+
+        generate_started = time.perf_counter()
+        try:
+            async for fragment in llm_service.stream_answer(request.query, retrieval_result["context_str"], deadline=deadline):
+                yield _sse("token", {"text": fragment})
+        except Exception as e:
+            yield _sse("error", {"detail": str(e)})
+            return
+
+        timings["generate_ms"] = (time.perf_counter() - generate_started) * 1000
+        timings["elapsed_ms"] = deadline.elapsed_ms()
+        timings["degraded"] = list(deadline.degraded)
+        yield _sse("done", {"timings": timings})
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+def _request_deadline(request: QueryRequest) -> Deadline:
+    return Deadline.after_ms(min(request.deadline_ms or settings.QUERY_DEADLINE_MS, settings.QUERY_DEADLINE_MAX_MS))
+
+
+def _merge_sources(retrieval_result: Dict[str, Any]) -> List[Dict[str, Any]]:
+    sources = []
+    sources.extend(retrieval_result["sql_results"])
+    sources.extend([{"text": r["text"], "source": "vector"} for r in retrieval_result["vector_results"]])
+    return sources
+
+
+def _sse(event: str, data: Dict[str, Any]) -> str:
+    """One Server-Sent Events frame (JSON data keeps newlines inside a single data line)"""
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
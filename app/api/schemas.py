@@ -1,15 +1,19 @@
 from typing import List, Optional, Dict, Any
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 
 # Ingestion Schemas
 class IngestRequest(BaseModel):
     ticker: str
+    rebuild_vectors: bool = False  # Drop and re-embed this ticker's vector partition
 
 class IngestResponse(BaseModel):
     status: str
     company: str
     statements: int
     chunks: int
+    chunks_added: Optional[int] = 0  # Chunks newly embedded
+    chunks_skipped: Optional[int] = 0  # Chunks already stored (unchanged)
+    chunks_removed: Optional[int] = 0  # Stale chunks deleted for this ticker
     calculated_ratios: Optional[int] = 0  # NEW: Number of ratios calculated
     validation: Optional[Dict[str, Any]] = None  # NEW: Validation results
     message: Optional[str] = None
@@ -18,6 +22,7 @@ class IngestResponse(BaseModel):
 class QueryRequest(BaseModel):
     query: str
     ticker: str
+    deadline_ms: Optional[int] = Field(None, gt=0)  # Latency budget (defaults to QUERY_DEADLINE_MS, capped at QUERY_DEADLINE_MAX_MS)
 
 class SourceItem(BaseModel):
     source: Optional[str] = "unknown"
@@ -32,6 +37,7 @@ class QueryResponse(BaseModel):
     query_type: str
     confidence: str = "high" # Placeholder for now
     sources: List[Dict[str, Any]]
+    timings: Optional[Dict[str, Any]] = None  # Per-stage latency in ms (classify, sql, vector, context, generate, total) and context token report
 
 # Health Schema
 class HealthResponse(BaseModel):
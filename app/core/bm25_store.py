@@ -0,0 +1,366 @@
+import asyncio
+import hashlib
+import json
+import logging
+import math
+import os
+import re
+import threading
+from array import array
+from typing import Any, Dict, List, Optional, Set
+
+import numpy as np
+
+from app.core.config import get_settings
+
+settings = get_settings()
+logger = logging.getLogger(__name__)
+
+_TOKEN = re.compile(r"[a-z0-9]+")
+_STOP_WORDS = {
+    "a", "an", "and", "are", "as", "at", "be", "by", "for", "from", "how", "in", "is", "it",
+    "me", "of", "on", "or", "show", "tell", "the", "to", "was", "were", "what", "when",
+    "where", "which", "who", "with",
+}
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercase alphanumeric terms without stop words"""
+    return [t for t in _TOKEN.findall(text.lower()) if t not in _STOP_WORDS]
+
+
+class _LexicalPartition:
+    """One ticker's documents and an incrementally grown inverted index"""
+
+    def __init__(self, ticker: str):
+        self.ticker = ticker
+        self.ids: List[str] = []
+        self.texts: List[str] = []
+        self.metadatas: List[Dict[str, Any]] = []
+        self.row_of: Dict[str, int] = {}
+        self.doc_len = array("I")
+        # term -> (rows, term frequencies), appended as documents arrive
+        self.postings: Dict[str, tuple] = {}
+        self.total_len = 0
+        self.dirty = False  # Postings changed since they were last saved
+
+    def __len__(self):
+        return len(self.ids)
+
+    def add(self, chunk_id: str, text: str, metadata: Dict[str, Any]):
+        row = len(self.ids)
+        self.row_of[chunk_id] = row
+        self.ids.append(chunk_id)
+        self.texts.append(text)
+        self.metadatas.append(metadata)
+
+        terms = tokenize(text)
+        self.doc_len.append(len(terms))
+        self.total_len += len(terms)
+        counts: Dict[str, int] = {}
+        for term in terms:
+            counts[term] = counts.get(term, 0) + 1
+        for term, tf in counts.items():
+            rows, tfs = self.postings.setdefault(term, (array("I"), array("H")))
+            rows.append(row)
+            tfs.append(min(tf, 65535))
+
+
+class BM25Index:
+    """
+    In-memory BM25 retriever over the same chunk texts as the vector store.
+
+    Needs no embedding model, so it serves FACTUAL retrieval on low-memory
+    deployments where sentence-transformers is never loaded. Postings are
+    grown incrementally as chunks are ingested. Documents are appended to a
+    per-ticker `.jsonl` as they arrive; the postings are saved once per
+    ingestion (`flush`) as a compact CSR-style `.npz` (terms, offsets, uint32
+    rows, uint16 term frequencies) that records how many documents it
+    covers. A postings file that does not match the documents (crash between
+    the two, or a flush that never ran) is rebuilt from the documents on
+    load. On a read-only or ephemeral disk it runs purely in memory.
+    """
+
+    requires_embeddings = False
+
+    def __init__(self, index_dir: Optional[str] = None, k1: float = 1.2, b: float = 0.75):
+        self.index_dir = index_dir or settings.BM25_INDEX_DIR
+        self.k1 = k1
+        self.b = b
+        self._partitions: Dict[str, _LexicalPartition] = {}
+        self._lock = threading.Lock()
+
+        try:
+            os.makedirs(self.index_dir, exist_ok=True)
+            self.persistent = os.access(self.index_dir, os.W_OK)
+        except OSError:
+            self.persistent = False
+        if not self.persistent:
+            logger.warning(f"BM25 index dir '{self.index_dir}' not writable; using in-memory index")
+
+        # Instrumentation
+        self._queries = 0
+        self._rebuilds = 0
+
+    # ------------------------------------------------------------------ files
+
+    def _paths(self, ticker: str):
+        """Documents and postings files of a ticker, named like NumpyVectorIndex._base ("M&M.NS" != "M_M.NS")"""
+        safe = re.sub(r"[^A-Za-z0-9._-]", "_", ticker)
+        digest = hashlib.sha1(ticker.encode()).hexdigest()[:8]
+        base = os.path.join(self.index_dir, f"{safe}_{digest}")
+        return base + ".bm25.jsonl", base + ".bm25.npz"
+
+    def _partition(self, ticker: str) -> _LexicalPartition:
+        """Load a ticker's partition on first access (must hold the lock)"""
+        partition = self._partitions.get(ticker)
+        if partition is not None:
+            return partition
+
+        partition = _LexicalPartition(ticker)
+        docs_path, postings_path = self._paths(ticker)
+        if self.persistent and os.path.exists(docs_path):
+            records = self._read_docs(docs_path)
+            if not self._load_postings(partition, records, postings_path):
+                if os.path.exists(postings_path):
+                    logger.warning(f"BM25 postings for {ticker} do not match its documents; rebuilding")
+                    self._rebuilds += 1
+                for record in records:
+                    partition.add(record["id"], record["text"], record["metadata"])
+                partition.dirty = True
+
+        self._partitions[ticker] = partition
+        return partition
+
+    @staticmethod
+    def _read_docs(docs_path: str) -> List[Dict]:
+        """Documents in a .jsonl, dropping a line torn by a crash mid-append"""
+        records, offset = [], 0
+        with open(docs_path, "rb") as f:
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break
+                records.append(json.loads(line))
+                offset += len(line)
+        if os.path.getsize(docs_path) > offset:
+            os.truncate(docs_path, offset)
+        return records
+
+    def _load_postings(self, partition: _LexicalPartition, records: List[Dict], postings_path: str) -> bool:
+        """Load saved postings if they cover exactly `records`; False means they must be rebuilt"""
+        if not os.path.exists(postings_path):
+            return False
+        with np.load(postings_path) as data:
+            if "count" not in data.files or int(data["count"]) != len(records):
+                return False
+            terms = str(data["terms"]).split("\n") if data["terms"].size and str(data["terms"]) else []
+            indptr, rows, tfs = data["indptr"], data["rows"], data["tfs"]
+            partition.doc_len = array("I", data["doc_len"].tolist())
+
+        for record in records:
+            partition.row_of[record["id"]] = len(partition.ids)
+            partition.ids.append(record["id"])
+            partition.texts.append(record["text"])
+            partition.metadatas.append(record["metadata"])
+        partition.total_len = int(sum(partition.doc_len))
+        for i, term in enumerate(terms):
+            start, end = int(indptr[i]), int(indptr[i + 1])
+            partition.postings[term] = (array("I", rows[start:end].tolist()), array("H", tfs[start:end].tolist()))
+        return True
+
+    @staticmethod
+    def _write_docs(f, partition: _LexicalPartition, start: int):
+        for row in range(start, len(partition)):
+            f.write(json.dumps({
+                "id": partition.ids[row],
+                "text": partition.texts[row],
+                "metadata": partition.metadatas[row]
+            }) + "\n")
+
+    def _append_docs(self, partition: _LexicalPartition, appended: int):
+        docs_path, _ = self._paths(partition.ticker)
+        with open(docs_path, "a", encoding="utf-8") as f:
+            self._write_docs(f, partition, len(partition) - appended)
+
+    def _rewrite_docs(self, partition: _LexicalPartition):
+        docs_path, _ = self._paths(partition.ticker)
+        with open(docs_path + ".tmp", "w", encoding="utf-8") as f:
+            self._write_docs(f, partition, 0)
+        os.replace(docs_path + ".tmp", docs_path)
+
+    def _save_postings(self, partition: _LexicalPartition):
+        """Replace the postings file with the current in-memory postings"""
+        _, postings_path = self._paths(partition.ticker)
+        terms = list(partition.postings.keys())
+        indptr = np.zeros(len(terms) + 1, dtype=np.int64)
+        for i, term in enumerate(terms):
+            indptr[i + 1] = indptr[i] + len(partition.postings[term][0])
+        rows = np.concatenate([np.frombuffer(partition.postings[t][0], dtype=np.uint32) for t in terms]) if terms else np.empty(0, np.uint32)
+        tfs = np.concatenate([np.frombuffer(partition.postings[t][1], dtype=np.uint16) for t in terms]) if terms else np.empty(0, np.uint16)
+        with open(postings_path + ".tmp", "wb") as f:
+            np.savez_compressed(
+                f,
+                terms=np.array("\n".join(terms)),
+                indptr=indptr,
+                rows=rows,
+                tfs=tfs,
+                doc_len=np.frombuffer(partition.doc_len, dtype=np.uint32),
+                count=np.array(len(partition), dtype=np.int64)
+            )
+        os.replace(postings_path + ".tmp", postings_path)
+        partition.dirty = False
+
+    # ------------------------------------------------------------- sync core
+
+    def _existing_sync(self, ticker: str, ids: List[str]) -> Set[str]:
+        with self._lock:
+            partition = self._partition(ticker)
+            return {chunk_id for chunk_id in ids if chunk_id in partition.row_of}
+
+    def _add_sync(self, ticker: str, ids, texts, metadatas):
+        with self._lock:
+            partition = self._partition(ticker)
+            added = 0
+            for chunk_id, text, metadata in zip(ids, texts, metadatas):
+                if chunk_id in partition.row_of:
+                    continue
+                partition.add(chunk_id, text, metadata)
+                added += 1
+            if added:
+                partition.dirty = True
+                if self.persistent:
+                    # Postings are saved once per ingestion by flush()
+                    self._append_docs(partition, added)
+
+    def _flush_sync(self, ticker: str):
+        with self._lock:
+            partition = self._partitions.get(ticker)
+            if partition is not None and partition.dirty and self.persistent:
+                self._save_postings(partition)
+
+    def _delete_stale_sync(self, ticker: str, keep_ids: Set[str]) -> int:
+        with self._lock:
+            old = self._partition(ticker)
+            keep_rows = [i for i, chunk_id in enumerate(old.ids) if chunk_id in keep_ids]
+            removed = len(old) - len(keep_rows)
+            if not removed:
+                return 0
+
+            # Row numbers shift, so postings are rebuilt for this ticker only
+            partition = _LexicalPartition(ticker)
+            for i in keep_rows:
+                partition.add(old.ids[i], old.texts[i], old.metadatas[i])
+            self._partitions[ticker] = partition
+            if self.persistent:
+                self._rewrite_docs(partition)
+                self._save_postings(partition)
+            return removed
+
+    def _query_sync(self, ticker: str, query_text: str, n_results: int, where: Dict[str, Any]) -> List[Dict]:
+        with self._lock:
+            self._queries += 1
+            partition = self._partition(ticker)
+            n_docs = len(partition)
+            terms = set(tokenize(query_text))
+            if not n_docs or not terms:
+                return []
+
+            doc_len = np.frombuffer(partition.doc_len, dtype=np.uint32).astype(np.float32)
+            avg_len = partition.total_len / n_docs if partition.total_len else 1.0
+            scores = np.zeros(n_docs, dtype=np.float32)
+            for term in terms:
+                posting = partition.postings.get(term)
+                if posting is None:
+                    continue
+                rows = np.frombuffer(posting[0], dtype=np.uint32)
+                tfs = np.frombuffer(posting[1], dtype=np.uint16).astype(np.float32)
+                idf = math.log(1.0 + (n_docs - rows.size + 0.5) / (rows.size + 0.5))
+                norm = self.k1 * (1.0 - self.b + self.b * doc_len[rows] / avg_len)
+                scores[rows] += idf * tfs * (self.k1 + 1.0) / (tfs + norm)
+
+            if where:
+                mask = np.array([
+                    all(metadata.get(field) == value for field, value in where.items())
+                    for metadata in partition.metadatas
+                ])
+                scores[~mask] = 0.0
+
+            candidates = np.flatnonzero(scores > 0)
+            if not candidates.size:
+                return []
+            k = min(n_results, candidates.size)
+            top = candidates[np.argpartition(-scores[candidates], k - 1)[:k]]
+            top = top[np.argsort(-scores[top])]
+
+            return [{
+                "text": partition.texts[row],
+                "metadata": partition.metadatas[row],
+                "distance": float(1.0 / (1.0 + scores[row]))
+            } for row in top]
+
+    def _drop_sync(self, ticker: str) -> int:
+        with self._lock:
+            count = len(self._partition(ticker))
+            self._partitions.pop(ticker, None)
+            for path in self._paths(ticker):
+                if os.path.exists(path):
+                    os.remove(path)
+            return count
+
+    def _partition_stats_sync(self) -> Dict[str, int]:
+        with self._lock:
+            stats = {ticker: len(p) for ticker, p in self._partitions.items()}
+            if not self.persistent:
+                return stats
+            for filename in os.listdir(self.index_dir):
+                if not filename.endswith(".bm25.jsonl"):
+                    continue
+                with open(os.path.join(self.index_dir, filename), "r", encoding="utf-8") as f:
+                    first = f.readline()
+                    if not first:
+                        continue
+                    ticker = json.loads(first)["metadata"].get("ticker", filename[:-len(".bm25.jsonl")])
+                    if ticker not in stats:
+                        stats[ticker] = 1 + sum(1 for _ in f)
+            return stats
+
+    # ------------------------------------------------------------ async API
+
+    async def existing_ids(self, ticker: str, ids: List[str]) -> Set[str]:
+        return await asyncio.to_thread(self._existing_sync, ticker, ids)
+
+    async def add(self, ticker: str, ids: List[str], texts: List[str], metadatas: List[Dict[str, Any]], embeddings=None):
+        await asyncio.to_thread(self._add_sync, ticker, ids, texts, metadatas)
+
+    async def delete_stale(self, ticker: str, keep_ids: Set[str]) -> int:
+        return await asyncio.to_thread(self._delete_stale_sync, ticker, keep_ids)
+
+    async def flush(self, ticker: str):
+        """Persist the ticker's postings if chunks were added since the last flush"""
+        await asyncio.to_thread(self._flush_sync, ticker)
+
+    async def query(self, ticker: str, query_text: str, embedding, n_results: int, where: Dict[str, Any]) -> List[Dict]:
+        if ticker is None:
+            # Partitioned by ticker: there is no global index to scan
+            logger.warning("BM25 index queried without a ticker filter")
+            return []
+        return await asyncio.to_thread(self._query_sync, ticker, query_text, n_results, where)
+
+    async def drop_partition(self, ticker: str) -> int:
+        """Delete one ticker's partition; returns the number of chunks dropped"""
+        return await asyncio.to_thread(self._drop_sync, ticker)
+
+    async def partition_stats(self) -> Dict[str, int]:
+        """Chunk count per ticker partition"""
+        return await asyncio.to_thread(self._partition_stats_sync)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get index statistics."""
+        return {
+            "backend": "bm25",
+            "persistent": self.persistent,
+            "queries": self._queries,
+            "postings_rebuilds": self._rebuilds,
+            "loaded_partitions": {ticker: len(p) for ticker, p in self._partitions.items()},
+            "terms": sum(len(p.postings) for p in self._partitions.values()),
+        }
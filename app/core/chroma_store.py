@@ -0,0 +1,284 @@
+import asyncio
+import hashlib
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Set
+
+from app.core.config import get_settings
+
+settings = get_settings()
+
+
+class ChromaClientManager:
+    """
+    Owns a single long-lived ChromaDB PersistentClient for the whole process.
+
+    SQLite objects may only be used from the thread that created them, so the
+    client and every collection handle live on one dedicated worker thread.
+    All Chroma work is submitted to that thread via `run()`, which means the
+    store is opened once and reused by every ingestion and query.
+    """
+
+    def __init__(self, persist_dir: Optional[str] = None):
+        self.persist_dir = persist_dir or settings.CHROMA_PERSIST_DIR
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="chroma")
+        self._client = None
+        self._collections: Dict[str, Any] = {}
+        self._owner_thread: Optional[int] = None
+
+        # Instrumentation
+        self._client_opens = 0
+        self._collection_opens = 0
+        self._collection_reuses = 0
+        self._calls = 0
+
+    def _get_client(self):
+        """Open the client on first use (must run on the Chroma thread)"""
+        if self._client is None:
+            import chromadb  # Lazy import
+            self._client = chromadb.PersistentClient(path=self.persist_dir)
+            self._owner_thread = threading.get_ident()
+            self._client_opens += 1
+        return self._client
+
+    def get_collection(self, name: str = "financial_data", create: bool = True):
+        """
+        Return a cached collection handle (must run on the Chroma thread).
+
+        Embedding function is always None: embeddings are computed explicitly
+        by the caller so the model object never touches this thread.
+
+        Args:
+            name: Collection name
+            create: When False, return None instead of creating a missing collection
+        """
+        collection = self._collections.get(name)
+        if collection is not None:
+            self._collection_reuses += 1
+            return collection
+
+        client = self._get_client()
+        if create:
+            collection = client.get_or_create_collection(name=name, embedding_function=None)
+        else:
+            try:
+                collection = client.get_collection(name=name, embedding_function=None)
+            except Exception:
+                # Raised as NotFoundError or ValueError depending on the Chroma version
+                return None
+        self._collections[name] = collection
+        self._collection_opens += 1
+        return collection
+
+    def drop_collection(self, name: str) -> bool:
+        """Delete a collection if it exists (must run on the Chroma thread)"""
+        self._collections.pop(name, None)
+        try:
+            self._get_client().delete_collection(name=name)
+            return True
+        except Exception:
+            return False
+
+    def list_collection_names(self) -> List[str]:
+        """Names of all collections in the store (must run on the Chroma thread)"""
+        collections = self._get_client().list_collections()
+        # Chroma >= 0.6 returns names, older versions return Collection objects
+        return [c if isinstance(c, str) else c.name for c in collections]
+
+    async def run(self, fn: Callable[["ChromaClientManager"], Any]) -> Any:
+        """
+        Execute `fn(manager)` on the dedicated Chroma thread.
+
+        Args:
+            fn: Callable receiving this manager; use `get_collection()` inside it
+
+        Returns:
+            Whatever `fn` returns
+        """
+        loop = asyncio.get_running_loop()
+
+        def _call():
+            self._calls += 1
+            return fn(self)
+
+        return await loop.run_in_executor(self._executor, _call)
+
+    def get_stats(self) -> Dict[str, int]:
+        """Get client lifecycle statistics."""
+        return {
+            "client_opens": self._client_opens,
+            "collection_opens": self._collection_opens,
+            "collection_reuses": self._collection_reuses,
+            "calls": self._calls,
+        }
+
+
+class ChromaBackend:
+    """
+    Vector backend storing each ticker's chunks in its own Chroma collection.
+
+    Partitioning by ticker means a query only searches that company's HNSW
+    index, and dropping or rebuilding one company never touches another's.
+    Chunks ingested before partitioning live in the legacy `financial_data`
+    collection and are still served (filtered by ticker) until the company
+    is re-ingested.
+
+    Exposes the same async interface as NumpyVectorIndex so VectorStore can
+    switch backends via `VECTOR_STORE_TYPE`.
+    """
+
+    requires_embeddings = True
+    LEGACY_COLLECTION = "financial_data"
+    PARTITION_PREFIX = "financial_data_"
+
+    def __init__(self, persist_dir: Optional[str] = None):
+        self.manager = ChromaClientManager(persist_dir)
+        # collection name -> ticker, for the partitions this process has touched
+        self._partition_tickers: Dict[str, str] = {}
+
+    def partition_name(self, ticker: str) -> str:
+        """
+        Collection name for a ticker.
+
+        Chroma names allow [a-zA-Z0-9._-] and must start/end alphanumeric, so
+        other characters are replaced and a short hash of the raw ticker keeps
+        sanitized names from colliding (e.g. "TCS.NS" vs "TCS_NS").
+        """
+        safe = re.sub(r"[^A-Za-z0-9._-]", "_", ticker).replace("..", "._")
+        digest = hashlib.sha1(ticker.encode()).hexdigest()[:8]
+        name = f"{self.PARTITION_PREFIX}{safe}_{digest}"
+        self._partition_tickers[name] = ticker
+        return name
+
+    @staticmethod
+    def _where(where: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+        """Build a Chroma `where` clause (multiple equalities need an explicit $and)"""
+        if not where:
+            return None
+        if len(where) == 1:
+            return dict(where)
+        return {"$and": [{field: value} for field, value in where.items()]}
+
+    @staticmethod
+    def _format(results: Dict[str, Any]) -> List[Dict]:
+        formatted_results = []
+        if results['documents']:
+            for i, doc in enumerate(results['documents'][0]):
+                formatted_results.append({
+                    "text": doc,
+                    "metadata": results['metadatas'][0][i] if results['metadatas'] else {},
+                    "distance": results['distances'][0][i] if results['distances'] else 0.0
+                })
+        return formatted_results
+
+    async def existing_ids(self, ticker: str, ids: List[str]) -> Set[str]:
+        name = self.partition_name(ticker)
+
+        def _existing_sync(manager: ChromaClientManager):
+            collection = manager.get_collection(name)
+            return set(collection.get(ids=list(set(ids)), include=[])["ids"])
+
+        return await self.manager.run(_existing_sync)
+
+    async def add(self, ticker: str, ids: List[str], texts: List[str], metadatas: List[Dict[str, Any]], embeddings):
+        name = self.partition_name(ticker)
+
+        def _add_sync(manager: ChromaClientManager):
+            collection = manager.get_collection(name)
+            collection.upsert(
+                documents=texts,
+                metadatas=metadatas,
+                ids=ids,
+                embeddings=embeddings
+            )
+
+        await self.manager.run(_add_sync)
+
+    async def delete_stale(self, ticker: str, keep_ids: Set[str]) -> int:
+        name = self.partition_name(ticker)
+
+        def _delete_sync(manager: ChromaClientManager):
+            removed = 0
+            collection = manager.get_collection(name, create=False)
+            if collection is not None:
+                stored = collection.get(include=[])["ids"]
+                stale = [chunk_id for chunk_id in stored if chunk_id not in keep_ids]
+                if stale:
+                    collection.delete(ids=stale)
+                removed += len(stale)
+
+            # This ticker's pre-partitioning chunks are superseded by the partition
+            legacy = manager.get_collection(self.LEGACY_COLLECTION, create=False)
+            if legacy is not None:
+                stale = legacy.get(where={"ticker": ticker}, include=[])["ids"]
+                if stale:
+                    legacy.delete(ids=stale)
+                removed += len(stale)
+            return removed
+
+        return await self.manager.run(_delete_sync)
+
+    async def flush(self, ticker: str):
+        """Nothing buffered: Chroma persists every upsert itself"""
+
+    async def query(self, ticker: Optional[str], query_text: str, embedding, n_results: int, where: Dict[str, Any]) -> List[Dict]:
+        def _search_sync(manager: ChromaClientManager):
+            if ticker is not None:
+                collection = manager.get_collection(self.partition_name(ticker), create=False)
+                if collection is not None and collection.count() > 0:
+                    return self._format(collection.query(
+                        query_embeddings=[embedding],
+                        n_results=n_results,
+                        where=self._where(where)
+                    ))
+
+            # Not yet re-ingested into a partition (or no ticker given): legacy collection
+            legacy = manager.get_collection(self.LEGACY_COLLECTION, create=False)
+            if legacy is None:
+                return []
+            legacy_where = dict(where)
+            if ticker is not None:
+                legacy_where["ticker"] = ticker
+            return self._format(legacy.query(
+                query_embeddings=[embedding],
+                n_results=n_results,
+                where=self._where(legacy_where)
+            ))
+
+        return await self.manager.run(_search_sync)
+
+    async def drop_partition(self, ticker: str) -> int:
+        """Delete one ticker's collection; returns the number of chunks dropped"""
+        name = self.partition_name(ticker)
+
+        def _drop_sync(manager: ChromaClientManager):
+            collection = manager.get_collection(name, create=False)
+            if collection is None:
+                return 0
+            count = collection.count()
+            manager.drop_collection(name)
+            return count
+
+        return await self.manager.run(_drop_sync)
+
+    async def partition_stats(self) -> Dict[str, int]:
+        """Chunk count per partition (keyed by ticker where known, else collection name)"""
+        def _stats_sync(manager: ChromaClientManager):
+            stats = {}
+            for name in manager.list_collection_names():
+                if name != self.LEGACY_COLLECTION and not name.startswith(self.PARTITION_PREFIX):
+                    continue
+                collection = manager.get_collection(name, create=False)
+                if collection is not None:
+                    stats[self._partition_tickers.get(name, name)] = collection.count()
+            return stats
+
+        return await self.manager.run(_stats_sync)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get backend statistics."""
+        return {
+            "backend": "chroma",
+            **self.manager.get_stats()
+        }
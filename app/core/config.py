@@ -24,11 +24,54 @@ class Settings(BaseSettings):
     groq_api_key: str
     
     # Vector Store
-    VECTOR_STORE_TYPE: str = "chroma"
+    VECTOR_STORE_TYPE: str = "chroma"  # "chroma", "numpy" or "bm25" (lexical, no embedding model)
     CHROMA_PERSIST_DIR: str = "./data/chroma_db"
+    NUMPY_INDEX_DIR: str = "./data/vector_index"
+    BM25_INDEX_DIR: str = "./data/bm25_index"
+    LEXICAL_FALLBACK: bool = True  # Use BM25 where Chroma/embeddings are disabled (Windows, Render, Railway)
+    VECTOR_QUANTIZATION: str = "none"  # numpy backend: "none", "float16" or "int8"
+    VECTOR_RESCORE_FACTOR: int = 4     # Quantized search rescores top (factor * k) at full precision
     
     # Embeddings
     EMBEDDING_MODEL: str = "all-MiniLM-L6-v2"
+    EMBEDDING_BATCH_WINDOW_MS: float = 5.0  # Wait this long to coalesce concurrent query embeddings
+    EMBEDDING_BATCH_MAX_SIZE: int = 32      # Flush a batch immediately once this many queries are pending
+    EMBEDDING_CACHE_MAX_MB: float = 8.0     # Memory cap for cached query vectors (~5k MiniLM vectors)
+    INGESTION_EMBED_BATCH_SIZE: int = 128   # Chunks embedded and written per batch during ingestion
+    CHUNKING_STRATEGY: str = "period"       # "period" (one chunk per statement+period) or "line_item"
+    FINANCIAL_CUBE_MAX_MB: float = 32.0     # In-memory per-ticker history cache for numeric questions (0 = off, SQL serves them)
+    FINANCIAL_CUBE_TTL_S: float = 300.0     # Max staleness of a cube vs. writes from other processes
+    CHUNK_MAX_LINE_ITEMS: int = 25          # Line items per period chunk (keeps text within the model window)
+
+    # Query classification
+    LOCAL_CLASSIFIER: bool = True           # Decide unambiguous queries with local rules before calling the LLM
+    CLASSIFIER_AUDIT_RATE: float = 0.02     # Fraction of local decisions re-checked by the LLM for agreement stats
+    CLASSIFICATION_CACHE_SIZE: int = 2048   # LLM classifications cached by normalized query (0 disables caching)
+    CLASSIFICATION_CACHE_TTL_S: float = 3600.0
+
+    # Groq client-side rate limiting (llama-3.1-8b-instant free tier budgets)
+    GROQ_RATE_LIMIT: bool = True
+    GROQ_REQUESTS_PER_MINUTE: int = 30
+    GROQ_TOKENS_PER_MINUTE: int = 6000
+    GROQ_ANSWER_MAX_TOKENS: int = 512       # Completion tokens reserved per answer before actual usage is known
+
+    # Request latency budget
+    QUERY_DEADLINE_MS: int = 25000          # Default end-to-end budget of a /query request
+    QUERY_DEADLINE_MAX_MS: int = 110000     # Cap on client-supplied deadlines (below the gunicorn timeout)
+    CLASSIFY_BUDGET_MS: int = 4000          # LLM classification beyond this is skipped (query treated as hybrid)
+    ANSWER_RESERVE_MS: int = 5000           # Budget kept back for answer generation by earlier stages
+
+    # LLM context assembly
+    CONTEXT_TOKEN_BUDGET: int = 1500        # Max context tokens sent to the LLM after deduplication (0 = unbounded)
+    CONTEXT_TOKENIZER: str = "cl100k_base"  # tiktoken encoding used to count them (estimated if tiktoken is missing)
+
+    # Answer cache
+    ANSWER_CACHE_MAX_ENTRIES: int = 1000
+    ANSWER_CACHE_MAX_MB: float = 16.0
+    ANSWER_CACHE_TTL_S: float = 3600.0
+    ANSWER_CACHE_SHARED: str = "none"       # Tier shared by all workers: "none", "sqlite" or "redis"
+    ANSWER_CACHE_SQLITE_PATH: str = "./data/answer_cache.sqlite"
+    ANSWER_CACHE_REDIS_URL: str = "redis://localhost:6379/0"
     
     class Config:
         env_file = ".env"
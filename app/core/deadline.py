@@ -0,0 +1,116 @@
+import asyncio
+import math
+import time
+from typing import Any, Awaitable, List, Optional
+
+from tenacity import RetryCallState
+from tenacity.stop import stop_base
+
+
+class DeadlineExceeded(Exception):
+    """A stage could not finish within the request's remaining time budget."""
+
+
+class Deadline:
+    """
+    Absolute end time of a request, passed down the query pipeline.
+
+    Stages bound their awaits with `run()` and their retries with
+    `stop_before_deadline`, and record in `degraded` what they skipped or cut
+    short so the response can report it.
+    """
+
+    def __init__(self, seconds: Optional[float]):
+        self.started = time.monotonic()
+        self.expires_at = math.inf if seconds is None else self.started + seconds
+        self.degraded: List[str] = []
+
+    @classmethod
+    def after_ms(cls, milliseconds: Optional[float]) -> "Deadline":
+        """Deadline `milliseconds` from now (unbounded for None)"""
+        return cls(None if milliseconds is None else milliseconds / 1000)
+
+    @classmethod
+    def unbounded(cls) -> "Deadline":
+        return cls(None)
+
+    def child(self, cap: Optional[float] = None, reserve: float = 0.0) -> "Deadline":
+        """
+        Tighter deadline for one stage, sharing this deadline's degraded list.
+
+        Args:
+            cap: Upper bound for the stage in seconds
+            reserve: Seconds of this deadline to leave for later stages
+        """
+        child = Deadline(None)
+        child.started = self.started
+        child.expires_at = self.expires_at - reserve
+        if cap is not None:
+            child.expires_at = min(child.expires_at, time.monotonic() + cap)
+        child.degraded = self.degraded
+        return child
+
+    def remaining(self) -> float:
+        """Seconds left (never negative; inf when unbounded)"""
+        return max(self.expires_at - time.monotonic(), 0.0)
+
+    @property
+    def expired(self) -> bool:
+        return self.remaining() <= 0
+
+    def timeout(self, cap: Optional[float] = None, reserve: float = 0.0) -> Optional[float]:
+        """
+        Timeout for one stage.
+
+        Args:
+            cap: Upper bound for the stage in seconds
+            reserve: Seconds to leave for later stages
+
+        Returns:
+            Seconds (None when unbounded)
+        """
+        timeout = max(self.remaining() - reserve, 0.0)
+        if cap is not None:
+            timeout = min(timeout, cap)
+        return None if math.isinf(timeout) else timeout
+
+    async def run(self, awaitable: Awaitable[Any], cap: Optional[float] = None, reserve: float = 0.0) -> Any:
+        """
+        Await within the remaining budget.
+
+        Raises:
+            DeadlineExceeded: If the budget runs out first (the awaitable is cancelled)
+        """
+        timeout = self.timeout(cap, reserve)
+        if timeout is not None and timeout <= 0:
+            if asyncio.iscoroutine(awaitable):
+                awaitable.close()
+            raise DeadlineExceeded("no time left in the request budget")
+        try:
+            return await asyncio.wait_for(awaitable, timeout)
+        except asyncio.TimeoutError as e:
+            raise DeadlineExceeded(f"stage exceeded its {timeout:.2f}s budget") from e
+
+    def note(self, stage: str):
+        """Record that a stage was skipped or cut short"""
+        if stage not in self.degraded:
+            self.degraded.append(stage)
+
+    def elapsed_ms(self) -> float:
+        return (time.monotonic() - self.started) * 1000
+
+
+class StopBeforeDeadline(stop_base):
+    """
+    tenacity stop condition: give up when the next backoff sleep would outlast
+    the `deadline` keyword argument of the retried call.
+    """
+
+    def __call__(self, retry_state: RetryCallState) -> bool:
+        deadline = retry_state.kwargs.get("deadline")
+        if deadline is None:
+            return False
+        return (retry_state.upcoming_sleep or 0.0) >= deadline.remaining()
+
+
+stop_before_deadline = StopBeforeDeadline()
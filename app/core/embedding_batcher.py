@@ -0,0 +1,107 @@
+import asyncio
+import logging
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class EmbeddingBatcher:
+    """
+    Coalesces concurrent query embeddings into a single model forward pass.
+
+    Texts arriving within `window_ms` of the first pending text (or until
+    `max_batch_size` texts are pending) are encoded together in one call to
+    `embed_fn`, and each caller receives its own vector.
+    """
+
+    def __init__(self, embed_fn: Callable[[List[str]], List[Any]], window_ms: float = 5.0, max_batch_size: int = 32):
+        self.embed_fn = embed_fn
+        self.window = max(window_ms, 0.0) / 1000.0
+        self.max_batch_size = max(max_batch_size, 1)
+
+        self._pending: List[Tuple[str, asyncio.Future]] = []
+        self._flush_handle: Optional[asyncio.TimerHandle] = None
+        # The loop only keeps weak references to tasks; hold running batches until they finish
+        self._tasks: Set[asyncio.Task] = set()
+
+        # Instrumentation
+        self._batches = 0
+        self._texts = 0
+        self._max_seen = 0
+
+    async def embed(self, text: str) -> Any:
+        """
+        Embed a single text, sharing the forward pass with concurrent callers.
+
+        Args:
+            text: Text to embed
+
+        Returns:
+            Embedding vector for `text`
+        """
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((text, future))
+
+        if len(self._pending) >= self.max_batch_size:
+            self._flush()
+        elif self._flush_handle is None:
+            self._flush_handle = loop.call_later(self.window, self._flush)
+
+        return await future
+
+    def _flush(self):
+        """Detach the pending batch and encode it in a worker thread"""
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+
+        batch, self._pending = self._pending, []
+        if batch:
+            task = asyncio.ensure_future(self._run_batch(batch))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+            task.add_done_callback(lambda done: self._batch_done(done, batch))
+
+    @staticmethod
+    def _batch_done(task: asyncio.Task, batch: List[Tuple[str, asyncio.Future]]):
+        """Fail any caller a cancelled or crashed batch left waiting"""
+        error = asyncio.CancelledError() if task.cancelled() else task.exception()
+        if error is None:
+            return
+        if not isinstance(error, asyncio.CancelledError):
+            logger.error(f"Embedding batch failed: {error}")
+        for _, future in batch:
+            if not future.done():
+                future.set_exception(error)
+
+    async def _run_batch(self, batch: List[Tuple[str, asyncio.Future]]):
+        texts = [text for text, _ in batch]
+        self._batches += 1
+        self._texts += len(texts)
+        self._max_seen = max(self._max_seen, len(texts))
+
+        try:
+            embeddings = await asyncio.to_thread(self.embed_fn, texts)
+        except Exception as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        for (_, future), embedding in zip(batch, embeddings):
+            # Caller may have been cancelled while the batch was running
+            if not future.done():
+                future.set_result(embedding)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get batching statistics."""
+        return {
+            "batches": self._batches,
+            "texts": self._texts,
+            "avg_batch_size": round(self._texts / self._batches, 2) if self._batches else 0.0,
+            "max_batch_size_seen": self._max_seen,
+            "window_ms": self.window * 1000.0,
+            "max_batch_size": self.max_batch_size,
+            "running_batches": len(self._tasks),
+        }
@@ -0,0 +1,110 @@
+import re
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+import numpy as np
+
+
+class EmbeddingCache:
+    """
+    Bounded LRU cache of query embeddings.
+
+    Keys are the normalized query text (case-folded, whitespace-collapsed)
+    plus the embedding model name, so switching models never serves stale
+    vectors. Vectors are stored as float32 arrays and the cache is capped by
+    total bytes rather than entry count.
+    """
+
+    _WHITESPACE = re.compile(r"\s+")
+
+    def __init__(self, model_name: str, max_bytes: int):
+        self.model_name = model_name
+        self.max_bytes = max(int(max_bytes), 0)
+
+        self._entries: "OrderedDict[Tuple[str, str], np.ndarray]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+        # Instrumentation
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+
+    @classmethod
+    def normalize(cls, text: str) -> str:
+        """Case-fold and collapse whitespace so trivial variants share an entry"""
+        return cls._WHITESPACE.sub(" ", text.casefold()).strip()
+
+    def _key(self, text: str) -> Tuple[str, str]:
+        return (self.model_name, self.normalize(text))
+
+    def get(self, text: str) -> Optional[np.ndarray]:
+        """
+        Look up a cached embedding.
+
+        Args:
+            text: Raw query text
+
+        Returns:
+            float32 vector if cached, None otherwise
+        """
+        key = self._key(text)
+        with self._lock:
+            vector = self._entries.get(key)
+            if vector is None:
+                self._misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self._hits += 1
+            return vector
+
+    def put(self, text: str, embedding: Any) -> np.ndarray:
+        """
+        Store an embedding, evicting least recently used entries over the cap.
+
+        Args:
+            text: Raw query text
+            embedding: Vector (list or array) produced by the embedding model
+
+        Returns:
+            The stored float32 vector
+        """
+        vector = np.asarray(embedding, dtype=np.float32)
+        if vector.nbytes > self.max_bytes:
+            return vector
+
+        key = self._key(text)
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._bytes -= previous.nbytes
+
+            self._entries[key] = vector
+            self._bytes += vector.nbytes
+
+            while self._bytes > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._bytes -= evicted.nbytes
+                self._evictions += 1
+
+        return vector
+
+    def clear(self):
+        """Drop all cached embeddings."""
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get cache statistics."""
+        lookups = self._hits + self._misses
+        return {
+            "entries": len(self._entries),
+            "bytes": self._bytes,
+            "max_bytes": self.max_bytes,
+            "hits": self._hits,
+            "misses": self._misses,
+            "evictions": self._evictions,
+            "hit_rate": round(self._hits / lookups, 4) if lookups else 0.0,
+        }
@@ -0,0 +1,299 @@
+"""
+Canonical Metric Catalogue
+
+Single source of truth for financial metric names: maps exact statement line
+item names (Yahoo Finance plus the calculated ratios) to canonical metric
+ids, and question phrases to those ids. Used by ingestion to tag line items,
+by the ratio calculator to find its inputs and by the SQL retriever to turn a
+question into an exact metric lookup.
+"""
+
+import re
+from typing import Dict, List, Optional
+from pydantic import BaseModel
+
+
+class MetricDefinition(BaseModel):
+    id: str
+    line_items: List[str]  # Exact line item names, preferred name first
+    terms: List[str]       # Phrases that refer to the metric in questions
+    ratio_inputs: List[str] = []  # Line items trusted as RatioCalculator inputs, preferred first
+
+
+METRICS: List[MetricDefinition] = [
+    # Income statement
+    MetricDefinition(
+        id="total_revenue",
+        line_items=["Total Revenue", "Revenue", "Net Sales", "Total Sales", "Turnover", "Operating Revenue"],
+        terms=["revenue", "revenues", "sales", "turnover", "top line"],
+        ratio_inputs=["Total Revenue", "Revenue", "Net Sales", "Total Sales", "Turnover"]
+    ),
+    MetricDefinition(
+        id="cost_of_revenue",
+        line_items=["Cost Of Revenue", "Reconciled Cost Of Revenue"],
+        terms=["cost of revenue", "cost of sales", "cost of goods sold", "cogs"]
+    ),
+    MetricDefinition(
+        id="gross_profit",
+        line_items=["Gross Profit"],
+        terms=["gross profit"]
+    ),
+    MetricDefinition(
+        id="operating_expense",
+        line_items=["Operating Expense", "Total Expenses", "Selling General And Administration"],
+        terms=["operating expense", "operating expenses", "opex", "expenses"]
+    ),
+    MetricDefinition(
+        id="operating_income",
+        line_items=["Operating Income", "Operating Profit", "EBIT", "Total Operating Income As Reported"],
+        terms=["operating income", "operating profit", "ebit"],
+        ratio_inputs=["Operating Income", "Operating Profit", "EBIT"]
+    ),
+    MetricDefinition(
+        id="ebitda",
+        line_items=["EBITDA", "Normalized EBITDA"],
+        terms=["ebitda"]
+    ),
+    MetricDefinition(
+        id="interest_expense",
+        line_items=["Interest Expense", "Interest Expense Non Operating"],
+        terms=["interest expense", "interest cost", "finance cost", "finance costs"]
+    ),
+    MetricDefinition(
+        id="pretax_income",
+        line_items=["Pretax Income"],
+        terms=["pretax income", "pre-tax income", "profit before tax", "pbt"]
+    ),
+    MetricDefinition(
+        id="tax_provision",
+        line_items=["Tax Provision"],
+        terms=["tax", "taxes", "tax provision", "income tax"]
+    ),
+    MetricDefinition(
+        id="net_income",
+        line_items=[
+            "Net Income", "Net Profit", "Profit After Tax", "PAT", "Net Earnings",
+            "Net Income Common Stockholders", "Net Income From Continuing Operation Net Minority Interest",
+        ],
+        terms=["net income", "net profit", "profit after tax", "pat", "net earnings"],
+        ratio_inputs=["Net Income", "Net Profit", "Profit After Tax", "PAT", "Net Earnings"]
+    ),
+    MetricDefinition(
+        id="eps",
+        line_items=["Basic EPS", "Diluted EPS"],
+        terms=["eps", "earnings per share"]
+    ),
+    # Balance sheet
+    MetricDefinition(
+        id="total_assets",
+        line_items=["Total Assets", "Total Asset"],
+        terms=["total assets", "assets", "asset base"],
+        ratio_inputs=["Total Assets", "Total Asset"]
+    ),
+    MetricDefinition(
+        id="current_assets",
+        line_items=["Current Assets", "Total Current Assets"],
+        terms=["current assets"],
+        ratio_inputs=["Current Assets", "Total Current Assets"]
+    ),
+    MetricDefinition(
+        id="cash",
+        line_items=["Cash And Cash Equivalents", "Cash Cash Equivalents And Short Term Investments"],
+        terms=["cash", "cash balance", "cash and cash equivalents"]
+    ),
+    MetricDefinition(
+        id="total_liabilities",
+        line_items=["Total Liabilities", "Total Liability", "Total Liabilities Net Minority Interest"],
+        terms=["total liabilities", "liabilities", "liability"]
+    ),
+    MetricDefinition(
+        id="current_liabilities",
+        line_items=["Current Liabilities", "Total Current Liabilities"],
+        terms=["current liabilities"],
+        ratio_inputs=["Current Liabilities", "Total Current Liabilities"]
+    ),
+    MetricDefinition(
+        id="total_debt",
+        line_items=["Total Debt", "Long Term Debt", "Total Long Term Debt"],
+        terms=["debt", "total debt", "borrowings", "long term debt"],
+        ratio_inputs=["Total Debt", "Long Term Debt", "Total Long Term Debt"]
+    ),
+    MetricDefinition(
+        id="current_debt",
+        line_items=["Current Debt", "Current Debt And Capital Lease Obligation"],
+        terms=["current debt", "short term debt", "short-term debt"]
+    ),
+    MetricDefinition(
+        id="net_debt",
+        line_items=["Net Debt"],
+        terms=["net debt"]
+    ),
+    MetricDefinition(
+        id="total_equity",
+        line_items=[
+            "Total Equity", "Stockholders Equity", "Shareholders Equity",
+            "Total Stockholders Equity", "Total Shareholders Equity",
+            "Total Equity Gross Minority Interest",
+        ],
+        terms=["equity", "shareholders equity", "stockholders equity", "net worth", "book value"],
+        ratio_inputs=[
+            "Total Equity", "Stockholders Equity", "Shareholders Equity",
+            "Total Stockholders Equity", "Total Shareholders Equity",
+        ]
+    ),
+    # Cash flow
+    MetricDefinition(
+        id="operating_cash_flow",
+        line_items=["Operating Cash Flow", "Cash Flow From Continuing Operating Activities"],
+        terms=["operating cash flow", "cash from operations", "cash flow from operations", "cfo", "cash flow"]
+    ),
+    MetricDefinition(
+        id="free_cash_flow",
+        line_items=["Free Cash Flow"],
+        terms=["free cash flow", "fcf"]
+    ),
+    MetricDefinition(
+        id="capital_expenditure",
+        line_items=["Capital Expenditure"],
+        terms=["capital expenditure", "capex", "capital spending"]
+    ),
+    MetricDefinition(
+        id="dividends_paid",
+        line_items=["Cash Dividends Paid", "Common Stock Dividend Paid"],
+        terms=["dividend", "dividends", "dividends paid"]
+    ),
+    # Calculated ratios (names written by RatioCalculator)
+    MetricDefinition(
+        id="net_profit_margin",
+        line_items=["Net Profit Margin (%)"],
+        terms=["net profit margin", "net margin", "profit margin"]
+    ),
+    MetricDefinition(
+        id="operating_margin",
+        line_items=["Operating Profit Margin (%)"],
+        terms=["operating margin", "operating profit margin", "ebit margin"]
+    ),
+    MetricDefinition(
+        id="roa",
+        line_items=["Return on Assets (ROA) (%)"],
+        terms=["roa", "return on assets"]
+    ),
+    MetricDefinition(
+        id="roe",
+        line_items=["Return on Equity (ROE) (%)"],
+        terms=["roe", "return on equity"]
+    ),
+    MetricDefinition(
+        id="debt_to_equity",
+        line_items=["Debt-to-Equity Ratio"],
+        terms=["debt to equity", "debt-to-equity", "d/e", "leverage", "gearing"]
+    ),
+    MetricDefinition(
+        id="debt_to_assets",
+        line_items=["Debt-to-Assets Ratio (%)"],
+        terms=["debt to assets", "debt-to-assets"]
+    ),
+    MetricDefinition(
+        id="equity_ratio",
+        line_items=["Equity Ratio (%)"],
+        terms=["equity ratio"]
+    ),
+    MetricDefinition(
+        id="current_ratio",
+        line_items=["Current Ratio"],
+        terms=["current ratio", "liquidity"]
+    ),
+]
+
+
+# Words that turn a following term into a different, uncatalogued line item
+# ("interest income", "deferred tax", "intangible assets", "investing cash flow")
+QUALIFIERS = {
+    "accrued", "accumulated", "comprehensive", "deferred", "financing", "fixed", "gross",
+    "intangible", "interest", "investing", "minority", "net", "non-current", "noncurrent",
+    "non-operating", "operating", "other", "preferred", "restricted", "retained",
+    "tangible", "treasury", "unearned",
+}
+
+_PREVIOUS_WORD = re.compile(r"([\w-]+)\s*$")
+
+
+class MetricCatalog:
+    """
+    Resolves line item names and question text to canonical metric ids.
+
+    Question matching uses one compiled alternation of every term, longest
+    first, so "net profit margin" wins over "net profit" and "operating cash
+    flow" over "cash". A term directly preceded by a qualifier ("other
+    income", "deferred tax") names a line item the catalogue does not know,
+    so it is not matched and the question falls back to keyword search.
+    """
+
+    def __init__(self, metrics: List[MetricDefinition]):
+        self.metrics: Dict[str, MetricDefinition] = {}
+        self._metric_of_line_item: Dict[str, str] = {}
+        self._metric_of_term: Dict[str, str] = {}
+
+        for metric in metrics:
+            self.metrics[metric.id] = metric
+            for name in metric.line_items:
+                if name in self._metric_of_line_item:
+                    raise ValueError(f"Line item '{name}' mapped to both "
+                                     f"{self._metric_of_line_item[name]} and {metric.id}")
+                self._metric_of_line_item[name] = metric.id
+            unknown = set(metric.ratio_inputs) - set(metric.line_items)
+            if unknown:
+                raise ValueError(f"Ratio inputs {sorted(unknown)} of {metric.id} are not among its line items")
+            for term in metric.terms:
+                self._metric_of_term[term.lower()] = metric.id
+
+        terms = sorted(self._metric_of_term, key=len, reverse=True)
+        self._pattern = re.compile(
+            r"(?<![\w-])(" + "|".join(re.escape(term) for term in terms) + r")(?![\w-])",
+            re.IGNORECASE
+        )
+
+    def metric_for_line_item(self, name: str) -> Optional[str]:
+        """Canonical metric id of an exact line item name (None if uncatalogued)"""
+        return self._metric_of_line_item.get(name)
+
+    def line_items(self, metric_id: str) -> List[str]:
+        """Line item names of a metric, preferred name first"""
+        metric = self.metrics.get(metric_id)
+        return list(metric.line_items) if metric else []
+
+    def match(self, text: str) -> List[str]:
+        """
+        Metric ids mentioned in a question, in order of first mention.
+
+        Args:
+            text: Natural language query
+
+        Returns:
+            List of distinct metric ids
+        """
+        found: List[str] = []
+        qualified_end = -1
+        for match in self._pattern.finditer(text):
+            previous = _PREVIOUS_WORD.search(text, 0, match.start())
+            continues_qualified = qualified_end >= 0 and not text[qualified_end:match.start()].strip()
+            if continues_qualified or (previous and previous.group(1).lower() in QUALIFIERS):
+                # The whole compound ("deferred tax assets") is one uncatalogued item
+                qualified_end = match.end()
+                continue
+            metric_id = self._metric_of_term[match.group(1).lower()]
+            if metric_id not in found:
+                found.append(metric_id)
+        return found
+
+    def ratio_inputs(self) -> Dict[str, List[str]]:
+        """Metric id -> line item names trusted as ratio inputs, for metrics that have any"""
+        return {metric.id: list(metric.ratio_inputs) for metric in self.metrics.values() if metric.ratio_inputs}
+
+    def line_item_mapping(self) -> Dict[str, str]:
+        """Every catalogued line item name -> metric id (for backfilling stored rows)"""
+        return dict(self._metric_of_line_item)
+
+
+# Global instance
+metric_catalog = MetricCatalog(METRICS)
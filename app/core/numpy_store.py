@@ -0,0 +1,487 @@
+import asyncio
+import glob
+import hashlib
+import json
+import logging
+import os
+import re
+import threading
+from typing import Any, Dict, List, Optional, Set
+
+import numpy as np
+
+from app.core.config import get_settings
+
+settings = get_settings()
+logger = logging.getLogger(__name__)
+
+
+QUANTIZATION_MODES = ("none", "float16", "int8")
+
+# Rows scored per block when dequantizing, bounding temporary float32 memory
+_SCORE_BLOCK_ROWS = 4096
+
+
+def quantize(vectors: np.ndarray, mode: str):
+    """
+    Compress float32 vectors for resident storage.
+
+    Args:
+        vectors: (n, dim) float32 matrix
+        mode: "float16", or "int8" (symmetric, one float32 scale per vector)
+
+    Returns:
+        Tuple of (codes, scales); scales is None for float16
+    """
+    vectors = np.asarray(vectors, dtype=np.float32)
+    if mode == "float16":
+        return vectors.astype(np.float16), None
+    scales = np.abs(vectors).max(axis=1) / 127.0
+    scales = np.maximum(scales, 1e-12).astype(np.float32)
+    codes = np.clip(np.rint(vectors / scales[:, None]), -127, 127).astype(np.int8)
+    return codes, scales
+
+
+def quantized_scores(codes: np.ndarray, scales: Optional[np.ndarray], query: np.ndarray) -> np.ndarray:
+    """Approximate dot products of `query` against quantized rows, block by block"""
+    scores = np.empty(codes.shape[0], dtype=np.float32)
+    for start in range(0, codes.shape[0], _SCORE_BLOCK_ROWS):
+        block = codes[start:start + _SCORE_BLOCK_ROWS].astype(np.float32)
+        scores[start:start + block.shape[0]] = block @ query
+    if scales is not None:
+        scores *= scales
+    return scores
+
+
+class _Partition:
+    """One ticker's chunks: a contiguous float32 matrix plus row-aligned records"""
+
+    def __init__(self, ticker: str):
+        self.ticker = ticker
+        self.ids: List[str] = []
+        self.texts: List[str] = []
+        self.metadatas: List[Dict[str, Any]] = []
+        self.row_of: Dict[str, int] = {}
+        self.matrix: Optional[np.ndarray] = None  # memmap when persisted, ndarray otherwise
+        self.generation = 0  # Suffix of the data files the meta file currently points to
+        # Resident reduced-precision copy of `matrix` (quantized modes only)
+        self.codes: Optional[np.ndarray] = None
+        self.scales: Optional[np.ndarray] = None
+        # field -> value -> row offsets, built on first filter by that field
+        self.offsets: Dict[str, Dict[Any, np.ndarray]] = {}
+
+    def __len__(self):
+        return len(self.ids)
+
+    def rows_for(self, where: Dict[str, Any]) -> Optional[np.ndarray]:
+        """Row offsets matching every equality in `where` (None means all rows)"""
+        rows = None
+        for field, value in where.items():
+            if field not in self.offsets:
+                groups: Dict[Any, List[int]] = {}
+                for i, metadata in enumerate(self.metadatas):
+                    groups.setdefault(metadata.get(field), []).append(i)
+                self.offsets[field] = {k: np.asarray(v, dtype=np.int64) for k, v in groups.items()}
+            matched = self.offsets[field].get(value, np.empty(0, dtype=np.int64))
+            rows = matched if rows is None else np.intersect1d(rows, matched, assume_unique=True)
+        return rows
+
+
+class NumpyVectorIndex:
+    """
+    Embedded exact-search vector index with no SQLite dependency.
+
+    Each ticker is a partition whose embeddings are one contiguous float32
+    matrix in a memory-mapped file (`<partition>.<generation>.vec`,
+    append-only) with the documents and metadata alongside (`.jsonl`). Top-k
+    is a single vectorized dot product over L2-normalised rows, and metadata
+    filters are served from precomputed per-field row offsets.
+
+    A small `<partition>.meta.json` (ticker, dim, committed row count and
+    generation) is replaced atomically after every write and is the commit
+    point: appends write rows to both data files first, so rows past the
+    committed count (left by a crash) are trimmed on load, and deletes write
+    a new generation of files before switching the meta file to it.
+
+    With `quantization` set to "float16" or "int8", a compressed copy of each
+    matrix is what stays resident and is scanned; the float32 rows remain in
+    the memory-mapped file and only the top `rescore_factor * k` candidates
+    are read back to rescore at full precision.
+
+    If the index directory is not writable (read-only or ephemeral disks) the
+    index keeps working purely in memory.
+    """
+
+    requires_embeddings = True
+
+    def __init__(self, index_dir: Optional[str] = None, quantization: Optional[str] = None, rescore_factor: Optional[int] = None):
+        self.index_dir = index_dir or settings.NUMPY_INDEX_DIR
+        self.quantization = (quantization or settings.VECTOR_QUANTIZATION).lower()
+        if self.quantization not in QUANTIZATION_MODES:
+            raise ValueError(f"Unsupported VECTOR_QUANTIZATION '{self.quantization}', expected one of {QUANTIZATION_MODES}")
+        self.rescore_factor = max(rescore_factor or settings.VECTOR_RESCORE_FACTOR, 1)
+        self.dim: Optional[int] = None
+        self._partitions: Dict[str, _Partition] = {}
+        self._lock = threading.Lock()
+
+        try:
+            os.makedirs(self.index_dir, exist_ok=True)
+            self.persistent = os.access(self.index_dir, os.W_OK)
+        except OSError:
+            self.persistent = False
+        if not self.persistent:
+            logger.warning(f"Vector index dir '{self.index_dir}' not writable; using in-memory index")
+
+        # Instrumentation
+        self._queries = 0
+
+    # ------------------------------------------------------------------ files
+
+    def _base(self, ticker: str) -> str:
+        """
+        File prefix for a ticker: sanitized name plus a short hash of the raw
+        ticker (as in ChromaBackend.partition_name), so "TCS.NS" and "TCS_NS"
+        do not share files.
+        """
+        safe = re.sub(r"[^A-Za-z0-9._-]", "_", ticker)
+        digest = hashlib.sha1(ticker.encode()).hexdigest()[:8]
+        return os.path.join(self.index_dir, f"{safe}_{digest}")
+
+    def _paths(self, ticker: str, generation: int):
+        base = f"{self._base(ticker)}.{generation}"
+        return base + ".vec", base + ".jsonl"
+
+    def _meta_path(self, ticker: str) -> str:
+        return self._base(ticker) + ".meta.json"
+
+    def _map_matrix(self, vec_path: str, rows: int) -> Optional[np.ndarray]:
+        if rows == 0 or not self.dim:
+            return None
+        return np.memmap(vec_path, dtype=np.float32, mode="r", shape=(rows, self.dim))
+
+    @staticmethod
+    def _sync_file(f):
+        f.flush()
+        os.fsync(f.fileno())
+
+    def _commit(self, partition: _Partition):
+        """Atomically record the partition's row count and generation (the commit point)"""
+        meta_path = self._meta_path(partition.ticker)
+        with open(meta_path + ".tmp", "w", encoding="utf-8") as f:
+            json.dump({
+                "ticker": partition.ticker,
+                "dim": self.dim,
+                "count": len(partition.ids),
+                "generation": partition.generation
+            }, f)
+            self._sync_file(f)
+        os.replace(meta_path + ".tmp", meta_path)
+
+    def _remove_generations(self, ticker: str, keep: Optional[int] = None):
+        """Delete data files of every generation except `keep`"""
+        base = glob.escape(self._base(ticker))
+        for path in glob.glob(base + ".*.vec") + glob.glob(base + ".*.jsonl"):
+            generation = path[len(self._base(ticker)) + 1:].split(".")[0]
+            if generation.isdigit() and int(generation) != keep:
+                os.remove(path)
+
+    def _read_meta(self, ticker: str) -> Optional[Dict[str, Any]]:
+        meta_path = self._meta_path(ticker)
+        if not os.path.exists(meta_path):
+            return None
+        with open(meta_path, "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    def _load(self, partition: _Partition):
+        """Read a partition's committed rows, trimming rows a crash left uncommitted"""
+        ticker = partition.ticker
+        meta = self._read_meta(ticker)
+        if meta is None:
+            return
+        count, generation = meta["count"], meta["generation"]
+        partition.generation = generation
+        self._remove_generations(ticker, keep=generation)
+        if meta["dim"]:
+            if self.dim and self.dim != meta["dim"]:
+                raise ValueError(f"Vector partition {ticker} has dim {meta['dim']}, index has {self.dim}")
+            self.dim = meta["dim"]
+
+        vec_path, docs_path = self._paths(ticker, generation)
+        records, offset = [], 0
+        if os.path.exists(docs_path):
+            with open(docs_path, "rb") as f:
+                while len(records) < count:
+                    line = f.readline()
+                    if not line.endswith(b"\n"):
+                        break
+                    records.append(json.loads(line))
+                    offset += len(line)
+        vec_bytes = count * (self.dim or 0) * 4
+        vec_size = os.path.getsize(vec_path) if os.path.exists(vec_path) else 0
+
+        if len(records) < count or vec_size < vec_bytes:
+            # Committed rows missing: not produced by any crash order, so the files were damaged
+            logger.error(f"Vector partition {ticker} is missing committed rows; discarding it, re-ingest the company")
+            partition.generation = generation + 1
+            self._remove_generations(ticker, keep=None)
+            os.remove(self._meta_path(ticker))
+            return
+
+        # Drop rows written after the last commit so later appends stay aligned
+        if os.path.exists(docs_path) and os.path.getsize(docs_path) > offset:
+            os.truncate(docs_path, offset)
+        if vec_size > vec_bytes:
+            os.truncate(vec_path, vec_bytes)
+
+        for record in records:
+            partition.row_of[record["id"]] = len(partition.ids)
+            partition.ids.append(record["id"])
+            partition.texts.append(record["text"])
+            partition.metadatas.append(record["metadata"])
+        partition.matrix = self._map_matrix(vec_path, len(partition.ids))
+        if partition.matrix is not None and self.quantization != "none":
+            partition.codes, partition.scales = quantize(partition.matrix, self.quantization)
+
+    def _partition(self, ticker: str) -> _Partition:
+        """Load a ticker's partition on first access (must hold the lock)"""
+        partition = self._partitions.get(ticker)
+        if partition is not None:
+            return partition
+
+        partition = _Partition(ticker)
+        if self.persistent:
+            self._load(partition)
+        self._partitions[ticker] = partition
+        return partition
+
+    def _rewrite(self, partition: _Partition, matrix: Optional[np.ndarray]):
+        """Write the given rows as a new generation and switch to it (used for deletes)"""
+        old_generation = partition.generation
+        partition.generation += 1
+        vec_path, docs_path = self._paths(partition.ticker, partition.generation)
+        partition.matrix = None  # Release the old mapping before its file is removed
+        with open(vec_path, "wb") as f:
+            if matrix is not None:
+                f.write(np.ascontiguousarray(matrix, dtype=np.float32).tobytes())
+            self._sync_file(f)
+        with open(docs_path, "w", encoding="utf-8") as f:
+            for chunk_id, text, metadata in zip(partition.ids, partition.texts, partition.metadatas):
+                f.write(json.dumps({"id": chunk_id, "text": text, "metadata": metadata}) + "\n")
+            self._sync_file(f)
+        self._commit(partition)
+        for path in self._paths(partition.ticker, old_generation):
+            if os.path.exists(path):
+                os.remove(path)
+        partition.matrix = self._map_matrix(vec_path, len(partition.ids))
+
+    # ------------------------------------------------------------- sync core
+
+    @staticmethod
+    def _normalize(vectors: np.ndarray) -> np.ndarray:
+        norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+        return vectors / np.maximum(norms, 1e-12)
+
+    def _existing_sync(self, ticker: str, ids: List[str]) -> Set[str]:
+        with self._lock:
+            partition = self._partition(ticker)
+            return {chunk_id for chunk_id in ids if chunk_id in partition.row_of}
+
+    def _add_sync(self, ticker: str, ids, texts, metadatas, embeddings):
+        vectors = self._normalize(np.asarray(embeddings, dtype=np.float32))
+        with self._lock:
+            partition = self._partition(ticker)
+            if self.dim is None:
+                self.dim = vectors.shape[1]
+
+            keep = [i for i, chunk_id in enumerate(ids) if chunk_id not in partition.row_of]
+            if not keep:
+                return
+            vectors = vectors[keep]
+
+            for i in keep:
+                partition.row_of[ids[i]] = len(partition.ids)
+                partition.ids.append(ids[i])
+                partition.texts.append(texts[i])
+                partition.metadatas.append(metadatas[i])
+            partition.offsets.clear()
+
+            if self.persistent:
+                # Rows first, then the meta commit: a crash in between leaves
+                # uncommitted rows that the next load trims
+                vec_path, docs_path = self._paths(ticker, partition.generation)
+                with open(vec_path, "ab") as f:
+                    f.write(np.ascontiguousarray(vectors).tobytes())
+                    self._sync_file(f)
+                with open(docs_path, "a", encoding="utf-8") as f:
+                    for i in keep:
+                        f.write(json.dumps({"id": ids[i], "text": texts[i], "metadata": metadatas[i]}) + "\n")
+                    self._sync_file(f)
+                self._commit(partition)
+                partition.matrix = self._map_matrix(vec_path, len(partition.ids))
+            else:
+                partition.matrix = vectors if partition.matrix is None else np.vstack([partition.matrix, vectors])
+
+            if self.quantization != "none":
+                codes, scales = quantize(vectors, self.quantization)
+                if partition.codes is None:
+                    partition.codes, partition.scales = codes, scales
+                else:
+                    partition.codes = np.concatenate([partition.codes, codes])
+                    if scales is not None:
+                        partition.scales = np.concatenate([partition.scales, scales])
+
+    def _delete_stale_sync(self, ticker: str, keep_ids: Set[str]) -> int:
+        with self._lock:
+            partition = self._partition(ticker)
+            keep_rows = [i for i, chunk_id in enumerate(partition.ids) if chunk_id in keep_ids]
+            removed = len(partition.ids) - len(keep_rows)
+            if not removed:
+                return 0
+
+            matrix = np.asarray(partition.matrix[keep_rows]) if keep_rows else None
+            partition.ids = [partition.ids[i] for i in keep_rows]
+            partition.texts = [partition.texts[i] for i in keep_rows]
+            partition.metadatas = [partition.metadatas[i] for i in keep_rows]
+            partition.row_of = {chunk_id: i for i, chunk_id in enumerate(partition.ids)}
+            partition.offsets.clear()
+
+            if partition.codes is not None:
+                partition.codes = partition.codes[keep_rows] if keep_rows else None
+                if partition.scales is not None:
+                    partition.scales = partition.scales[keep_rows] if keep_rows else None
+
+            if self.persistent:
+                self._rewrite(partition, matrix)
+            else:
+                partition.matrix = matrix
+            return removed
+
+    def _query_sync(self, ticker: str, embedding, n_results: int, where: Dict[str, Any]) -> List[Dict]:
+        query = self._normalize(np.asarray(embedding, dtype=np.float32).reshape(-1))
+        with self._lock:
+            self._queries += 1
+            partition = self._partition(ticker)
+            if not len(partition) or partition.matrix is None:
+                return []
+
+            rows = partition.rows_for(where) if where else None
+            if rows is not None and rows.size == 0:
+                return []
+
+            if self.quantization == "none":
+                candidates = np.arange(len(partition)) if rows is None else rows
+                matrix = partition.matrix if rows is None else partition.matrix[rows]
+                scores = matrix @ query
+            else:
+                # 1. Approximate scan over the resident quantized copy
+                codes = partition.codes if rows is None else partition.codes[rows]
+                scales = partition.scales
+                if scales is not None and rows is not None:
+                    scales = scales[rows]
+                approx = quantized_scores(codes, scales, query)
+                n_candidates = min(n_results * self.rescore_factor, approx.shape[0])
+                shortlist = np.argpartition(-approx, n_candidates - 1)[:n_candidates]
+                candidates = shortlist if rows is None else rows[shortlist]
+                # 2. Rescore the shortlist at full precision (reads only these rows)
+                candidates = np.sort(candidates)
+                scores = np.asarray(partition.matrix[candidates]) @ query
+
+            k = min(n_results, scores.shape[0])
+            top = np.argpartition(-scores, k - 1)[:k]
+            top = top[np.argsort(-scores[top])]
+
+            results = []
+            for i in top:
+                row = int(candidates[i])
+                results.append({
+                    "text": partition.texts[row],
+                    "metadata": partition.metadatas[row],
+                    "distance": float(1.0 - scores[i])
+                })
+            return results
+
+    # ------------------------------------------------------------ async API
+
+    async def existing_ids(self, ticker: str, ids: List[str]) -> Set[str]:
+        return await asyncio.to_thread(self._existing_sync, ticker, ids)
+
+    async def add(self, ticker: str, ids: List[str], texts: List[str], metadatas: List[Dict[str, Any]], embeddings):
+        await asyncio.to_thread(self._add_sync, ticker, ids, texts, metadatas, embeddings)
+
+    async def delete_stale(self, ticker: str, keep_ids: Set[str]) -> int:
+        return await asyncio.to_thread(self._delete_stale_sync, ticker, keep_ids)
+
+    async def flush(self, ticker: str):
+        """Nothing buffered: every add is committed as it is written"""
+
+    async def query(self, ticker: str, query_text: str, embedding, n_results: int, where: Dict[str, Any]) -> List[Dict]:
+        if ticker is None:
+            # Partitioned by ticker: there is no global index to scan
+            logger.warning("Numpy vector index queried without a ticker filter")
+            return []
+        return await asyncio.to_thread(self._query_sync, ticker, embedding, n_results, where)
+
+    def _drop_sync(self, ticker: str) -> int:
+        with self._lock:
+            partition = self._partition(ticker)
+            count = len(partition)
+            partition.matrix = None
+            self._partitions.pop(ticker, None)
+            if self.persistent:
+                meta_path = self._meta_path(ticker)
+                if os.path.exists(meta_path):
+                    os.remove(meta_path)
+                self._remove_generations(ticker, keep=None)
+            return count
+
+    def _partition_stats_sync(self) -> Dict[str, int]:
+        with self._lock:
+            stats = {ticker: len(p) for ticker, p in self._partitions.items()}
+            if not self.persistent:
+                return stats
+            # Partitions on disk that this process has not loaded yet (committed counts)
+            for filename in os.listdir(self.index_dir):
+                if not filename.endswith(".meta.json"):
+                    continue
+                with open(os.path.join(self.index_dir, filename), "r", encoding="utf-8") as f:
+                    meta = json.load(f)
+                stats.setdefault(meta["ticker"], meta["count"])
+            return stats
+
+    async def drop_partition(self, ticker: str) -> int:
+        """Delete one ticker's partition; returns the number of chunks dropped"""
+        return await asyncio.to_thread(self._drop_sync, ticker)
+
+    async def partition_stats(self) -> Dict[str, int]:
+        """Chunk count per ticker partition"""
+        return await asyncio.to_thread(self._partition_stats_sync)
+
+    def resident_bytes(self) -> int:
+        """
+        Bytes of vector data held in process memory.
+
+        Memory-mapped float32 files are excluded when a quantized copy is what
+        gets scanned; without a writable disk the float32 rows stay in memory.
+        """
+        total = 0
+        for partition in self._partitions.values():
+            if self.quantization != "none":
+                total += partition.codes.nbytes if partition.codes is not None else 0
+                total += partition.scales.nbytes if partition.scales is not None else 0
+                if self.persistent:
+                    continue
+            if partition.matrix is not None:
+                total += partition.matrix.nbytes
+        return total
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get index statistics."""
+        return {
+            "backend": "numpy",
+            "persistent": self.persistent,
+            "quantization": self.quantization,
+            "resident_vector_bytes": self.resident_bytes(),
+            "dim": self.dim,
+            "queries": self._queries,
+            "loaded_partitions": {ticker: len(p) for ticker, p in self._partitions.items()},
+        }
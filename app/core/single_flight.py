@@ -0,0 +1,77 @@
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Hashable
+
+
+class SingleFlight:
+    """
+    Coalesces identical concurrent calls into one execution.
+
+    The first caller for a key (the leader) starts `fn()` as its own task;
+    callers arriving while it runs (followers) await the same future. The
+    result or exception reaches every caller and nothing is kept once the
+    call finishes, so this complements a cache rather than replacing it.
+    All access happens on the event loop, so no lock is needed.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self._calls: Dict[Hashable, asyncio.Future] = {}
+
+        # Instrumentation
+        self._requests = 0
+        self._executions = 0
+        self._coalesced = 0
+        self._errors = 0
+
+    def in_flight(self, key: Hashable) -> bool:
+        return key in self._calls
+
+    def future(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> asyncio.Future:
+        """
+        Future of the call for a key, starting `fn()` if none is running.
+
+        Await it through asyncio.shield so a cancelled caller does not cancel
+        the call other callers are waiting on.
+        """
+        self._requests += 1
+        pending = self._calls.get(key)
+        if pending is not None:
+            self._coalesced += 1
+            return pending
+
+        self._executions += 1
+        pending = asyncio.ensure_future(fn())
+        self._calls[key] = pending
+        pending.add_done_callback(lambda future: self._finish(key, future))
+        return pending
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        Run `fn()` once for all concurrent callers with the same key.
+
+        Args:
+            key: Identity of the call
+            fn: Coroutine factory performing the call
+
+        Returns:
+            The shared result (exceptions are raised to every caller)
+        """
+        return await asyncio.shield(self.future(key, fn))
+
+    def _finish(self, key: Hashable, future: asyncio.Future):
+        self._calls.pop(key, None)
+        # Retrieving the exception also keeps asyncio from logging it when no caller is left
+        if not future.cancelled() and future.exception() is not None:
+            self._errors += 1
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get coalescing statistics."""
+        return {
+            "name": self.name,
+            "requests": self._requests,
+            "executions": self._executions,
+            "coalesced": self._coalesced,
+            "errors": self._errors,
+            "in_flight": len(self._calls),
+            "coalesced_rate": round(self._coalesced / self._requests, 4) if self._requests else 0.0,
+        }
@@ -0,0 +1,109 @@
+import asyncio
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, Tuple
+
+from app.core.single_flight import SingleFlight
+
+
+class TTLCache:
+    """
+    Bounded LRU cache whose entries expire after a fixed time to live.
+
+    Intended for results of slow async calls on the event loop (all access
+    happens on the loop, so no lock is needed). After a miss, `load` shares
+    one in-flight load between concurrent callers asking for the same key; a
+    failed load is not cached and its error reaches every waiter.
+    """
+
+    def __init__(self, max_entries: int, ttl_seconds: float, clock: Callable[[], float] = time.monotonic,
+                 name: str = "ttl_cache"):
+        self.max_entries = max(int(max_entries), 0)
+        self.ttl_seconds = ttl_seconds
+        self._clock = clock
+
+        self._entries: "OrderedDict[Hashable, Tuple[float, Any]]" = OrderedDict()
+        self.flights = SingleFlight(name)
+
+        # Instrumentation
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+        self._expirations = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_entries > 0 and self.ttl_seconds > 0
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """
+        Look up a live entry.
+
+        Args:
+            key: Cache key
+            default: Returned when the key is missing or expired
+
+        Returns:
+            Cached value or default
+        """
+        entry = self._entries.get(key)
+        if entry is None:
+            self._misses += 1
+            return default
+        expires_at, value = entry
+        if expires_at <= self._clock():
+            del self._entries[key]
+            self._expirations += 1
+            self._misses += 1
+            return default
+        self._entries.move_to_end(key)
+        self._hits += 1
+        return value
+
+    def put(self, key: Hashable, value: Any):
+        """Store a value, evicting least recently used entries over the cap"""
+        if not self.enabled:
+            return
+        self._entries.pop(key, None)
+        self._entries[key] = (self._clock() + self.ttl_seconds, value)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self._evictions += 1
+
+    def load(self, key: Hashable, loader: Callable[[], Awaitable[Any]]) -> asyncio.Future:
+        """
+        Future of the in-flight load for a key, starting `loader()` if none is running.
+
+        For callers that have just missed with get(); the value is cached when
+        the load succeeds. Await it through asyncio.shield so cancelling one
+        waiter does not cancel the shared load.
+        """
+        return self.flights.future(key, lambda: self._load(key, loader))
+
+    async def _load(self, key: Hashable, loader: Callable[[], Awaitable[Any]]) -> Any:
+        value = await loader()
+        self.put(key, value)
+        return value
+
+    def invalidate(self, key: Optional[Hashable] = None):
+        """Drop one key, or every entry when key is None"""
+        if key is None:
+            self._entries.clear()
+        else:
+            self._entries.pop(key, None)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get cache statistics."""
+        lookups = self._hits + self._misses
+        return {
+            "enabled": self.enabled,
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl_seconds,
+            "hits": self._hits,
+            "misses": self._misses,
+            "evictions": self._evictions,
+            "expirations": self._expirations,
+            "single_flight": self.flights.get_stats(),
+            "hit_rate": round(self._hits / lookups, 4) if lookups else 0.0,
+        }
@@ -1,121 +1,308 @@
 import sys
+import json
+import asyncio
+import logging
 from app.core.config import get_settings
-from typing import List, Dict, Any
+from app.core.deadline import Deadline, DeadlineExceeded
+from app.core.chroma_store import ChromaBackend
+from app.core.numpy_store import NumpyVectorIndex
+from app.core.bm25_store import BM25Index
+from app.core.embedding_batcher import EmbeddingBatcher
+from app.core.embedding_cache import EmbeddingCache
+from app.core.single_flight import SingleFlight
+from itertools import islice
+from typing import List, Dict, Any, Optional, Set, Iterable, Tuple
 
 settings = get_settings()
+logger = logging.getLogger(__name__)
 
 class VectorStore:
     def __init__(self):
-        # We generally don't initialize PersistentClient here to avoid
-        # "SQLite objects created in a thread can only be used in that same thread"
         self.settings = settings
         self.embedding_fn = None
-        
+        self.batcher = None
+        self.query_cache = EmbeddingCache(
+            model_name=self.settings.EMBEDDING_MODEL,
+            max_bytes=int(self.settings.EMBEDDING_CACHE_MAX_MB * 1024 * 1024)
+        )
+        # Coalesces concurrent identical searches into one
+        self.flights = SingleFlight("vector_search")
+
         import os
         self.is_cloud = sys.platform == "win32" or os.getenv("RENDER") or os.getenv("RAILWAY_ENVIRONMENT")
-        
-        # Only load heavy embedding model if NOT on cloud
-        if not self.is_cloud:
+
+        # Backend selection: "chroma" (default), "numpy" (embedded, no SQLite) or "bm25" (lexical)
+        self.store_type = self.settings.VECTOR_STORE_TYPE.lower()
+        if self.store_type == "chroma" and self.is_cloud and self.settings.LEXICAL_FALLBACK:
+            # Chroma and the embedding model are off on cloud/windows: serve lexical retrieval instead
+            self.store_type = "bm25"
+
+        if self.store_type == "numpy":
+            self.backend = NumpyVectorIndex(self.settings.NUMPY_INDEX_DIR)
+            # No SQLite / persistent disk requirement, so it runs on cloud too
+            self.enabled = True
+        elif self.store_type == "bm25":
+            self.backend = BM25Index(self.settings.BM25_INDEX_DIR)
+            self.enabled = True
+        else:
+            # The PersistentClient is owned by ChromaClientManager's dedicated thread to avoid
+            # "SQLite objects created in a thread can only be used in that same thread"
+            self.backend = ChromaBackend(self.settings.CHROMA_PERSIST_DIR)
+            # Skip on cloud platforms (ChromaDB requires persistent filesystem)
+            self.enabled = not self.is_cloud
+
+        # Only load heavy embedding model if the backend is usable here and needs it
+        if self.enabled and self.backend.requires_embeddings:
             from chromadb.utils import embedding_functions  # Lazy import
             self.embedding_fn = embedding_functions.SentenceTransformerEmbeddingFunction(
                 model_name=self.settings.EMBEDDING_MODEL
             )
+            # Concurrent queries share one forward pass
+            self.batcher = EmbeddingBatcher(
+                self.embedding_fn,
+                window_ms=self.settings.EMBEDDING_BATCH_WINDOW_MS,
+                max_batch_size=self.settings.EMBEDDING_BATCH_MAX_SIZE
+            )
 
-    def _get_collection_sync(self):
-        """Helper to get collection in the current thread context"""
-        import chromadb
-        # Create client inside the thread to satisfy SQLite requirements
-        client = chromadb.PersistentClient(path=self.settings.CHROMA_PERSIST_DIR)
-        
-        # Safe access to embedding_fn (might be None on cloud)
-        # Note: In cloud mode, this method shouldn't be called anyway, 
-        # but if it is, we pass None which might fail if used for add/query without embeddings
-        return client.get_or_create_collection(
-            name="financial_data",
-            embedding_function=self.embedding_fn
-        )
+    async def add_texts(self, texts: List[str], metadatas: List[Dict[str, Any]], ids: Optional[List[str]] = None) -> Dict[str, int]:
+        """
+        Upsert texts and metadata into the vector store (Non-blocking).
+
+        With deterministic `ids`, chunks already present are skipped before
+        embedding, so re-ingesting unchanged data costs a single id lookup.
+
+        Returns:
+            Dict with "added" and "skipped" chunk counts
 
-    async def add_texts(self, texts: List[str], metadatas: List[Dict[str, Any]]):
-        """Add texts and metadata to the vector store (Non-blocking)"""
-        if not texts:
-            return
+        Raises:
+            ValueError: If any metadata lacks a "ticker" (nothing is written)
+        """
+        counts = {"added": 0, "skipped": 0}
+        if not texts or not self.enabled:
+            return counts
 
-        if self.is_cloud:
-            return
-            
         import uuid
-        import asyncio
-        ids = [str(uuid.uuid4()) for _ in texts]
-        
-        # 1. Generate embeddings explicitly (avoid passing model object to worker thread implicitly)
-        # Run inference in a thread
-        embeddings = await asyncio.to_thread(self.embedding_fn, texts)
-        
-        def _add_sync(embeddings_list):
-            import chromadb
-            client = chromadb.PersistentClient(path=self.settings.CHROMA_PERSIST_DIR)
-            # Use None for embedding_function to prevent internal calls/state issues
-            collection = client.get_or_create_collection(
-                name="financial_data",
-                embedding_function=None 
-            )
-            collection.add(
-                documents=texts,
-                metadatas=metadatas,
-                ids=ids,
-                embeddings=embeddings_list
+        if ids is None:
+            ids = [str(uuid.uuid4()) for _ in texts]
+
+        # Chunks are routed per ticker (taken from their metadata); storage is
+        # partitioned by ticker, so a chunk without one has nowhere to go
+        missing = [ids[i] for i, metadata in enumerate(metadatas) if not metadata.get("ticker")]
+        if missing:
+            raise ValueError(f"{len(missing)} chunk(s) have no 'ticker' in their metadata (first id: {missing[0]})")
+        by_ticker: Dict[str, List[int]] = {}
+        for i, metadata in enumerate(metadatas):
+            by_ticker.setdefault(metadata["ticker"], []).append(i)
+
+        for ticker, positions in by_ticker.items():
+            # 1. Drop chunks that are already stored (or repeated within this call)
+            new_positions = await self._filter_new(ticker, ids, positions, set())
+            counts["skipped"] += len(positions) - len(new_positions)
+            if not new_positions:
+                continue
+
+            new_texts = [texts[i] for i in new_positions]
+
+            # 2. Generate embeddings explicitly (avoid passing model object to worker thread implicitly)
+            # Run inference in a thread
+            embeddings = await self._embed_documents(new_texts)
+
+            # 3. Write to the backend
+            await self.backend.add(
+                ticker,
+                [ids[i] for i in new_positions],
+                new_texts,
+                [metadatas[i] for i in new_positions],
+                embeddings
             )
-        
-        # 2. Add to ChromaDB
-        import os
-        is_cloud = sys.platform == "win32" or os.getenv("RENDER") or os.getenv("RAILWAY_ENVIRONMENT")
-        if is_cloud:
-            # Skip on cloud platforms (ChromaDB requires persistent filesystem)
-            return
-        else:
-            await asyncio.to_thread(_add_sync, embeddings)
+            counts["added"] += len(new_positions)
+
+        for ticker in by_ticker:
+            await self.backend.flush(ticker)
+        return counts
+
+    async def _embed_documents(self, texts: List[str]):
+        """Embed chunk texts in a worker thread (None for backends that do not use vectors)"""
+        if not self.backend.requires_embeddings:
+            return None
+        return await asyncio.to_thread(self.embedding_fn, texts)
+
+    async def _filter_new(self, ticker: Optional[str], ids: List[str], positions: List[int], seen: Set[str]) -> List[int]:
+        """Positions whose ids are neither stored in the backend nor already in `seen` (updated in place)"""
+        if not positions:
+            return []
+        existing = await self.backend.existing_ids(ticker, [ids[i] for i in positions])
+        new_positions = []
+        for i in positions:
+            if ids[i] in seen or ids[i] in existing:
+                seen.add(ids[i])
+                continue
+            seen.add(ids[i])
+            new_positions.append(i)
+        return new_positions
+
+    async def add_chunk_stream(self, ticker: str, chunks: Iterable[Tuple[str, str, Dict[str, Any]]],
+                               batch_size: Optional[int] = None) -> Dict[str, int]:
+        """
+        Ingest a ticker's chunks from an iterator in fixed-size batches, then
+        remove that ticker's chunks the stream no longer produced.
+
+        Only one batch of texts and embeddings is held at a time, so peak
+        memory is flat regardless of company size. Embedding batch N runs
+        while batch N-1 is still being written to the backend.
+
+        Args:
+            ticker: Company ticker all chunks belong to
+            chunks: Iterable of (chunk_id, text, metadata)
+            batch_size: Chunks per batch (defaults to INGESTION_EMBED_BATCH_SIZE)
+
+        Returns:
+            Dict with "chunks", "added", "skipped" and "removed" counts
+        """
+        batch_size = max(batch_size or self.settings.INGESTION_EMBED_BATCH_SIZE, 1)
+        counts = {"chunks": 0, "added": 0, "skipped": 0, "removed": 0}
+        keep_ids: Set[str] = set()
+        pending_write = None
 
-    async def similarity_search(self, query: str, n_results: int = 5, filter: Dict = None) -> List[Dict]:
-        """Search for similar documents (Non-blocking)"""
-        # Quick exit if cloud/windows
-        if self.is_cloud:
+        iterator = iter(chunks)
+
+        async def _next_batch():
+            """Read the next batch and keep only chunks that still need embedding"""
+            batch = list(islice(iterator, batch_size))
+            counts["chunks"] += len(batch)
+            ids = [chunk_id for chunk_id, _, _ in batch]
+            if not self.enabled:
+                keep_ids.update(ids)
+                return batch, []
+            new_positions = await self._filter_new(ticker, ids, list(range(len(batch))), keep_ids)
+            counts["skipped"] += len(batch) - len(new_positions)
+            return batch, [batch[i] for i in new_positions]
+
+        try:
+            batch, new_chunks = await _next_batch()
+            while batch:
+                embeddings = None
+                if new_chunks:
+                    # Runs while the previous batch is still being written
+                    embeddings = await self._embed_documents([text for _, text, _ in new_chunks])
+
+                if pending_write is not None:
+                    await pending_write
+                    pending_write = None
+
+                # Look ahead before starting this write: the id lookup shares the
+                # backend's worker thread, so doing it later would block on the write
+                next_batch, next_new_chunks = await _next_batch()
+
+                if new_chunks:
+                    pending_write = asyncio.ensure_future(self.backend.add(
+                        ticker,
+                        [chunk_id for chunk_id, _, _ in new_chunks],
+                        [text for _, text, _ in new_chunks],
+                        [metadata for _, _, metadata in new_chunks],
+                        embeddings
+                    ))
+                    counts["added"] += len(new_chunks)
+
+                batch, new_chunks = next_batch, next_new_chunks
+
+            if pending_write is not None:
+                await pending_write
+        finally:
+            if pending_write is not None and not pending_write.done():
+                pending_write.cancel()
+
+        counts["removed"] = await self.delete_stale(ticker, keep_ids)
+        if self.enabled:
+            # Backends that buffer index state (BM25 postings) persist it once per ingestion
+            await self.backend.flush(ticker)
+        return counts
+
+    async def delete_stale(self, ticker: str, keep_ids: Set[str]) -> int:
+        """
+        Remove a ticker's chunks whose ids are not in `keep_ids`.
+
+        Args:
+            ticker: Company ticker whose chunks are reconciled
+            keep_ids: Ids produced by the latest ingestion
+
+        Returns:
+            Number of chunks removed
+        """
+        if not self.enabled:
+            return 0
+        return await self.backend.delete_stale(ticker, keep_ids)
+
+    async def drop_partition(self, ticker: str) -> int:
+        """
+        Delete all vectors for one ticker without touching other companies.
+
+        Returns:
+            Number of chunks dropped
+        """
+        if not self.enabled:
+            return 0
+        return await self.backend.drop_partition(ticker)
+
+    async def get_partition_stats(self) -> Dict[str, int]:
+        """Chunk count per ticker partition"""
+        if not self.enabled:
+            return {}
+        return await self.backend.partition_stats()
+
+    async def embed_query(self, query: str):
+        """Embed a query, reusing cached vectors for repeated questions"""
+        cached = self.query_cache.get(query)
+        if cached is not None:
+            return cached
+
+        # Micro-batched with concurrent requests
+        embedding = await self.batcher.embed(query)
+        return self.query_cache.put(query, embedding)
+
+    async def similarity_search(self, query: str, n_results: int = 5, filter: Dict = None,
+                                deadline: Optional[Deadline] = None) -> List[Dict]:
+        """
+        Search for similar documents (Non-blocking)
+
+        With a deadline, the search must finish ANSWER_RESERVE_MS before it
+        expires; otherwise it is abandoned and no documents are returned.
+        """
+        # Quick exit if the backend is disabled (cloud/windows with Chroma)
+        if not self.enabled:
              return []
-             
-        import asyncio
-        
+
+        key = (EmbeddingCache.normalize(query), n_results, json.dumps(filter or {}, sort_keys=True, default=str))
+        search = asyncio.shield(self.flights.future(key, lambda: self._search(query, n_results, filter)))
+        if deadline is None:
+            return await search
+        try:
+            return await deadline.run(search, reserve=settings.ANSWER_RESERVE_MS / 1000)
+        except DeadlineExceeded as e:
+            logger.warning(f"Vector search skipped: {e}")
+            deadline.note("vector")
+            return []
+
+    async def _search(self, query: str, n_results: int, filter: Optional[Dict]) -> List[Dict]:
+        where = dict(filter or {})
+        ticker = where.pop("ticker", None)
+
         # 1. Generate query embedding
-        query_embeddings = await asyncio.to_thread(self.embedding_fn, [query])
-        
-        def _search_sync(q_embeds):
-            import chromadb
-            client = chromadb.PersistentClient(path=self.settings.CHROMA_PERSIST_DIR)
-            collection = client.get_or_create_collection(
-                name="financial_data",
-                embedding_function=None
-            )
-            results = collection.query(
-                query_embeddings=q_embeds,
-                n_results=n_results,
-                where=filter
-            )
-            # Format results inside the thread
-            formatted_results = []
-            if results['documents']:
-                for i, doc in enumerate(results['documents'][0]):
-                    formatted_results.append({
-                        "text": doc,
-                        "metadata": results['metadatas'][0][i] if results['metadatas'] else {},
-                        "distance": results['distances'][0][i] if results['distances'] else 0.0
-                    })
-            return formatted_results
+        query_embedding = await self.embed_query(query) if self.backend.requires_embeddings else None
 
-        import os
-        is_cloud = sys.platform == "win32" or os.getenv("RENDER") or os.getenv("RAILWAY_ENVIRONMENT")
-        if is_cloud:
-             # Skip on cloud to prevent crashes
-             return []
-        else:
-             return await asyncio.to_thread(_search_sync, query_embeddings)
+        # 2. Search only this ticker's partition
+        return await self.backend.query(ticker, query, query_embedding, n_results, where)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get vector store statistics."""
+        return {
+            "enabled": self.enabled,
+            "store_type": self.store_type,
+            "backend": self.backend.get_stats(),
+            "embedding_batcher": self.batcher.get_stats() if self.batcher else None,
+            "query_embedding_cache": self.query_cache.get_stats(),
+            "single_flight": self.flights.get_stats()
+        }
 
 # Global instance
 vector_store = VectorStore()
@@ -0,0 +1,125 @@
+"""
+Vector Chunking Module
+
+Turns standardized financial statements into text chunks for the vector store.
+"""
+
+from typing import Dict, Iterator, List, Optional, Tuple
+import hashlib
+import json
+
+from app.core.config import get_settings
+from app.ingestion.data_normalizer import StandardizedFinancials, LineItem
+
+settings = get_settings()
+
+CHUNKING_STRATEGIES = ("period", "line_item")
+
+# (chunk_id, text, metadata)
+Chunk = Tuple[str, str, Dict]
+
+
+class FinancialChunker:
+    """
+    Builds vector chunks from financial statements.
+
+    Strategies:
+        period: one table-style chunk per (statement, period) listing its line
+            items, split into parts of at most `max_line_items` so each chunk
+            stays within the embedding model's input window.
+        line_item: one chunk per line item (the original behaviour).
+
+    Chunk ids are content hashes, so unchanged data maps to the same ids on
+    re-ingestion.
+    """
+
+    def __init__(self, strategy: Optional[str] = None, max_line_items: Optional[int] = None):
+        self.strategy = (strategy or settings.CHUNKING_STRATEGY).lower()
+        if self.strategy not in CHUNKING_STRATEGIES:
+            raise ValueError(f"Unsupported CHUNKING_STRATEGY '{self.strategy}', expected one of {CHUNKING_STRATEGIES}")
+        self.max_line_items = max(max_line_items or settings.CHUNK_MAX_LINE_ITEMS, 1)
+
+    def iter_chunks(self, company_id: int, company_name: str, ticker: str,
+                    financials_list: List[StandardizedFinancials]) -> Iterator[Chunk]:
+        """
+        Yield chunks one at a time.
+
+        Args:
+            company_id: Database id of the company
+            company_name: Display name used in chunk text
+            ticker: Company ticker symbol
+            financials_list: Normalized statements for the company
+
+        Returns:
+            Iterator of (chunk_id, text, metadata)
+        """
+        for fin in financials_list:
+            if self.strategy == "period":
+                yield from self._period_chunks(company_id, company_name, ticker, fin)
+            else:
+                yield from self._line_item_chunks(company_id, company_name, ticker, fin)
+
+    def _base_metadata(self, company_id: int, ticker: str, fin: StandardizedFinancials) -> Dict:
+        return {
+            "company_id": company_id,
+            "ticker": ticker,
+            "statement_type": fin.statement_type,
+            "period_type": fin.period_type,
+            "period_date": fin.period_date.isoformat(),
+        }
+
+    def _line_item_chunks(self, company_id: int, company_name: str, ticker: str,
+                          fin: StandardizedFinancials) -> Iterator[Chunk]:
+        # Create a chunk for each line item containing context
+        for item in fin.line_items:
+            # Text: "Company: TCS\nPeriod: 2023-03-31\n... Value: ..."
+            text = (
+                f"Company: {company_name} ({ticker})\n"
+                f"Period: {fin.period_date.strftime('%Y-%m-%d')} ({fin.period_type})\n"
+                f"Statement: {fin.statement_type}\n"
+                f"Line Item: {item.name}\n"
+                f"Value: {item.value:,.2f}"
+            )
+
+            metadata = self._base_metadata(company_id, ticker, fin)
+            metadata["line_item"] = item.name
+            metadata["numeric_value"] = float(item.value)
+
+            yield self.chunk_id(ticker, fin, [item]), text, metadata
+
+    def _period_chunks(self, company_id: int, company_name: str, ticker: str,
+                       fin: StandardizedFinancials) -> Iterator[Chunk]:
+        items = fin.line_items
+        parts = max((len(items) + self.max_line_items - 1) // self.max_line_items, 1)
+
+        for part in range(parts):
+            part_items = items[part * self.max_line_items:(part + 1) * self.max_line_items]
+            if not part_items:
+                continue
+
+            header = (
+                f"Company: {company_name} ({ticker})\n"
+                f"Period: {fin.period_date.strftime('%Y-%m-%d')} ({fin.period_type})\n"
+                f"Statement: {fin.statement_type}"
+            )
+            if parts > 1:
+                header += f" (part {part + 1} of {parts})"
+            rows = "\n".join(f"{item.name}: {item.value:,.2f}" for item in part_items)
+
+            metadata = self._base_metadata(company_id, ticker, fin)
+            # Chroma metadata must be scalar, so line-level data is kept as JSON for citation
+            metadata["line_items"] = json.dumps([[item.name, float(item.value)] for item in part_items])
+            metadata["line_item_count"] = len(part_items)
+
+            yield self.chunk_id(ticker, fin, part_items), f"{header}\n{rows}", metadata
+
+    @staticmethod
+    def chunk_id(ticker: str, fin: StandardizedFinancials, items: List[LineItem]) -> str:
+        """Deterministic chunk id: identical facts always map to the same vector"""
+        key = "|".join([
+            ticker,
+            fin.statement_type,
+            fin.period_type,
+            fin.period_date.strftime('%Y-%m-%d'),
+        ] + [f"{item.name}|{item.value:.2f}" for item in items])
+        return hashlib.sha256(key.encode()).hexdigest()[:32]
@@ -1,7 +1,7 @@
 from __future__ import annotations
 from typing import List, Dict
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
+from sqlalchemy import select, delete, event
 from sqlalchemy.dialects.postgresql import insert
 import logging
 
@@ -9,9 +9,13 @@ from app.ingestion.data_fetchers import YahooFinanceFetcher
 from app.ingestion.data_normalizer import DataNormalizer, StandardizedFinancials, LineItem
 from app.ingestion.ratio_calculator import RatioCalculator
 from app.ingestion.data_validator import DataValidator
+from app.ingestion.chunking import FinancialChunker
 from datetime import datetime
-from app.models.models import Company, FinancialStatement, FinancialLineItem
+from app.models.models import Company, FinancialStatement, FinancialLineItem, LatestFinancialSnapshot
 from app.core.vector_store import vector_store
+from app.retrieval.company_cache import company_cache
+from app.retrieval.financial_cube import financial_cube_cache
+from app.core.metric_catalog import metric_catalog
 
 logger = logging.getLogger(__name__)
 
@@ -22,9 +26,16 @@ class IngestionService:
         self.normalizer = DataNormalizer()
         self.ratio_calculator = RatioCalculator()
         self.validator = DataValidator()
+        self.chunker = FinancialChunker()
 
-    async def ingest_company(self, ticker: str):
-        """Full ingestion pipeline for a company"""
+    async def ingest_company(self, ticker: str, rebuild_vectors: bool = False):
+        """
+        Full ingestion pipeline for a company.
+
+        Args:
+            ticker: Company ticker symbol
+            rebuild_vectors: Drop this ticker's vector partition and re-embed everything
+        """
         
         # 1. Fetch Data
         raw_data = await self.fetcher.fetch_financials(ticker)
@@ -49,8 +60,6 @@ class IngestionService:
         # 3. Store in PostgreSQL
         company = await self._ingest_company_metadata(ticker, info)
         
-        chunks_to_embed = []
-        metadatas_to_embed = []
         calculated_ratios_count = 0
 
         # Group statements by period for ratio calculation
@@ -83,41 +92,31 @@ class IngestionService:
                         logger.info(f"Calculated {len(calculated_ratios)} ratios for {fin.statement_type} {fin.period_date}")
             except Exception as e:
                 logger.error(f"Error calculating ratios (non-blocking): {e}")
-            
-            # 4. Prepare Vector Chunks
-            # Create a chunk for each line item containing context
-            for item in fin.line_items:
-                # Text: "Company: TCS\nPeriod: 2023-03-31\n... Value: ..."
-                text = (
-                    f"Company: {company.name} ({ticker})\n"
-                    f"Period: {fin.period_date.strftime('%Y-%m-%d')} ({fin.period_type})\n"
-                    f"Statement: {fin.statement_type}\n"
-                    f"Line Item: {item.name}\n"
-                    f"Value: {item.value:,.2f}"
-                )
-                
-                metadata = {
-                    "company_id": company.id,
-                    "ticker": ticker,
-                    "statement_type": fin.statement_type,
-                    "period_type": fin.period_type,
-                    "period_date": fin.period_date.isoformat(),
-                    "line_item": item.name,
-                    "numeric_value": float(item.value)
-                }
-                
-                chunks_to_embed.append(text)
-                metadatas_to_embed.append(metadata)
 
-        # 5. Store in Vector DB
-        if chunks_to_embed:
-            await vector_store.add_texts(chunks_to_embed, metadatas_to_embed)
+        # 3.6. Refresh the latest-value snapshot served to "no year" questions
+        snapshot_rows = await self._refresh_snapshot(company.id)
+        logger.info(f"Refreshed latest snapshot for {ticker}: {snapshot_rows} line items")
+        
+        # Rebuild the in-memory cube from committed data only
+        self._invalidate_cube_on_commit(ticker)
+
+        # 4. Store in Vector DB: chunks are generated lazily and embedded in bounded batches
+        # (unchanged chunks are skipped, vanished ones removed)
+        if rebuild_vectors:
+            dropped = await vector_store.drop_partition(ticker)
+            logger.info(f"Dropped {dropped} vector chunks for {ticker} before rebuild")
+        vector_counts = await vector_store.add_chunk_stream(
+            ticker, self.chunker.iter_chunks(company.id, company.name, ticker, financials_list)
+        )
 
         return {
             "status": "success", 
             "company": company.name, 
             "statements": len(financials_list),
-            "chunks": len(chunks_to_embed),
+            "chunks": vector_counts["chunks"],
+            "chunks_added": vector_counts["added"],
+            "chunks_skipped": vector_counts["skipped"],
+            "chunks_removed": vector_counts["removed"],
             "calculated_ratios": calculated_ratios_count,
             "validation": validation_result
         }
@@ -139,8 +138,70 @@ class IngestionService:
         ).returning(Company)
         
         result = await self.db.execute(stmt)
+        # Name/sector may have changed (or the company is new): the query path reloads it
+        self._invalidate_company_on_commit(ticker)
         return result.scalar_one()
 
+    def _invalidate_company_on_commit(self, ticker: str):
+        """
+        Drop the ticker's cached company once this session commits (clearing it
+        before the commit would let a concurrent query cache the old row again)
+        """
+        def _invalidate(session):
+            company_cache.invalidate(ticker)
+        event.listen(self.db.sync_session, "after_commit", _invalidate, once=True)
+
+    def _invalidate_cube_on_commit(self, ticker: str):
+        """Drop the ticker's financial cube once this session commits"""
+        def _invalidate(session):
+            financial_cube_cache.invalidate(ticker)
+        event.listen(self.db.sync_session, "after_commit", _invalidate, once=True)
+
+    async def _refresh_snapshot(self, company_id: int) -> int:
+        """
+        Rebuild one company's rows in latest_financial_snapshots.
+
+        Keeps the most recent annual and quarterly value of every line item
+        (DISTINCT ON per period type and name), in the ingestion transaction.
+
+        Returns:
+            Number of snapshot rows written
+        """
+        latest = (
+            select(
+                FinancialStatement.company_id,
+                FinancialStatement.period_type,
+                FinancialLineItem.line_item_name,
+                FinancialLineItem.metric_id,
+                FinancialLineItem.line_item_value,
+                FinancialStatement.statement_type,
+                FinancialStatement.period_date,
+                FinancialStatement.fiscal_year,
+                FinancialStatement.fiscal_quarter
+            )
+            .join(FinancialStatement, FinancialLineItem.statement_id == FinancialStatement.id)
+            .where(FinancialStatement.company_id == company_id)
+            .distinct(FinancialStatement.period_type, FinancialLineItem.line_item_name)
+            .order_by(
+                FinancialStatement.period_type,
+                FinancialLineItem.line_item_name,
+                FinancialStatement.period_date.desc(),
+                FinancialStatement.statement_type
+            )
+        )
+        
+        await self.db.execute(delete(LatestFinancialSnapshot).where(LatestFinancialSnapshot.company_id == company_id))
+        result = await self.db.execute(
+            insert(LatestFinancialSnapshot).from_select(
+                [
+                    "company_id", "period_type", "line_item_name", "metric_id", "line_item_value",
+                    "statement_type", "period_date", "fiscal_year", "fiscal_quarter"
+                ],
+                latest
+            )
+        )
+        return result.rowcount
+
     async def _ingest_statement(self, company_id: int, fin: StandardizedFinancials) -> FinancialStatement:
         # Check existence first or use simple upsert logic
         # For statement, uniqueness is (company_id, statement_type, period_type, period_date)
@@ -172,6 +233,7 @@ class IngestionService:
                 "statement_id": statement_id,
                 "line_item_name": item.name,
                 "line_item_value": item.value,
+                "metric_id": metric_catalog.metric_for_line_item(item.name),
                 "currency": "INR" # Defaulting to INR for now, ideally fetch from info
             }
             for item in items
@@ -180,7 +242,7 @@ class IngestionService:
         stmt = insert(FinancialLineItem).values(values)
         stmt = stmt.on_conflict_do_update(
             constraint='uq_statement_line_item',
-            set_={"line_item_value": stmt.excluded.line_item_value}
+            set_={"line_item_value": stmt.excluded.line_item_value, "metric_id": stmt.excluded.metric_id}
         )
         
         await self.db.execute(stmt)
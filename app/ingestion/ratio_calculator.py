@@ -6,12 +6,17 @@ All ratios are computed outside the LLM to ensure accuracy.
 """
 
 from typing import Dict, List, Optional
+from app.core.metric_catalog import metric_catalog
 from app.ingestion.data_normalizer import StandardizedFinancials, LineItem
 import logging
 
 logger = logging.getLogger(__name__)
 
 
+def _normalize_name(name: str) -> str:
+    return " ".join(name.lower().split())
+
+
 class RatioCalculator:
     """
     Calculates financial ratios from standardized financial data.
@@ -19,29 +24,18 @@ class RatioCalculator:
     """
     
     def __init__(self):
-        # Mapping of common line item names to standardized keys
-        self.line_item_aliases = {
-            # Revenue variations
-            "total_revenue": ["Total Revenue", "Revenue", "Net Sales", "Total Sales", "Turnover"],
-            # Profit variations
-            "net_income": ["Net Income", "Net Profit", "Profit After Tax", "PAT", "Net Earnings"],
-            "operating_income": ["Operating Income", "Operating Profit", "EBIT"],
-            # Asset variations
-            "total_assets": ["Total Assets", "Total Asset"],
-            "current_assets": ["Current Assets", "Total Current Assets"],
-            # Liability variations
-            "total_liabilities": ["Total Liabilities", "Total Liability"],
-            "current_liabilities": ["Current Liabilities", "Total Current Liabilities"],
-            # Equity variations
-            "total_equity": ["Total Equity", "Stockholders Equity", "Shareholders Equity", 
-                           "Total Stockholders Equity", "Total Shareholders Equity"],
-            # Debt variations
-            "total_debt": ["Total Debt", "Long Term Debt", "Total Long Term Debt"],
-        }
+        # Metric id -> exact line item names trusted as inputs, preferred first.
+        # The catalogue lists more names per metric (e.g. "Operating Revenue");
+        # only its ratio_inputs subset is used here.
+        self.line_item_aliases = metric_catalog.ratio_inputs()
     
     def find_line_item_value(self, line_items: List[LineItem], target_key: str) -> Optional[float]:
         """
         Find a line item value using aliases.
+
+        Names must equal an alias (ignoring case and repeated whitespace), so
+        e.g. "Total Debt And Capital Lease Obligation" never stands in for
+        "Total Debt". Aliases are tried in order of preference.
         
         Args:
             line_items: List of LineItem objects
@@ -53,12 +47,14 @@ class RatioCalculator:
         if target_key not in self.line_item_aliases:
             return None
             
-        aliases = self.line_item_aliases[target_key]
-        
+        values = {}
         for item in line_items:
-            for alias in aliases:
-                if alias.lower() in item.name.lower() or item.name.lower() in alias.lower():
-                    return item.value
+            values.setdefault(_normalize_name(item.name), item.value)
+        
+        for alias in self.line_item_aliases[target_key]:
+            value = values.get(_normalize_name(alias))
+            if value is not None:
+                return value
         
         return None
     
@@ -138,7 +134,6 @@ class RatioCalculator:
                 total_debt = self.find_line_item_value(balance_sheet.line_items, "total_debt")
                 total_equity = self.find_line_item_value(balance_sheet.line_items, "total_equity")
                 total_assets = self.find_line_item_value(balance_sheet.line_items, "total_assets")
-                total_liabilities = self.find_line_item_value(balance_sheet.line_items, "total_liabilities")
                 
                 # Debt-to-Equity Ratio
                 if total_debt and total_equity and total_equity != 0:
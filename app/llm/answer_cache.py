@@ -0,0 +1,291 @@
+import asyncio
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+from app.core.config import get_settings
+
+settings = get_settings()
+logger = logging.getLogger(__name__)
+
+
+class SQLiteAnswerStore:
+    """
+    Answer store in a local SQLite file, shared by every worker on the host.
+
+    WAL mode lets readers proceed while another worker writes. Expiry uses
+    wall-clock time so all processes agree on it; expired rows are skipped on
+    read and deleted periodically on write.
+    """
+
+    name = "sqlite"
+    PRUNE_EVERY = 200  # writes between expired-row sweeps
+
+    def __init__(self, path: str):
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._local = threading.local()
+        self._writes = 0
+        self._connection().execute(
+            "CREATE TABLE IF NOT EXISTS answers ("
+            "key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL)"
+        )
+
+    def _connection(self) -> sqlite3.Connection:
+        # sqlite3 connections are per thread; calls arrive from the to_thread pool
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=5.0, isolation_level=None)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            self._local.connection = connection
+        return connection
+
+    def get(self, key: str) -> Optional[Tuple[str, float]]:
+        """(value, seconds until it expires), or None"""
+        now = time.time()
+        row = self._connection().execute(
+            "SELECT value, expires_at FROM answers WHERE key = ? AND expires_at > ?", (key, now)
+        ).fetchone()
+        return (row[0], row[1] - now) if row else None
+
+    def set(self, key: str, value: str, ttl_seconds: float):
+        connection = self._connection()
+        connection.execute(
+            "INSERT OR REPLACE INTO answers (key, value, expires_at) VALUES (?, ?, ?)",
+            (key, value, time.time() + ttl_seconds)
+        )
+        self._writes += 1
+        if self._writes % self.PRUNE_EVERY == 0:
+            connection.execute("DELETE FROM answers WHERE expires_at <= ?", (time.time(),))
+
+    def clear(self):
+        self._connection().execute("DELETE FROM answers")
+
+    def get_stats(self) -> Dict[str, Any]:
+        entries = self._connection().execute("SELECT count(*) FROM answers").fetchone()[0]
+        return {
+            "backend": self.name,
+            "path": self.path,
+            "entries": entries,
+            "file_bytes": os.path.getsize(self.path) if os.path.exists(self.path) else 0
+        }
+
+
+class RedisAnswerStore:
+    """Answer store on a Redis-protocol server (uses the `redis` package)."""
+
+    name = "redis"
+    PREFIX = "answer:"
+
+    def __init__(self, url: str):
+        import redis  # Optional dependency, only needed for this backend
+
+        self.url = url
+        self.client = redis.Redis.from_url(url, socket_timeout=1.0, decode_responses=True)
+
+    def get(self, key: str) -> Optional[Tuple[str, float]]:
+        """(value, seconds until it expires), or None"""
+        # MULTI/EXEC: the value and its PTTL are read atomically
+        pipeline = self.client.pipeline(transaction=True)
+        pipeline.get(self.PREFIX + key)
+        pipeline.pttl(self.PREFIX + key)
+        value, ttl_ms = pipeline.execute()
+        if value is None or ttl_ms == -2:
+            return None
+        # -1: no expiry set (written by another client); use the full TTL
+        return value, (ttl_ms / 1000 if ttl_ms >= 0 else None)
+
+    def set(self, key: str, value: str, ttl_seconds: float):
+        self.client.set(self.PREFIX + key, value, ex=max(int(ttl_seconds), 1))
+
+    def clear(self):
+        for key in self.client.scan_iter(self.PREFIX + "*"):
+            self.client.delete(key)
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {"backend": self.name, "url": self.url}
+
+
+class AnswerCache:
+    """
+    Two-tier cache of generated answers.
+
+    The memory tier is an LRU bounded by entry count and UTF-8 bytes, with a
+    fixed TTL. A second ordered map keeps entries in expiry order so expired
+    answers are dropped on every write in O(1) amortised time, not only when
+    read. The optional shared tier (ANSWER_CACHE_SHARED: "sqlite" or "redis")
+    is consulted on a memory miss and written through on every put, so all
+    workers benefit from each other's answers. Shared tier errors are logged
+    and treated as misses. An answer copied from the shared tier keeps its
+    remaining TTL there, so it does not outlive the shared entry; such entries
+    can sit in the expiry order ahead of their time and be purged late, but
+    reads always check their own expiry.
+    """
+
+    def __init__(self, max_entries: int, max_bytes: int, ttl_seconds: float, shared: Optional[Any] = None):
+        self.max_entries = max(int(max_entries), 0)
+        self.max_bytes = max(int(max_bytes), 0)
+        self.ttl_seconds = ttl_seconds
+        self.shared = shared
+
+        self._entries: "OrderedDict[str, Tuple[str, int]]" = OrderedDict()  # LRU order: value, bytes
+        self._expiry: "OrderedDict[str, float]" = OrderedDict()             # Expiry order (fixed TTL)
+        self._bytes = 0
+
+        # Instrumentation
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+        self._expirations = 0
+        self._shared_hits = 0
+        self._shared_misses = 0
+        self._shared_errors = 0
+
+    def _get_local(self, key: str) -> Optional[str]:
+        expires_at = self._expiry.get(key)
+        if expires_at is None:
+            return None
+        if expires_at <= time.monotonic():
+            self._remove(key)
+            self._expirations += 1
+            return None
+        self._entries.move_to_end(key)
+        return self._entries[key][0]
+
+    def _put_local(self, key: str, value: str, ttl_seconds: Optional[float] = None):
+        size = len(value.encode("utf-8"))
+        if not self.max_entries or size > self.max_bytes:
+            return
+        if key in self._entries:
+            self._remove(key)
+        self._entries[key] = (value, size)
+        ttl = self.ttl_seconds if ttl_seconds is None else min(ttl_seconds, self.ttl_seconds)
+        self._expiry[key] = time.monotonic() + ttl
+        self._bytes += size
+
+        self._purge_expired()
+        while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+            oldest = next(iter(self._entries))
+            self._remove(oldest)
+            self._evictions += 1
+
+    def _purge_expired(self):
+        now = time.monotonic()
+        while self._expiry:
+            key, expires_at = next(iter(self._expiry.items()))
+            if expires_at > now:
+                break
+            self._remove(key)
+            self._expirations += 1
+
+    def _remove(self, key: str):
+        _, size = self._entries.pop(key)
+        del self._expiry[key]
+        self._bytes -= size
+
+    async def get(self, key: str) -> Optional[str]:
+        """
+        Cached answer from memory, then from the shared tier.
+
+        Args:
+            key: Cache key (LLMService._generate_cache_key)
+
+        Returns:
+            Answer text, or None on a miss
+        """
+        value = self._get_local(key)
+        if value is not None:
+            self._hits += 1
+            return value
+
+        if self.shared is not None:
+            try:
+                entry = await asyncio.to_thread(self.shared.get, key)
+            except Exception as e:
+                self._shared_errors += 1
+                logger.warning(f"Shared answer cache read failed: {e}")
+                entry = None
+            if entry is not None:
+                value, remaining = entry
+                self._shared_hits += 1
+                self._put_local(key, value, remaining)
+                return value
+            self._shared_misses += 1
+
+        self._misses += 1
+        return None
+
+    async def put(self, key: str, value: str):
+        """Store an answer in memory and write it through to the shared tier."""
+        self._put_local(key, value)
+        if self.shared is not None:
+            try:
+                await asyncio.to_thread(self.shared.set, key, value, self.ttl_seconds)
+            except Exception as e:
+                self._shared_errors += 1
+                logger.warning(f"Shared answer cache write failed: {e}")
+
+    async def clear(self):
+        """Drop all cached answers (both tiers)."""
+        self._entries.clear()
+        self._expiry.clear()
+        self._bytes = 0
+        if self.shared is not None:
+            await asyncio.to_thread(self.shared.clear)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get cache statistics."""
+        lookups = self._hits + self._misses
+        stats: Dict[str, Any] = {
+            "entries": len(self._entries),
+            "bytes": self._bytes,
+            "max_entries": self.max_entries,
+            "max_bytes": self.max_bytes,
+            "ttl_seconds": self.ttl_seconds,
+            "hits": self._hits,
+            "misses": self._misses,
+            "evictions": self._evictions,
+            "expirations": self._expirations,
+            "hit_rate": round(self._hits / lookups, 4) if lookups else 0.0,
+            "shared": None
+        }
+        if self.shared is not None:
+            try:
+                shared_stats = self.shared.get_stats()
+            except Exception as e:
+                shared_stats = {"backend": self.shared.name, "error": str(e)}
+            stats["shared"] = {
+                **shared_stats,
+                "hits": self._shared_hits,
+                "misses": self._shared_misses,
+                "errors": self._shared_errors
+            }
+        return stats
+
+
+def _create_shared_store() -> Optional[Any]:
+    backend = settings.ANSWER_CACHE_SHARED.lower()
+    try:
+        if backend == "sqlite":
+            return SQLiteAnswerStore(settings.ANSWER_CACHE_SQLITE_PATH)
+        if backend == "redis":
+            return RedisAnswerStore(settings.ANSWER_CACHE_REDIS_URL)
+    except Exception as e:
+        logger.warning(f"Shared answer cache '{backend}' unavailable, using memory only: {e}")
+    return None
+
+
+# Global instance
+answer_cache = AnswerCache(
+    max_entries=settings.ANSWER_CACHE_MAX_ENTRIES,
+    max_bytes=int(settings.ANSWER_CACHE_MAX_MB * 1024 * 1024),
+    ttl_seconds=settings.ANSWER_CACHE_TTL_S,
+    shared=_create_shared_store()
+)
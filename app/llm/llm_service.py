@@ -1,17 +1,49 @@
 from langchain_groq import ChatGroq
-from typing import Dict, Optional, Tuple
+from typing import Any, AsyncIterator, Dict, List, Optional
+import asyncio
 import hashlib
-import time
 import logging
-from tenacity import retry, stop_after_attempt, wait_exponential, retry_if_exception_type, RetryError
+from tenacity import retry, stop_after_attempt, wait_exponential, retry_if_exception_type, retry_if_not_exception_type, RetryError
 
 from app.core.config import get_settings
+from app.core.deadline import Deadline, DeadlineExceeded, stop_before_deadline
+from app.core.single_flight import SingleFlight
+from app.llm.answer_cache import answer_cache
 from app.llm.prompt_templates import FINANCIAL_QA_PROMPT
+from app.llm.rate_limiter import Priority, estimate_tokens, groq_rate_limiter, is_rate_limit_error
 
 settings = get_settings()
 logger = logging.getLogger(__name__)
 
 
+class _AnswerStream:
+    """Fragments of one streamed answer, replayed from the start to every request waiting on it"""
+
+    def __init__(self):
+        self.parts: List[str] = []
+        self.done = False
+        self._changed = asyncio.Event()
+
+    def push(self, fragment: str):
+        self.parts.append(fragment)
+        self._changed.set()
+
+    def close(self):
+        self.done = True
+        self._changed.set()
+
+    async def replay(self, deadline: Deadline) -> AsyncIterator[str]:
+        sent = 0
+        while True:
+            while sent < len(self.parts):
+                sent += 1
+                yield self.parts[sent - 1]
+            if self.done:
+                return
+            self._changed.clear()
+            await deadline.run(self._changed.wait())
+
+
 class LLMService:
     def __init__(self):
         # Initialize Groq
@@ -26,10 +58,12 @@ class LLMService:
         # LCEL Chain: Prompt | LLM
         self.chain = FINANCIAL_QA_PROMPT | self.llm
         
-        # In-memory cache: {cache_key: (response, timestamp)}
-        self._cache: Dict[str, Tuple[str, float]] = {}
-        self._cache_ttl = 3600  # 1 hour cache TTL
-        self._cache_max_size = 1000  # Maximum cache entries
+        # LRU + TTL answer cache, optionally shared between workers
+        self.answer_cache = answer_cache
+        # Coalesces concurrent identical questions into one LLM call
+        self.flights = SingleFlight("llm_answer")
+        # Fragments of the answers being streamed, by cache key, for identical requests to replay
+        self._streams: Dict[str, "_AnswerStream"] = {}
 
     def _generate_cache_key(self, question: str, context: str) -> str:
         """
@@ -45,7 +79,7 @@ class LLMService:
         combined = f"{question}|||{context}"
         return hashlib.md5(combined.encode()).hexdigest()
     
-    def _get_from_cache(self, cache_key: str) -> Optional[str]:
+    async def _get_from_cache(self, cache_key: str) -> Optional[str]:
         """
         Get response from cache if valid.
         
@@ -55,18 +89,12 @@ class LLMService:
         Returns:
             Cached response if valid, None otherwise
         """
-        if cache_key in self._cache:
-            response, timestamp = self._cache[cache_key]
-            # Check if cache is still valid
-            if time.time() - timestamp < self._cache_ttl:
-                logger.info(f"Cache hit for key: {cache_key[:8]}...")
-                return response
-            else:
-                # Remove expired entry
-                del self._cache[cache_key]
-        return None
+        response = await self.answer_cache.get(cache_key)
+        if response is not None:
+            logger.info(f"Cache hit for key: {cache_key[:8]}...")
+        return response
     
-    def _add_to_cache(self, cache_key: str, response: str):
+    async def _add_to_cache(self, cache_key: str, response: str):
         """
         Add response to cache.
         
@@ -74,25 +102,39 @@ class LLMService:
             cache_key: Cache key
             response: LLM response to cache
         """
-        # Simple cache size management: remove oldest if at max
-        if len(self._cache) >= self._cache_max_size:
-            # Remove oldest entry (first inserted)
-            oldest_key = next(iter(self._cache))
-            del self._cache[oldest_key]
-            logger.debug(f"Cache full, removed oldest entry")
-        
-        self._cache[cache_key] = (response, time.time())
+        await self.answer_cache.put(cache_key, response)
         logger.debug(f"Cached response for key: {cache_key[:8]}...")
 
     @retry(
-        retry=retry_if_exception_type(Exception),
-        stop=stop_after_attempt(3), # Reduced retries to fail faster on rate limits
+        retry=retry_if_exception_type(Exception) & retry_if_not_exception_type(DeadlineExceeded),
+        stop=stop_after_attempt(3) | stop_before_deadline, # Reduced retries to fail faster on rate limits
         wait=wait_exponential(multiplier=1, min=2, max=10)
     )
-    async def _execute_chain(self, inputs: Dict):
-        return await self.chain.ainvoke(inputs)
+    async def _execute_chain(self, inputs: Dict, deadline: Optional[Deadline] = None,
+                             priority: Priority = Priority.INTERACTIVE):
+        estimated = self._estimate_tokens(inputs)
+        await groq_rate_limiter.acquire(estimated, priority, deadline)
+        try:
+            if deadline is None:
+                response = await self.chain.ainvoke(inputs)
+            else:
+                response = await deadline.run(self.chain.ainvoke(inputs))
+        except Exception as e:
+            if is_rate_limit_error(e):
+                groq_rate_limiter.on_rate_limited()
+            elif not isinstance(e, DeadlineExceeded):
+                # Failed without an answer (the retry reserves again); a timed-out call may still be billed
+                groq_rate_limiter.refund(estimated)
+            raise
+        usage = getattr(response, "usage_metadata", None) or {}
+        groq_rate_limiter.settle(estimated, usage.get("total_tokens"))
+        return response
+
+    def _estimate_tokens(self, inputs: Dict) -> int:
+        """Prompt tokens plus the completion allowance, for rate limiting"""
+        return estimate_tokens(FINANCIAL_QA_PROMPT.format(**inputs)) + settings.GROQ_ANSWER_MAX_TOKENS
 
-    async def generate_answer(self, question: str, context: str) -> str:
+    async def generate_answer(self, question: str, context: str, deadline: Optional[Deadline] = None) -> str:
         """
         Generate answer from LLM based on context.
         Uses in-memory cache to reduce API calls.
@@ -100,6 +142,7 @@ class LLMService:
         Args:
             question: User's question
             context: Retrieved context from RAG
+            deadline: Request deadline bounding the call and its retries
             
         Returns:
             LLM-generated answer
@@ -109,53 +152,201 @@ class LLMService:
         
         # Check cache first
         cache_key = self._generate_cache_key(question, context)
-        cached_response = self._get_from_cache(cache_key)
+        cached_response = await self._get_from_cache(cache_key)
         
         if cached_response:
             return cached_response
             
         try:
-            # invoke chain with input dict
-            logger.info(f"Calling LLM for new query (cache miss)")
-            print(f"DEBUG: [LLMService] invoking chain for query: {question[:50]}...", flush=True)
-            response = await self._execute_chain({
-                "question": question,
-                "context": context
-            })
-            print(f"DEBUG: [LLMService] Chain invocation complete. Response received.", flush=True)
-            # ChatGoogleGenerativeAI returns an AIMessage, we need the content
-            answer = response.content
-            
-            # Cache the response
-            self._add_to_cache(cache_key, answer)
-            
-            return answer
-            
-        except RetryError as e:
-            # This catches exceptions after all retries failed
-            logger.error(f"RetryError generating answer: {e}", exc_info=True)
+            # Identical questions already being answered (or streamed) share that LLM call
+            flight = asyncio.shield(self.flights.future(
+                cache_key, lambda: self._answer_and_cache(cache_key, question, context, deadline)
+            ))
+            # A follower still stops at its own deadline
+            return await (deadline.run(flight) if deadline is not None else flight)
+        except Exception as e:
+            return self._error_notice(e, deadline)
+
+    def _error_notice(self, error: Exception, deadline: Optional[Deadline]) -> str:
+        """User-facing message for a failed answer generation"""
+        if isinstance(error, DeadlineExceeded):
+            logger.warning(f"Answer generation ran out of time: {error}")
+            if deadline is not None:
+                deadline.note("generate")
+            return ("**System Notice**: The answer could not be generated within the time limit for this request. "
+                    "Please try again shortly.")
+
+        if isinstance(error, RetryError):
+            # This catches exceptions after all retries failed (or the deadline left no time for another)
+            logger.error(f"RetryError generating answer: {error}", exc_info=error)
+            if deadline is not None:
+                deadline.note("generate")
             return ("**System Notice**: The AI model is currently experiencing high traffic (Rate Limit Reached). "
                     "Please wait a minute and try again.")
-                    
-        except Exception as e:
-            logger.error(f"Error generating answer: {e}", exc_info=True)
-            if "429" in str(e) or "Rate limit" in str(e): 
-                 return ("**System Notice**: The AI model rate limit was reached. "
-                         "Please wait a short while before asking another question.")
-            return f"Error generating answer: {str(e)}"
+
+        logger.error(f"Error generating answer: {error}", exc_info=error)
+        if "429" in str(error) or "Rate limit" in str(error):
+             return ("**System Notice**: The AI model rate limit was reached. "
+                     "Please wait a short while before asking another question.")
+        return f"Error generating answer: {str(error)}"
     
-    def clear_cache(self):
+    async def _answer_and_cache(self, cache_key: str, question: str, context: str,
+                                deadline: Optional[Deadline]) -> str:
+        # invoke chain with input dict
+        logger.info(f"Calling LLM for new query (cache miss)")
+        print(f"DEBUG: [LLMService] invoking chain for query: {question[:50]}...", flush=True)
+        response = await self._execute_chain({
+            "question": question,
+            "context": context
+        }, deadline=deadline)
+        print(f"DEBUG: [LLMService] Chain invocation complete. Response received.", flush=True)
+        # ChatGoogleGenerativeAI returns an AIMessage, we need the content
+        answer = response.content
+
+        # Cache the response
+        await self._add_to_cache(cache_key, answer)
+
+        return answer
+
+    async def stream_answer(self, question: str, context: str,
+                            deadline: Optional[Deadline] = None) -> AsyncIterator[str]:
+        """
+        Stream the answer as text fragments while the LLM produces them.
+
+        Cached answers are yielded whole. The first request for an uncached
+        answer starts one streaming LLM call (keyed like generate_answer, so
+        non-streaming callers join it too); identical requests arriving while
+        it runs replay its fragments instead of calling the LLM again. The
+        call runs under the first request's deadline and continues if that
+        client goes away. The complete streamed answer is cached when the
+        stream ends; an interrupted stream is not.
+
+        Args:
+            question: User's question
+            context: Retrieved context from RAG
+            deadline: Request deadline bounding the wait for each fragment
+
+        Yields:
+            Answer text fragments
+        """
+        if not context.strip():
+            yield "I cannot answer this question as no relevant financial data was found in my database for this company."
+            return
+
+        cache_key = self._generate_cache_key(question, context)
+        cached_response = await self._get_from_cache(cache_key)
+        if cached_response:
+            yield cached_response
+            return
+
+        stream = self._streams.get(cache_key)
+        if stream is None:
+            if self.flights.in_flight(cache_key):
+                # A non-streaming call is answering this question: wait for its text
+                yield await self.generate_answer(question, context, deadline=deadline)
+                return
+            stream = _AnswerStream()
+            self._streams[cache_key] = stream
+        # Starts the streaming call, or counts this request as coalesced onto it
+        self.flights.future(cache_key, lambda: self._stream_and_cache(cache_key, question, context, deadline, stream))
+
+        deadline = deadline or Deadline.unbounded()
+        sent = 0
+        try:
+            async for fragment in stream.replay(deadline):
+                sent += 1
+                yield fragment
+        except DeadlineExceeded as e:
+            logger.warning(f"Answer stream ran out of time: {e}")
+            deadline.note("generate")
+            yield ("\n\n**System Notice**: The answer could not be completed within the time limit for this request."
+                   if sent else "**System Notice**: The answer could not be generated within the time limit "
+                                "for this request. Please try again shortly.")
+
+    async def _stream_and_cache(self, cache_key: str, question: str, context: str,
+                                deadline: Optional[Deadline], stream: "_AnswerStream") -> str:
+        """Run one streaming LLM call into `stream`; returns the full text every replay received"""
+        try:
+            await self._stream_into(cache_key, question, context, deadline or Deadline.unbounded(), stream)
+        finally:
+            stream.close()
+            self._streams.pop(cache_key, None)
+        return "".join(stream.parts)
+
+    async def _stream_into(self, cache_key: str, question: str, context: str,
+                           deadline: Deadline, stream: "_AnswerStream"):
+        logger.info("Streaming LLM answer for new query (cache miss)")
+        inputs = {"question": question, "context": context}
+        estimated = self._estimate_tokens(inputs)
+        try:
+            await groq_rate_limiter.acquire(estimated, Priority.INTERACTIVE, deadline)
+        except DeadlineExceeded as e:
+            stream.push(self._error_notice(e, deadline))
+            return
+
+        parts: List[str] = []
+        usage: Dict[str, Any] = {}
+        rate_limited = False
+        failed_early = False
+        llm_stream = self.chain.astream(inputs)
+        try:
+            while True:
+                try:
+                    chunk = await deadline.run(llm_stream.__anext__())
+                except StopAsyncIteration:
+                    break
+                usage = getattr(chunk, "usage_metadata", None) or usage
+                if chunk.content:
+                    parts.append(chunk.content)
+                    stream.push(chunk.content)
+        except DeadlineExceeded as e:
+            logger.warning(f"Answer stream ran out of time: {e}")
+            deadline.note("generate")
+            stream.push("\n\n**System Notice**: The answer could not be completed within the time limit for this request."
+                        if parts else "**System Notice**: The answer could not be generated within the time limit "
+                                      "for this request. Please try again shortly.")
+            return
+        except Exception as e:
+            rate_limited = is_rate_limit_error(e)
+            if rate_limited:
+                groq_rate_limiter.on_rate_limited()
+            if parts:
+                logger.error(f"Answer stream failed mid-answer: {e}", exc_info=True)
+                stream.push("\n\n**System Notice**: The answer was interrupted. Please try again.")
+                return
+            failed_early = True
+            logger.warning(f"Answer stream failed before the first token, retrying without streaming: {e}")
+        else:
+            await self._add_to_cache(cache_key, "".join(parts))
+            return
+        finally:
+            await llm_stream.aclose()
+            if rate_limited:
+                pass  # The limiter already drained its budgets
+            elif failed_early:
+                # Nothing was generated: free the reservation before the fallback makes its own
+                groq_rate_limiter.refund(estimated)
+            else:
+                # Reported usage when the stream carried it, else the prompt plus what was received
+                prompt_tokens = estimated - settings.GROQ_ANSWER_MAX_TOKENS
+                groq_rate_limiter.settle(
+                    estimated, usage.get("total_tokens") or prompt_tokens + estimate_tokens("".join(parts))
+                )
+
+        # Not through generate_answer: this call already holds the flight for cache_key
+        try:
+            stream.push(await self._answer_and_cache(cache_key, question, context, deadline))
+        except Exception as e:
+            stream.push(self._error_notice(e, deadline))
+
+    async def clear_cache(self):
         """Clear the entire cache."""
-        self._cache.clear()
+        await self.answer_cache.clear()
         logger.info("Cache cleared")
     
-    def get_cache_stats(self) -> Dict[str, int]:
+    def get_cache_stats(self) -> Dict[str, Any]:
         """Get cache statistics."""
-        return {
-            "cache_size": len(self._cache),
-            "cache_max_size": self._cache_max_size,
-            "cache_ttl_seconds": self._cache_ttl
-        }
+        return {**self.answer_cache.get_stats(), "single_flight": self.flights.get_stats()}
 
 # Global Singleton Instance
 llm_service = LLMService()
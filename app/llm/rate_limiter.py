@@ -0,0 +1,224 @@
+import asyncio
+import heapq
+import itertools
+import logging
+import time
+from collections import deque
+from enum import IntEnum
+from typing import Any, Callable, Deque, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from app.core.config import get_settings
+from app.core.deadline import Deadline, DeadlineExceeded
+
+settings = get_settings()
+logger = logging.getLogger(__name__)
+
+
+class Priority(IntEnum):
+    INTERACTIVE = 0  # User-facing queries
+    BACKGROUND = 1   # Audits, batch and pre-warm work
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count (~4 characters per token for English text)"""
+    return len(text) // 4 + 1
+
+
+class TokenBucket:
+    """Budget refilled continuously at `capacity` per minute, holding at most `capacity`."""
+
+    def __init__(self, capacity: float, clock: Callable[[], float] = time.monotonic):
+        self.capacity = float(capacity)
+        self.rate = self.capacity / 60.0
+        self.level = self.capacity
+        self._updated = clock()
+
+    def refill(self, now: float):
+        self.level = min(self.capacity, self.level + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def delay(self, amount: float) -> float:
+        """Seconds until `amount` is available (0 if it is now)"""
+        missing = amount - self.level
+        return missing / self.rate if missing > 0 else 0.0
+
+
+class _Waiter:
+    __slots__ = ("tokens", "priority", "future", "enqueued")
+
+    def __init__(self, tokens: int, priority: Priority, future: asyncio.Future, enqueued: float):
+        self.tokens = tokens
+        self.priority = priority
+        self.future = future
+        self.enqueued = enqueued
+
+
+class RateLimiter:
+    """
+    Process-wide admission control for one model's request and token budgets.
+
+    Each call first acquires one request and its estimated tokens from two
+    token buckets (requests/minute, tokens/minute). Calls that cannot be
+    admitted immediately wait in a priority queue, interactive before
+    background, FIFO within a priority; a dispatcher task admits the head of
+    the queue as soon as both buckets cover it. A 429 from the API empties
+    the buckets so queued calls back off together instead of each retrying.
+    """
+
+    def __init__(self, name: str, requests_per_minute: int, tokens_per_minute: int, enabled: bool = True,
+                 clock: Callable[[], float] = time.monotonic):
+        self.name = name
+        self.enabled = enabled and requests_per_minute > 0 and tokens_per_minute > 0
+        self._clock = clock
+        self.requests = TokenBucket(max(requests_per_minute, 1), clock)
+        self.tokens = TokenBucket(max(tokens_per_minute, 1), clock)
+
+        self._queue: List[Tuple[int, int, _Waiter]] = []
+        self._sequence = itertools.count()
+        self._wake = asyncio.Event()
+        self._dispatcher: Optional[asyncio.Task] = None
+
+        # Instrumentation
+        self._admitted = {priority.name.lower(): 0 for priority in Priority}
+        self._waits: Dict[str, Deque[float]] = {priority.name.lower(): deque(maxlen=1000) for priority in Priority}
+        self._max_depth = 0
+        self._timeouts = 0
+        self._rate_limited = 0
+
+    def _delay(self, tokens: int) -> float:
+        now = self._clock()
+        self.requests.refill(now)
+        self.tokens.refill(now)
+        return max(self.requests.delay(1), self.tokens.delay(tokens))
+
+    def _admit(self, tokens: int, priority: Priority, waited: float):
+        self.requests.level -= 1
+        self.tokens.level -= tokens
+        self._admitted[priority.name.lower()] += 1
+        self._waits[priority.name.lower()].append(waited)
+
+    async def acquire(self, tokens: int, priority: Priority = Priority.INTERACTIVE,
+                      deadline: Optional[Deadline] = None):
+        """
+        Wait until the call fits the request and token budgets.
+
+        Args:
+            tokens: Estimated prompt + completion tokens of the call
+            priority: Queue priority
+            deadline: Request deadline bounding the wait
+
+        Raises:
+            DeadlineExceeded: If the deadline passes while queued
+        """
+        if not self.enabled:
+            return
+        tokens = int(min(max(tokens, 1), self.tokens.capacity))
+
+        if not self._queue and self._delay(tokens) <= 0:
+            self._admit(tokens, priority, 0.0)
+            return
+
+        waiter = _Waiter(tokens, priority, asyncio.get_running_loop().create_future(), self._clock())
+        heapq.heappush(self._queue, (int(priority), next(self._sequence), waiter))
+        self._max_depth = max(self._max_depth, self.queue_depth)
+        self._wake.set()
+        if self._dispatcher is None or self._dispatcher.done():
+            self._dispatcher = asyncio.create_task(self._dispatch())
+
+        try:
+            # A timed-out or cancelled waiter's future is cancelled and skipped by the dispatcher
+            await (deadline.run(waiter.future) if deadline is not None else waiter.future)
+        except DeadlineExceeded:
+            waiter.future.cancel()
+            self._timeouts += 1
+            raise
+
+    async def _dispatch(self):
+        while self._queue:
+            _, _, waiter = self._queue[0]
+            if waiter.future.done():
+                heapq.heappop(self._queue)
+                continue
+
+            delay = self._delay(waiter.tokens)
+            if delay <= 0:
+                heapq.heappop(self._queue)
+                self._admit(waiter.tokens, waiter.priority, self._clock() - waiter.enqueued)
+                waiter.future.set_result(None)
+                continue
+
+            # Sleep until the head fits, or until a new (possibly higher priority) waiter arrives
+            self._wake.clear()
+            try:
+                await asyncio.wait_for(self._wake.wait(), delay)
+            except asyncio.TimeoutError:
+                pass
+
+    def settle(self, estimated: int, actual: Optional[int]):
+        """Correct the token bucket once the real usage of an admitted call is known"""
+        if not self.enabled or not actual:
+            return
+        self.tokens.level = min(self.tokens.capacity, self.tokens.level + estimated - actual)
+
+    def refund(self, estimated: int):
+        """Return the tokens of an admitted call that failed before the API used any"""
+        if not self.enabled:
+            return
+        self.tokens.level = min(self.tokens.capacity, self.tokens.level + estimated)
+
+    def on_rate_limited(self):
+        """The API answered 429: drain both budgets so queued calls wait for a refill"""
+        if not self.enabled:
+            return
+        self._rate_limited += 1
+        logger.warning(f"{self.name}: rate limited by the API, pausing admissions until the budget refills")
+        self.requests.level = min(self.requests.level, 0.0)
+        self.tokens.level = min(self.tokens.level, 0.0)
+
+    @property
+    def queue_depth(self) -> int:
+        return sum(1 for _, _, waiter in self._queue if not waiter.future.done())
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get limiter statistics (wait times in ms over the last 1000 admissions per priority)."""
+        waits = {}
+        for priority, samples in self._waits.items():
+            values = np.array(samples) * 1000 if samples else np.zeros(1)
+            waits[priority] = {
+                "avg_ms": round(float(values.mean()), 2),
+                "p95_ms": round(float(np.percentile(values, 95)), 2),
+                "max_ms": round(float(values.max()), 2)
+            }
+        now = self._clock()
+        self.requests.refill(now)
+        self.tokens.refill(now)
+        return {
+            "name": self.name,
+            "enabled": self.enabled,
+            "requests_per_minute": self.requests.capacity,
+            "tokens_per_minute": self.tokens.capacity,
+            "requests_available": round(self.requests.level, 2),
+            "tokens_available": round(self.tokens.level, 1),
+            "queue_depth": self.queue_depth,
+            "max_queue_depth": self._max_depth,
+            "admitted": dict(self._admitted),
+            "wait": waits,
+            "timeouts": self._timeouts,
+            "rate_limited_responses": self._rate_limited
+        }
+
+
+def is_rate_limit_error(error: Exception) -> bool:
+    message = str(error)
+    return "429" in message or "rate limit" in message.lower()
+
+
+# Global instance, shared by every Groq call on llama-3.1-8b-instant (answers and classification)
+groq_rate_limiter = RateLimiter(
+    "llama-3.1-8b-instant",
+    requests_per_minute=settings.GROQ_REQUESTS_PER_MINUTE,
+    tokens_per_minute=settings.GROQ_TOKENS_PER_MINUTE,
+    enabled=settings.GROQ_RATE_LIMIT
+)
@@ -1,5 +1,6 @@
 
 import asyncio
+import logging
 from fastapi import FastAPI
 from fastapi.staticfiles import StaticFiles
 from fastapi.responses import FileResponse
@@ -7,17 +8,25 @@ from app.core.config import get_settings
 from app.api.routes import ingestion_routes, query_routes, health_routes
 
 from contextlib import asynccontextmanager
-from app.core.database import engine, Base
+from app.core.database import engine, Base, AsyncSessionLocal
+from app.retrieval.company_cache import company_cache
 # Import models to ensure they are registered with Base.metadata
 import app.models.models
 
 settings = get_settings()
+logger = logging.getLogger(__name__)
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     # Auto-create tables on startup
     async with engine.begin() as conn:
         await conn.run_sync(Base.metadata.create_all)
+    # Preload ticker -> company id for the query path (optional: the cache also fills on demand)
+    try:
+        async with AsyncSessionLocal() as session:
+            await company_cache.warm(session)
+    except Exception as e:
+        logger.warning(f"Company cache not warmed, continuing with an empty cache: {e}")
     yield
 
 app = FastAPI(
@@ -1,7 +1,11 @@
-from sqlalchemy import Column, Integer, String, Date, Numeric, ForeignKey, TIMESTAMP, JSON, UniqueConstraint
+import hashlib
+import json
+
+from sqlalchemy import Column, Integer, String, Date, Numeric, ForeignKey, TIMESTAMP, JSON, UniqueConstraint, Index, DDL, event
 from sqlalchemy.orm import relationship
-from sqlalchemy.sql import func
+from sqlalchemy.sql import func, text
 from app.core.database import Base
+from app.core.metric_catalog import metric_catalog
 
 class Company(Base):
     __tablename__ = "companies"
@@ -34,6 +38,8 @@ class FinancialStatement(Base):
 
     __table_args__ = (
         UniqueConstraint('company_id', 'statement_type', 'period_type', 'period_date', name='uq_company_statement_period'),
+        # Period predicates from the question: equality on type, range on date
+        Index('idx_statements_company_type_date', 'company_id', 'period_type', 'period_date'),
     )
 
     # Relationships
@@ -47,12 +53,108 @@ class FinancialLineItem(Base):
     statement_id = Column(Integer, ForeignKey("financial_statements.id", ondelete="CASCADE"))
     line_item_name = Column(String(255), nullable=False, index=True)
     line_item_value = Column(Numeric(20, 2))
+    metric_id = Column(String(50))  # Canonical metric id from app.core.metric_catalog (NULL if uncatalogued)
     currency = Column(String(10), default="INR")
     created_at = Column(TIMESTAMP, server_default=func.now())
 
     __table_args__ = (
         UniqueConstraint('statement_id', 'line_item_name', name='uq_statement_line_item'),
+        # Trigram GIN index: lets "line_item_name ILIKE '%keyword%'" avoid a scan
+        Index(
+            'idx_line_items_name_trgm', 'line_item_name',
+            postgresql_using='gin',
+            postgresql_ops={'line_item_name': 'gin_trgm_ops'}
+        ),
+        # Exact metric lookups within a company's statements
+        Index('idx_line_items_statement_metric', 'statement_id', 'metric_id'),
     )
 
     # Relationships
     statement = relationship("FinancialStatement", back_populates="line_items")
+
+
+class LatestFinancialSnapshot(Base):
+    """Latest annual and quarterly value of each line item per company, refreshed on ingestion"""
+    __tablename__ = "latest_financial_snapshots"
+
+    company_id = Column(Integer, ForeignKey("companies.id", ondelete="CASCADE"), primary_key=True)
+    period_type = Column(String(20), primary_key=True)     # 'quarterly' or 'annual'
+    line_item_name = Column(String(255), primary_key=True)
+    metric_id = Column(String(50))
+    line_item_value = Column(Numeric(20, 2))
+    statement_type = Column(String(50), nullable=False)
+    period_date = Column(Date, nullable=False)
+    fiscal_year = Column(Integer)
+    fiscal_quarter = Column(Integer)
+    refreshed_at = Column(TIMESTAMP, server_default=func.now())
+
+
+class SchemaMigration(Base):
+    """One-time data migrations applied at startup, with the version each was last run for"""
+    __tablename__ = "schema_migrations"
+
+    name = Column(String(100), primary_key=True)
+    version = Column(String(64), nullable=False)
+    applied_at = Column(TIMESTAMP, server_default=func.now(), onupdate=func.now())
+
+
+# pg_trgm provides gin_trgm_ops and word_similarity(); it must exist before the tables
+event.listen(
+    Base.metadata, "before_create",
+    DDL("CREATE EXTENSION IF NOT EXISTS pg_trgm").execute_if(dialect="postgresql")
+)
+# create_all() does not add new indexes to existing tables, so upgrade older databases here
+event.listen(
+    Base.metadata, "after_create",
+    DDL(
+        "CREATE INDEX IF NOT EXISTS idx_line_items_name_trgm "
+        "ON financial_line_items USING gin (line_item_name gin_trgm_ops)"
+    ).execute_if(dialect="postgresql")
+)
+event.listen(
+    Base.metadata, "after_create",
+    DDL(
+        "CREATE INDEX IF NOT EXISTS idx_statements_company_type_date "
+        "ON financial_statements (company_id, period_type, period_date)"
+    ).execute_if(dialect="postgresql")
+)
+
+
+@event.listens_for(Base.metadata, "after_create")
+def _upgrade_metric_ids(target, connection, **kw):
+    """
+    Add metric_id to older databases and tag stored rows from the metric catalogue.
+
+    Ingestion tags new rows itself, so the backfill only has to run once per
+    catalogue: it is skipped when schema_migrations already records the
+    current catalogue's fingerprint.
+    """
+    if connection.dialect.name != "postgresql":
+        return
+    connection.execute(text("ALTER TABLE financial_line_items ADD COLUMN IF NOT EXISTS metric_id VARCHAR(50)"))
+    connection.execute(text(
+        "CREATE INDEX IF NOT EXISTS idx_line_items_statement_metric "
+        "ON financial_line_items (statement_id, metric_id)"
+    ))
+    mapping = metric_catalog.line_item_mapping()
+    version = hashlib.sha256(json.dumps(mapping, sort_keys=True).encode()).hexdigest()
+    applied = connection.execute(
+        text("SELECT version FROM schema_migrations WHERE name = 'line_item_metric_ids'")
+    ).scalar()
+    if applied == version:
+        return
+    connection.execute(
+        text(
+            "UPDATE financial_line_items AS li SET metric_id = m.metric_id "
+            "FROM unnest(CAST(:names AS text[]), CAST(:metric_ids AS text[])) AS m(line_item_name, metric_id) "
+            "WHERE li.line_item_name = m.line_item_name AND li.metric_id IS DISTINCT FROM m.metric_id"
+        ),
+        {"names": list(mapping.keys()), "metric_ids": list(mapping.values())}
+    )
+    connection.execute(
+        text(
+            "INSERT INTO schema_migrations (name, version) VALUES ('line_item_metric_ids', :version) "
+            "ON CONFLICT (name) DO UPDATE SET version = EXCLUDED.version, applied_at = now()"
+        ),
+        {"version": version}
+    )
@@ -0,0 +1,89 @@
+from typing import Any, Dict, Optional
+from pydantic import BaseModel
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.models.models import Company
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class CompanyInfo(BaseModel):
+    id: int
+    ticker: str
+    name: str
+    sector: Optional[str] = None
+
+
+class CompanyCache:
+    """
+    In-process ticker -> company lookup for the query path.
+
+    Warmed at startup (best effort), filled on demand from the retriever's
+    joined query and invalidated when an ingestion that upserted a company
+    commits. All access happens on the event loop, so no lock is needed; a
+    generation counter keeps a load that raced with an invalidation from
+    re-inserting stale data.
+    """
+
+    def __init__(self):
+        self._entries: Dict[str, CompanyInfo] = {}
+        self._generation = 0
+
+        # Instrumentation
+        self._hits = 0
+        self._misses = 0
+        self._invalidations = 0
+
+    @property
+    def generation(self) -> int:
+        return self._generation
+
+    def get(self, ticker: str) -> Optional[CompanyInfo]:
+        info = self._entries.get(ticker)
+        if info is None:
+            self._misses += 1
+        else:
+            self._hits += 1
+        return info
+
+    def put(self, info: CompanyInfo, generation: Optional[int] = None):
+        """Cache a company (skipped if the cache was invalidated since `generation`)"""
+        if generation is not None and generation != self._generation:
+            return
+        self._entries[info.ticker] = info
+
+    def invalidate(self, ticker: Optional[str] = None):
+        """Forget one ticker, or everything when ticker is None"""
+        self._generation += 1
+        self._invalidations += 1
+        if ticker is None:
+            self._entries.clear()
+        else:
+            self._entries.pop(ticker, None)
+
+    async def warm(self, db: AsyncSession) -> int:
+        """Load every company; returns the number cached"""
+        generation = self._generation
+        result = await db.execute(select(Company.id, Company.ticker, Company.name, Company.sector))
+        count = 0
+        for row in result:
+            self.put(CompanyInfo(id=row.id, ticker=row.ticker, name=row.name, sector=row.sector), generation)
+            count += 1
+        logger.info(f"Company cache warmed with {count} companies")
+        return count
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get cache statistics."""
+        lookups = self._hits + self._misses
+        return {
+            "entries": len(self._entries),
+            "hits": self._hits,
+            "misses": self._misses,
+            "invalidations": self._invalidations,
+            "hit_rate": self._hits / lookups if lookups else 0.0
+        }
+
+
+# Global instance
+company_cache = CompanyCache()
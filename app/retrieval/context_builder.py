@@ -0,0 +1,251 @@
+import json
+import logging
+import re
+from datetime import date
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from app.core.config import get_settings
+from app.llm.rate_limiter import estimate_tokens
+
+settings = get_settings()
+logger = logging.getLogger(__name__)
+
+SQL_HEADER = "=== STRUCTURED FINANCIAL DATA (High Confidence) ==="
+VECTOR_HEADER = "=== TEXTUAL CONTEXT FRAGMENTS ==="
+
+# Period labels produced by SQLRetriever._format_row
+_SQL_PERIOD = re.compile(r"FY(\d{4})(?: Q(\d))?( \(Annual\))?")
+
+# Chunk text produced by app/ingestion/chunking.py (used when metadata is missing)
+_CHUNK_PERIOD = re.compile(r"^Period: (\d{4}-\d{2}-\d{2}) \((\w+)\)", re.MULTILINE)
+_CHUNK_STATEMENT = re.compile(r"^Statement: (\w+)", re.MULTILINE)
+_CHUNK_LINE_ITEM = re.compile(r"^Line Item: (.+)$", re.MULTILINE)
+_CHUNK_VALUE = re.compile(r"^Value: (-?[\d,]+(?:\.\d+)?)$", re.MULTILINE)
+_CHUNK_ROW = re.compile(r"^(?!Company:|Period:|Statement:|Line Item:|Value:)(.+): (-?[\d,]+(?:\.\d+)?)$", re.MULTILINE)
+
+FactKey = Tuple[str, Tuple, str]  # (line item, period, statement)
+
+
+def _create_tokenizer(encoding: str) -> Tuple[str, Callable[[str], int]]:
+    """Local token counter: tiktoken (requirements.txt), else the ~4 characters/token estimate if it cannot load"""
+    try:
+        import tiktoken  # Optional dependency
+
+        encoder = tiktoken.get_encoding(encoding)
+        return encoding, lambda text: len(encoder.encode(text, disallowed_special=()))
+    except Exception as e:
+        logger.info(f"tiktoken encoding '{encoding}' unavailable, estimating context tokens: {e}")
+        return "estimate", estimate_tokens
+
+
+def _sql_period_key(label: str) -> Tuple:
+    match = _SQL_PERIOD.match(label or "")
+    if not match:
+        return ("", label)
+    year, quarter, annual = match.groups()
+    if annual:
+        return ("annual", int(year), None)
+    return ("quarterly", int(year), int(quarter) if quarter else None)
+
+
+def _chunk_period(period_date: str, period_type: str) -> Tuple[Tuple, str]:
+    """Period key and label of a chunk, with fiscal year/quarter derived as in DataNormalizer"""
+    day = date.fromisoformat(period_date[:10])
+    quarter = (day.month - 1) // 3 + 1
+    if period_type == "annual":
+        return ("annual", day.year, None), f"FY{day.year} (Annual)"
+    return ("quarterly", day.year, quarter), f"FY{day.year} Q{quarter}"
+
+
+def _fact_key(line_item: str, period: Tuple, statement: str) -> FactKey:
+    return (" ".join(line_item.lower().split()), period, statement or "")
+
+
+def _fact_line(line_item: str, value: float, period: str, statement: str) -> str:
+    return f"- {line_item}: {value:,} ({period}, {statement})"
+
+
+class ContextBuilder:
+    """
+    Assembles the LLM context from SQL rows and vector fragments.
+
+    Facts are deduplicated across both sources by (line item, period,
+    statement): SQL rows win, and vector chunks (which restate the same line
+    items in a wordier format) contribute only the facts SQL did not return,
+    rendered as one compact line per chunk. Fragments that are not financial
+    chunks are kept as text. Items are then packed in relevance order (SQL
+    rows in retrieval order, then vector fragments by distance) until the
+    CONTEXT_TOKEN_BUDGET is used; the rest is dropped.
+    """
+
+    def __init__(self, token_budget: int, encoding: str = "cl100k_base"):
+        self.token_budget = max(int(token_budget), 0)
+        self.tokenizer, self.count_tokens = _create_tokenizer(encoding)
+
+        # Instrumentation
+        self._builds = 0
+        self._tokens_before = 0
+        self._tokens_after = 0
+        self._duplicates = 0
+        self._dropped = 0
+        self._truncated = 0
+
+    def build(self, sql_results: List[Dict], vector_results: List[Dict]) -> Tuple[str, Dict[str, Any]]:
+        """
+        Build the context string for one request.
+
+        Args:
+            sql_results: SQL rows, best matches first
+            vector_results: Vector search hits ("text", optional "metadata"/"distance")
+
+        Returns:
+            (context string, report with tokens before/after packing and what was removed)
+        """
+        seen: set = set()
+        duplicates = 0
+
+        sql_lines = []
+        for item in sql_results:
+            key = _fact_key(item["line_item"], _sql_period_key(item["period"]), item["statement"])
+            if key in seen:
+                duplicates += 1
+                continue
+            seen.add(key)
+            sql_lines.append(_fact_line(item["line_item"], item["value"], item["period"], item["statement"]))
+
+        vector_lines = []
+        ranked = sorted(enumerate(vector_results), key=lambda pair: (pair[1].get("distance", 0.0), pair[0]))
+        for _, item in ranked:
+            chunk = self._chunk_facts(item)
+            if chunk is None:
+                vector_lines.append("- " + item["text"].replace("\n", " | "))
+                continue
+            label, statement, facts = chunk
+            novel = []
+            for key, line_item, value in facts:
+                if key in seen:
+                    duplicates += 1
+                    continue
+                seen.add(key)
+                novel.append(f"{line_item}: {value:,}")
+            if novel:
+                # One period/statement prefix per chunk keeps multi-row chunks compact
+                vector_lines.append(f"- ({label}, {statement}) " + " | ".join(novel))
+
+        sections = [(SQL_HEADER, sql_lines), (VECTOR_HEADER, vector_lines)]
+        context, dropped = self._pack(sections)
+
+        baseline = self.render_unbudgeted(sql_results, vector_results)
+        tokens_before = self.count_tokens(baseline) if baseline else 0
+        tokens_after = self.count_tokens(context) if context else 0
+        report = {
+            "tokenizer": self.tokenizer,
+            "token_budget": self.token_budget,
+            "tokens_before": tokens_before,
+            "tokens_after": tokens_after,
+            "tokens_saved": max(tokens_before - tokens_after, 0),
+            "duplicate_facts": duplicates,
+            "dropped_items": dropped
+        }
+
+        self._builds += 1
+        self._tokens_before += tokens_before
+        self._tokens_after += tokens_after
+        self._duplicates += duplicates
+        self._dropped += dropped
+        self._truncated += 1 if dropped else 0
+        return context, report
+
+    def _chunk_facts(self, item: Dict) -> Optional[Tuple[str, str, List[Tuple[FactKey, str, float]]]]:
+        """(period label, statement, facts) of a financial chunk, or None for free text"""
+        metadata = item.get("metadata") or {}
+        text = item.get("text", "")
+        try:
+            if metadata.get("period_date") and metadata.get("statement_type"):
+                period, label = _chunk_period(metadata["period_date"], metadata.get("period_type", ""))
+                statement = metadata["statement_type"]
+                if "line_items" in metadata:
+                    rows = json.loads(metadata["line_items"])
+                elif "line_item" in metadata and "numeric_value" in metadata:
+                    rows = [[metadata["line_item"], metadata["numeric_value"]]]
+                else:
+                    return None
+            else:
+                period_match = _CHUNK_PERIOD.search(text)
+                statement_match = _CHUNK_STATEMENT.search(text)
+                if not period_match or not statement_match:
+                    return None
+                period, label = _chunk_period(period_match.group(1), period_match.group(2))
+                statement = statement_match.group(1)
+                line_item, value = _CHUNK_LINE_ITEM.search(text), _CHUNK_VALUE.search(text)
+                if line_item and value:
+                    rows = [[line_item.group(1), value.group(1)]]
+                else:
+                    rows = _CHUNK_ROW.findall(text)
+                rows = [[name, float(str(value).replace(",", ""))] for name, value in rows]
+        except (ValueError, TypeError) as e:
+            logger.debug(f"Unparseable vector chunk kept as text: {e}")
+            return None
+
+        if not rows:
+            return None
+        return label, statement, [(_fact_key(name, period, statement), name, float(value)) for name, value in rows]
+
+    def _pack(self, sections: List[Tuple[str, List[str]]]) -> Tuple[str, int]:
+        """Greedily keep lines in order while they fit the budget; returns (context, lines dropped)"""
+        budget = self.token_budget or float("inf")
+        used = 0
+        dropped = 0
+        parts = []
+        for header, lines in sections:
+            if not lines:
+                continue
+            kept = []
+            header_cost = self.count_tokens(header + "\n")
+            for line in lines:
+                cost = self.count_tokens(line + "\n") + (0 if kept else header_cost)
+                if used + cost > budget:
+                    dropped += 1
+                    continue
+                used += cost
+                kept.append(line)
+            if kept:
+                parts.append("\n".join([header] + kept))
+        return "\n\n".join(parts), dropped
+
+    @staticmethod
+    def render_unbudgeted(sql_results: List[Dict], vector_results: List[Dict]) -> str:
+        """Context in the original format (every row and fragment), the baseline for tokens_saved"""
+        context_parts = []
+        if sql_results:
+            context_parts.append(SQL_HEADER)
+            for item in sql_results:
+                context_parts.append(
+                    f"- {item['line_item']}: {item['value']:,} ({item['period']}, {item['statement']})"
+                )
+            context_parts.append("")
+        if vector_results:
+            context_parts.append(VECTOR_HEADER)
+            for item in vector_results:
+                text = item['text'].replace('\n', ' | ')
+                context_parts.append(f"- {text}")
+        return "\n".join(context_parts)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get context assembly statistics."""
+        return {
+            "tokenizer": self.tokenizer,
+            "token_budget": self.token_budget,
+            "builds": self._builds,
+            "tokens_before": self._tokens_before,
+            "tokens_after": self._tokens_after,
+            "tokens_saved": max(self._tokens_before - self._tokens_after, 0),
+            "saved_rate": round(1 - self._tokens_after / self._tokens_before, 4) if self._tokens_before else 0.0,
+            "duplicate_facts": self._duplicates,
+            "dropped_items": self._dropped,
+            "over_budget_builds": self._truncated
+        }
+
+
+# Global instance
+context_builder = ContextBuilder(settings.CONTEXT_TOKEN_BUDGET, settings.CONTEXT_TOKENIZER)
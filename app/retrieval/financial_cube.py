@@ -0,0 +1,373 @@
+import logging
+import re
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+from sqlalchemy import select
+
+from app.core.config import get_settings
+from app.core.database import AsyncSessionLocal
+from app.core.single_flight import SingleFlight
+from app.models.models import Company, FinancialStatement, FinancialLineItem
+from app.retrieval.company_cache import company_cache, CompanyInfo
+from app.retrieval.period_parser import PeriodQuery
+
+settings = get_settings()
+logger = logging.getLogger(__name__)
+
+# (line_item_name, value, period_type, fiscal_year, fiscal_quarter, statement_type)
+CubeRow = Tuple[str, float, str, int, Optional[int], str]
+
+_TRIGRAM_WORD = re.compile(r"[^\W_]+")
+
+
+def _trigrams(text: str) -> List[str]:
+    """pg_trgm trigrams in order: each alphanumeric word lower-cased, padded "  word " """
+    grams = []
+    for word in _TRIGRAM_WORD.findall(text.lower()):
+        padded = "  " + word + " "
+        grams.extend(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
+
+
+def word_similarity(needle: str, text: str, text_trigrams: Optional[List[str]] = None) -> float:
+    """
+    Port of pg_trgm's word_similarity(needle, text): the best similarity
+    between the needle's trigram set and any continuous extent of the text's
+    ordered trigrams (count / (needle trigrams + extent trigrams - count)).
+    Returned as float32 like PostgreSQL's float4, so ties rank alike.
+
+    Args:
+        needle: Keyword
+        text: Line item name
+        text_trigrams: Precomputed _trigrams(text)
+    """
+    needle_set = set(_trigrams(needle))
+    grams = _trigrams(text) if text_trigrams is None else text_trigrams
+    if not needle_set or not grams:
+        return 0.0
+    ulen1 = len(needle_set)
+    found = [gram in needle_set for gram in grams]
+
+    # Straight translation of iterate_word_similarity() in trgm_op.c
+    lastpos: Dict[str, int] = {}
+    lower, upper = -1, -1
+    ulen2 = count = 0
+    best = 0.0
+    for i, gram in enumerate(grams):
+        if lower >= 0 or found[i]:
+            if gram not in lastpos:
+                ulen2 += 1
+                if found[i]:
+                    count += 1
+            lastpos[gram] = i
+        if not found[i]:
+            continue
+
+        upper = i
+        if lower == -1:
+            lower = i
+            ulen2 = 1
+        current = count / (ulen1 + ulen2 - count)
+
+        # Try moving the lower bound up for a greater similarity
+        tmp_count, tmp_ulen2, prev_lower = count, ulen2, lower
+        for tmp_lower in range(lower, upper + 1):
+            candidate = tmp_count / (ulen1 + tmp_ulen2 - tmp_count)
+            if candidate > current:
+                current, ulen2, lower, count = candidate, tmp_ulen2, tmp_lower, tmp_count
+            tmp_gram = grams[tmp_lower]
+            if lastpos.get(tmp_gram) == tmp_lower:
+                tmp_ulen2 -= 1
+                if found[tmp_lower]:
+                    tmp_count -= 1
+        best = max(best, current)
+
+        for tmp_lower in range(prev_lower, lower):
+            tmp_gram = grams[tmp_lower]
+            if lastpos.get(tmp_gram) == tmp_lower:
+                del lastpos[tmp_gram]
+    return float(np.float32(best))
+
+
+def _ilike_pattern(keyword: str) -> "re.Pattern":
+    """Python equivalent of `ILIKE '%keyword%'` (the SQL path does not escape _ and %)"""
+    body = "".join("." if ch == "_" else ".*" if ch == "%" else re.escape(ch) for ch in keyword)
+    return re.compile(body, re.IGNORECASE | re.DOTALL)
+
+
+class FinancialCube:
+    """
+    One company's full line item history as dense arrays.
+
+    `values` is line item x statement (NaN where a statement lacks the item);
+    statements are the columns, sorted newest period first, with their period
+    date, period type, statement type and fiscal year/quarter as side arrays.
+    `select` reproduces SQLRetriever.build_line_item_query: the same matches,
+    period predicates and ordering (word_similarity, then newest period).
+    """
+
+    def __init__(self, company_id: int, rows: List[Any]):
+        self.company_id = company_id
+
+        columns = sorted(
+            {(row.period_date, row.period_type, row.statement_type, row.fiscal_year, row.fiscal_quarter) for row in rows},
+            key=lambda column: (-column[0].toordinal(), column[2], column[1])
+        )
+        column_of = {column[:3]: i for i, column in enumerate(columns)}
+
+        self.line_items: List[str] = sorted({row.line_item_name for row in rows if row.line_item_name is not None})
+        row_of = {name: i for i, name in enumerate(self.line_items)}
+        self.metric_rows: Dict[str, List[int]] = {}
+
+        self.values = np.full((len(self.line_items), len(columns)), np.nan, dtype=np.float64)
+        for row in rows:
+            if row.line_item_name is None:
+                continue  # Statement without line items: still a period for "last N" windows
+            r = row_of[row.line_item_name]
+            self.values[r, column_of[(row.period_date, row.period_type, row.statement_type)]] = (
+                np.nan if row.line_item_value is None else float(row.line_item_value)
+            )
+            if row.metric_id and r not in self.metric_rows.setdefault(row.metric_id, []):
+                self.metric_rows[row.metric_id].append(r)
+
+        self.period_dates = np.array([c[0] for c in columns], dtype="datetime64[D]")
+        self.period_types = np.array([c[1] for c in columns])
+        self.statement_types = np.array([c[2] for c in columns])
+        self.fiscal_years = np.array([c[3] or 0 for c in columns], dtype=np.int32)
+        self.fiscal_quarters = np.array([c[4] or 0 for c in columns], dtype=np.int8)
+        self._name_trigrams: Dict[int, List[str]] = {}
+
+    @property
+    def nbytes(self) -> int:
+        arrays = (self.values, self.period_dates, self.period_types, self.statement_types,
+                  self.fiscal_years, self.fiscal_quarters)
+        return sum(a.nbytes for a in arrays) + sum(len(name) for name in self.line_items) * 2
+
+    def _match_rows(self, metric_ids: List[str], keywords: List[str]) -> Tuple[np.ndarray, np.ndarray]:
+        """Matching line item rows and their rank (`metric_id IN`, or ILIKE ranked by word_similarity)"""
+        if metric_ids:
+            rows = sorted({r for metric_id in metric_ids for r in self.metric_rows.get(metric_id, [])})
+            return np.array(rows, dtype=np.intp), np.ones(len(rows))
+
+        patterns = [_ilike_pattern(kw) for kw in keywords]
+        rows, ranks = [], []
+        for r, name in enumerate(self.line_items):
+            if not any(pattern.search(name) for pattern in patterns):
+                continue
+            grams = self._name_trigrams.get(r)
+            if grams is None:
+                grams = self._name_trigrams[r] = _trigrams(name)
+            rows.append(r)
+            ranks.append(max(word_similarity(kw, name, grams) for kw in keywords))
+        return np.array(rows, dtype=np.intp), np.array(ranks)
+
+    def _period_mask(self, periods: Optional[PeriodQuery]) -> np.ndarray:
+        """Columns satisfying any of the period constraints, as in SQLRetriever._period_clause"""
+        if periods is None or periods.is_empty:
+            return np.ones(self.values.shape[1], dtype=bool)
+
+        mask = np.zeros(self.values.shape[1], dtype=bool)
+        for constraint in periods.constraints:
+            matched = np.ones_like(mask)
+            if constraint.period_type:
+                matched &= self.period_types == constraint.period_type
+            date_range = constraint.date_range()
+            if date_range:
+                start, end = (np.datetime64(day, "D") for day in date_range)
+                matched &= (self.period_dates >= start) & (self.period_dates < end)
+            elif constraint.fiscal_quarter:
+                matched &= self.fiscal_quarters == constraint.fiscal_quarter
+            mask |= matched
+        # "last N years/quarters": on or after the Nth most recent period date of that type
+        for period_type, count in periods.latest.items():
+            typed = self.period_types == period_type
+            dates = np.unique(self.period_dates[typed])[::-1][:count]
+            if dates.size:
+                mask |= typed & (self.period_dates >= dates[-1])
+        return mask
+
+    def select(self, metric_ids: List[str], keywords: List[str], periods: Optional[PeriodQuery] = None,
+               limit: int = 200) -> List[CubeRow]:
+        """
+        Line item values for a question, as SQLRetriever.build_line_item_query returns them.
+
+        Args:
+            metric_ids: Canonical metric ids (takes precedence over keywords)
+            keywords: Keywords from extract_financial_keywords
+            periods: Period constraints from parse_periods
+            limit: Maximum number of rows
+
+        Returns:
+            List of (line_item, value, period_type, fiscal_year, fiscal_quarter, statement_type)
+        """
+        rows, ranks = self._match_rows(metric_ids, keywords)
+        if not rows.size or not self.values.shape[1]:
+            return []
+
+        present = ~np.isnan(self.values[rows]) & self._period_mask(periods)
+        hit_rows, hit_columns = np.nonzero(present)
+        # Best match first, then newest period (column order)
+        order = np.lexsort((hit_columns, -ranks[hit_rows]))[:limit]
+
+        results = []
+        for i in order:
+            r, c = rows[hit_rows[i]], hit_columns[i]
+            results.append((
+                self.line_items[r],
+                float(self.values[r, c]),
+                str(self.period_types[c]),
+                int(self.fiscal_years[c]),
+                int(self.fiscal_quarters[c]) or None,
+                str(self.statement_types[c]),
+            ))
+        return results
+
+
+class FinancialCubeCache:
+    """
+    Size-bounded LRU of per-ticker financial cubes.
+
+    A cube is built from one PostgreSQL query on first access; concurrent
+    first accesses share the same load, which runs on its own session so it
+    does not depend on (or outlive) any one request's session. Ingestion in
+    this process invalidates a ticker once its transaction commits; data
+    written by other workers or by ingest_data.py is picked up when the cube
+    expires after `ttl_seconds`.
+    """
+
+    def __init__(self, max_bytes: int, ttl_seconds: float, clock: Callable[[], float] = time.monotonic):
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self._clock = clock
+        self._cubes: "OrderedDict[str, FinancialCube]" = OrderedDict()
+        self._expires_at: Dict[str, float] = {}
+        self.flights = SingleFlight("financial_cube_load")
+        self._bytes = 0
+        self._generation = 0
+
+        # Instrumentation
+        self._hits = 0
+        self._misses = 0
+        self._loads = 0
+        self._evictions = 0
+        self._expirations = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_bytes > 0
+
+    async def get(self, ticker: str) -> Optional[FinancialCube]:
+        """
+        Cube for a ticker, loading it on a miss.
+
+        Args:
+            ticker: Company ticker symbol
+
+        Returns:
+            FinancialCube, or None if the company has no stored statements
+        """
+        cube = self._cubes.get(ticker)
+        if cube is not None and self._expires_at[ticker] <= self._clock():
+            self._remove(ticker)
+            self._expirations += 1
+            cube = None
+        if cube is not None:
+            self._cubes.move_to_end(ticker)
+            self._hits += 1
+            return cube
+
+        self._misses += 1
+        generation = self._generation
+        return await self.flights.do(ticker, lambda: self._load(ticker, generation))
+
+    async def _load(self, ticker: str, generation: int) -> Optional[FinancialCube]:
+        self._loads += 1
+        company_generation = company_cache.generation
+        async with AsyncSessionLocal() as db:
+            result = await db.execute(
+                select(
+                    Company.id.label("company_id"),
+                    Company.name.label("company_name"),
+                    Company.sector,
+                    FinancialLineItem.line_item_name,
+                    FinancialLineItem.metric_id,
+                    FinancialLineItem.line_item_value,
+                    FinancialStatement.period_type,
+                    FinancialStatement.period_date,
+                    FinancialStatement.statement_type,
+                    FinancialStatement.fiscal_year,
+                    FinancialStatement.fiscal_quarter
+                )
+                .select_from(FinancialStatement)
+                .join(Company, FinancialStatement.company_id == Company.id)
+                .outerjoin(FinancialLineItem, FinancialLineItem.statement_id == FinancialStatement.id)
+                .where(Company.ticker == ticker)
+            )
+            rows = result.all()
+        if not rows:
+            return None
+
+        first = rows[0]
+        company_cache.put(
+            CompanyInfo(id=first.company_id, ticker=ticker, name=first.company_name, sector=first.sector),
+            company_generation
+        )
+        cube = FinancialCube(first.company_id, rows)
+        if generation == self._generation:
+            self._put(ticker, cube)
+        return cube
+
+    def _put(self, ticker: str, cube: FinancialCube):
+        if cube.nbytes > self.max_bytes:
+            return
+        self._remove(ticker)
+        self._cubes[ticker] = cube
+        self._expires_at[ticker] = self._clock() + self.ttl_seconds
+        self._bytes += cube.nbytes
+        while self._bytes > self.max_bytes:
+            self._remove(next(iter(self._cubes)))
+            self._evictions += 1
+
+    def _remove(self, ticker: str):
+        cube = self._cubes.pop(ticker, None)
+        if cube is not None:
+            del self._expires_at[ticker]
+            self._bytes -= cube.nbytes
+
+    def invalidate(self, ticker: Optional[str] = None):
+        """Drop one ticker's cube, or all cubes when ticker is None"""
+        self._generation += 1
+        if ticker is None:
+            self._cubes.clear()
+            self._expires_at.clear()
+            self._bytes = 0
+            return
+        self._remove(ticker)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get cache statistics."""
+        lookups = self._hits + self._misses
+        return {
+            "enabled": self.enabled,
+            "cubes": len(self._cubes),
+            "bytes": self._bytes,
+            "max_bytes": self.max_bytes,
+            "ttl_seconds": self.ttl_seconds,
+            "hits": self._hits,
+            "misses": self._misses,
+            "loads": self._loads,
+            "evictions": self._evictions,
+            "expirations": self._expirations,
+            "single_flight": self.flights.get_stats(),
+            "hit_rate": self._hits / lookups if lookups else 0.0
+        }
+
+
+# Global instance
+financial_cube_cache = FinancialCubeCache(
+    max_bytes=int(settings.FINANCIAL_CUBE_MAX_MB * 1024 * 1024),
+    ttl_seconds=settings.FINANCIAL_CUBE_TTL_S
+)
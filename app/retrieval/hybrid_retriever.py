@@ -1,9 +1,16 @@
-from typing import List, Dict, Any
+import asyncio
+import logging
+import time
+from typing import List, Dict, Any, Optional, Tuple
 from sqlalchemy.ext.asyncio import AsyncSession
+from app.core.deadline import Deadline
 from app.retrieval.query_classifier import query_classifier, QueryType
 from app.retrieval.sql_retriever import SQLRetriever
+from app.retrieval.context_builder import context_builder
 from app.core.vector_store import vector_store
 
+logger = logging.getLogger(__name__)
+
 class HybridRetriever:
     def __init__(self, db: AsyncSession):
         self.db = db
@@ -12,70 +19,115 @@ class HybridRetriever:
         self.sql_retriever = SQLRetriever(db)
         # Vector store matches implicit global instance or can be passed locally logic
 
-    async def retrieve(self, ticker: str, query: str) -> Dict[str, Any]:
+    async def retrieve(self, ticker: str, query: str, deadline: Optional[Deadline] = None) -> Dict[str, Any]:
         """
         Perform hybrid retrieval based on query type.
+
+        When the query type is not known without an LLM call, SQL and vector
+        retrieval start speculatively alongside classification; the branch the
+        query type does not need is then cancelled (and awaited, so a cancelled
+        SQL query has released the request's session before this returns).
+
+        The deadline bounds classification and vector search; when either runs
+        out of budget the query is answered from what is available (hybrid
+        routing without classification, SQL-only context).
         """
-        print(f"DEBUG: [HybridRetriever] Starting retrieval for ticker={ticker}, query='{query}'", flush=True)
-        query_type = await self.classifier.classify(query)
-        print(f"DEBUG: [HybridRetriever] Classification Result: {query_type}", flush=True)
-        
-        sql_results = []
-        vector_results = []
-        
-        print(f"DEBUG: [HybridRetriever] Starting SQL Retrieval...", flush=True)
-        
-        # SQL Retrieval (for Numeric or Hybrid)
-        if query_type in [QueryType.NUMERIC, QueryType.HYBRID]:
-            # Reduced limit to 30 to prevent OOM on Render Free Tier
-            sql_data = await self.sql_retriever.retrieve_financial_data(ticker, query, limit=30)
-            print(f"DEBUG: [HybridRetriever] SQL Retrieval done. Found {len(sql_data)} items.", flush=True)
-            print(f"DEBUG: [HybridRetriever] SQL Retriever found {len(sql_data)} items")
-            
-            # Print breakdown of items found
-            item_names = [d['line_item'] for d in sql_data]
-            print(f"DEBUG: Items breakdown: {item_names[:10]} ...")
-            if any("revenue" in name.lower() for name in item_names):
-                print("DEBUG: ✅ 'Revenue' keyword found in retrieved data.")
-            else:
-                print("DEBUG: ❌ 'Revenue' NOT found in retrieved data!")
-                
-            sql_results.extend(sql_data)
-
-        # Vector Retrieval (for Factual or Hybrid)
-        if query_type in [QueryType.FACTUAL, QueryType.HYBRID]:
-            print(f"DEBUG: [HybridRetriever] Starting Vector Retrieval...", flush=True)
-            vector_data = await vector_store.similarity_search(
-                query, 
-                n_results=5, 
-                filter={"ticker": ticker}
-            )
-            print(f"DEBUG: Vector Retriever found {len(vector_data)} items")
-            vector_results.extend(vector_data)
+        logger.debug(f"Starting retrieval for ticker={ticker}, query='{query}'")
+        started = time.perf_counter()
+        timings: Dict[str, Any] = {}
+
+        query_type = self.classifier.classify_fast(query)
+        speculative = query_type is None
+        sql_task: Optional[asyncio.Task] = None
+        vector_task: Optional[asyncio.Task] = None
+
+        if speculative:
+            sql_task = asyncio.create_task(self._timed(self._sql_retrieve(ticker, query), timings, "sql_ms"))
+            vector_task = asyncio.create_task(self._timed(self._vector_retrieve(ticker, query, deadline), timings, "vector_ms"))
+            try:
+                query_type = await self._timed(self.classifier.classify(query, deadline=deadline, fast_checked=True), timings, "classify_ms")
+            except BaseException:
+                for task in (sql_task, vector_task):
+                    task.cancel()
+                await asyncio.gather(sql_task, vector_task, return_exceptions=True)
+                raise
+        else:
+            timings["classify_ms"] = (time.perf_counter() - started) * 1000
+        logger.debug(f"Classification result: {query_type}")
+
+        needs_sql = query_type in [QueryType.NUMERIC, QueryType.HYBRID]
+        needs_vector = query_type in [QueryType.FACTUAL, QueryType.HYBRID]
+
+        # Unneeded speculative branches
+        wasted = []
+        if vector_task is not None and not needs_vector:
+            vector_task.cancel()
+            wasted.append("vector")
+        if sql_task is not None and not needs_sql:
+            sql_task.cancel()
+            wasted.append("sql")
+
+        if sql_task is None and needs_sql:
+            sql_task = asyncio.create_task(self._timed(self._sql_retrieve(ticker, query), timings, "sql_ms"))
+        if vector_task is None and needs_vector:
+            vector_task = asyncio.create_task(self._timed(self._vector_retrieve(ticker, query, deadline), timings, "vector_ms"))
+
+        tasks = [task for task in (sql_task, vector_task) if task is not None]
+        results = await asyncio.gather(*tasks, return_exceptions=True)
+        outcome = dict(zip(tasks, results))
+
+        sql_results = self._branch_result(outcome.get(sql_task)) if needs_sql else []
+        vector_results = self._branch_result(outcome.get(vector_task)) if needs_vector else []
+
+        context_started = time.perf_counter()
+        context_str, context_report = self._build_context_str(sql_results, vector_results)
+        timings["context_ms"] = (time.perf_counter() - context_started) * 1000
+
+        timings["speculative"] = speculative
+        timings["wasted_branches"] = wasted
+        timings["context"] = context_report
+        timings["total_ms"] = (time.perf_counter() - started) * 1000
+        logger.debug(f"Retrieval timings: {timings}")
 
         return {
             "query_type": query_type.value,
             "sql_results": sql_results,
             "vector_results": vector_results,
-            "context_str": self._build_context_str(sql_results, vector_results)
+            "context_str": context_str,
+            "timings": timings
         }
 
-    def _build_context_str(self, sql_results: List[Dict], vector_results: List[Dict]) -> str:
-        """Merge results into a formatted string for LLM"""
-        context_parts = []
-        
-        if sql_results:
-            context_parts.append("=== STRUCTURED FINANCIAL DATA (High Confidence) ===")
-            for item in sql_results:
-                context_parts.append(
-                    f"- {item['line_item']}: {item['value']:,} ({item['period']}, {item['statement']})"
-                )
-            context_parts.append("")
-            
-        if vector_results:
-            context_parts.append("=== TEXTUAL CONTEXT FRAGMENTS ===")
-            for item in vector_results:
-                text = item['text'].replace('\n', ' | ')
-                context_parts.append(f"- {text}")
-                
-        return "\n".join(context_parts)
+    @staticmethod
+    async def _timed(awaitable, timings: Dict[str, Any], key: str):
+        started = time.perf_counter()
+        try:
+            return await awaitable
+        finally:
+            timings[key] = (time.perf_counter() - started) * 1000
+
+    @staticmethod
+    def _branch_result(result: Any) -> List[Dict]:
+        """Result of a needed branch (errors propagate; a discarded branch's errors do not)"""
+        if isinstance(result, BaseException):
+            raise result
+        return result or []
+
+    async def _sql_retrieve(self, ticker: str, query: str) -> List[Dict]:
+        # Reduced limit to 30 to prevent OOM on Render Free Tier
+        sql_data = await self.sql_retriever.retrieve_financial_data(ticker, query, limit=30)
+        logger.debug(f"SQL retrieval found {len(sql_data)} items: {[d['line_item'] for d in sql_data[:10]]}")
+        return sql_data
+
+    async def _vector_retrieve(self, ticker: str, query: str, deadline: Optional[Deadline]) -> List[Dict]:
+        vector_data = await vector_store.similarity_search(
+            query,
+            n_results=5,
+            filter={"ticker": ticker},
+            deadline=deadline
+        )
+        logger.debug(f"Vector retrieval found {len(vector_data)} items")
+        return vector_data
+
+    def _build_context_str(self, sql_results: List[Dict], vector_results: List[Dict]) -> Tuple[str, Dict[str, Any]]:
+        """Merge results into a deduplicated, token-budgeted string for the LLM (plus its token report)"""
+        return context_builder.build(sql_results, vector_results)
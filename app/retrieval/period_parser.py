@@ -0,0 +1,143 @@
+"""
+Period Expression Parser
+
+Turns the period wording of a question ("FY24", "Q2 FY24 vs Q2 FY23",
+"2021-2023", "last 3 years", "trailing four quarters") into structured
+constraints the retrievers push down as period predicates.
+
+Fiscal years and quarters follow the ingestion convention: fiscal_year is
+the calendar year of the period end date and fiscal_quarter its calendar
+quarter, so each constraint maps to a period_date range.
+"""
+
+import re
+from datetime import date
+from typing import Dict, List, Optional, Tuple
+from pydantic import BaseModel
+
+NUMBER_WORDS = {
+    "one": 1, "two": 2, "three": 3, "four": 4, "five": 5, "six": 6,
+    "seven": 7, "eight": 8, "nine": 9, "ten": 10, "eleven": 11, "twelve": 12,
+}
+
+_YEAR = r"(?:\bfy\s*'?(\d{4}|\d{2})(?!\d)|\b(20\d{2})(?!\d))"
+_NUMBER = r"(\d{1,2}|" + "|".join(NUMBER_WORDS) + r")"
+
+_QUARTER_YEAR = re.compile(r"\bq([1-4])\s*(?:of\s*)?" + _YEAR, re.IGNORECASE)
+_YEAR_QUARTER = re.compile(_YEAR + r"\s*q([1-4])\b", re.IGNORECASE)
+_QUARTER = re.compile(r"\bq([1-4])\b", re.IGNORECASE)
+_YEAR_RANGE = re.compile(_YEAR + r"\s*(?:-|–|to|through|until)\s*" + _YEAR, re.IGNORECASE)
+_BETWEEN_YEARS = re.compile(r"\bbetween\s+" + _YEAR + r"\s+and\s+" + _YEAR, re.IGNORECASE)
+_ANY_YEAR = re.compile(_YEAR, re.IGNORECASE)
+_LAST_N = re.compile(r"\b(?:last|past|previous|prior|trailing|recent|latest)\s+" + _NUMBER + r"\s+(years?|quarters?)\b",
+                     re.IGNORECASE)
+_LATEST_ONE = re.compile(r"\b(?:latest|last|most recent|recent|current)\s+(quarter|year)\b", re.IGNORECASE)
+_TTM = re.compile(r"\b(?:ttm|trailing twelve months|last twelve months|ltm)\b", re.IGNORECASE)
+_ANNUAL = re.compile(r"\b(?:annual|annually|yearly|full[- ]year)\b", re.IGNORECASE)
+_QUARTERLY = re.compile(r"\bquarterly\b", re.IGNORECASE)
+
+
+class PeriodConstraint(BaseModel):
+    fiscal_year: Optional[int] = None
+    fiscal_quarter: Optional[int] = None
+    period_type: Optional[str] = None  # 'annual', 'quarterly' or None for either
+
+    def date_range(self) -> Optional[Tuple[date, date]]:
+        """[start, end) of period_date covered by this constraint (None without a year)"""
+        if self.fiscal_year is None:
+            return None
+        if self.fiscal_quarter is None:
+            return date(self.fiscal_year, 1, 1), date(self.fiscal_year + 1, 1, 1)
+        start = date(self.fiscal_year, 3 * self.fiscal_quarter - 2, 1)
+        end = date(self.fiscal_year + 1, 1, 1) if self.fiscal_quarter == 4 else date(self.fiscal_year, 3 * self.fiscal_quarter + 1, 1)
+        return start, end
+
+
+class PeriodQuery(BaseModel):
+    constraints: List[PeriodConstraint] = []
+    latest: Dict[str, int] = {}  # period_type -> number of most recent periods
+
+    @property
+    def is_empty(self) -> bool:
+        return not self.constraints and not self.latest
+
+
+def _year(two_or_four: Optional[str], four: Optional[str]) -> int:
+    value = two_or_four or four
+    return int("20" + value) if len(value) == 2 else int(value)
+
+
+def _count(token: str) -> int:
+    return int(token) if token.isdigit() else NUMBER_WORDS[token.lower()]
+
+
+def parse_periods(query_text: str) -> PeriodQuery:
+    """
+    Extract period constraints from a question.
+
+    Args:
+        query_text: Natural language query
+
+    Returns:
+        PeriodQuery (empty when the question names no period)
+    """
+    text = query_text
+    constraints: List[PeriodConstraint] = []
+    latest: Dict[str, int] = {}
+
+    period_type = None
+    if _ANNUAL.search(text) and not _QUARTERLY.search(text):
+        period_type = "annual"
+    elif _QUARTERLY.search(text) and not _ANNUAL.search(text):
+        period_type = "quarterly"
+
+    # Relative windows: "last 3 years", "trailing four quarters", "TTM", "latest quarter"
+    for match in _LAST_N.finditer(text):
+        count = _count(match.group(1))
+        if count < 1:
+            continue  # "last 0 years" names no window
+        unit = "annual" if match.group(2).lower().startswith("year") else "quarterly"
+        latest[unit] = max(latest.get(unit, 0), count)
+    if _TTM.search(text):
+        latest["quarterly"] = max(latest.get("quarterly", 0), 4)
+    for match in _LATEST_ONE.finditer(text):
+        unit = "annual" if match.group(1).lower() == "year" else "quarterly"
+        latest.setdefault(unit, 1)
+    text = _TTM.sub(" ", _LATEST_ONE.sub(" ", _LAST_N.sub(" ", text)))
+
+    # Quarter + year pairs: "Q2 FY24", "Q3 2023", "FY24 Q2"
+    for match in _QUARTER_YEAR.finditer(text):
+        constraints.append(PeriodConstraint(
+            fiscal_year=_year(match.group(2), match.group(3)), fiscal_quarter=int(match.group(1)), period_type="quarterly"
+        ))
+    text = _QUARTER_YEAR.sub(" ", text)
+    for match in _YEAR_QUARTER.finditer(text):
+        constraints.append(PeriodConstraint(
+            fiscal_year=_year(match.group(1), match.group(2)), fiscal_quarter=int(match.group(3)), period_type="quarterly"
+        ))
+    text = _YEAR_QUARTER.sub(" ", text)
+
+    # Year ranges: "2021-2023", "FY21 to FY23", "between 2020 and 2022"
+    for pattern in (_BETWEEN_YEARS, _YEAR_RANGE):
+        for match in pattern.finditer(text):
+            first, last = sorted((_year(match.group(1), match.group(2)), _year(match.group(3), match.group(4))))
+            if last - first <= 50:
+                constraints.extend(
+                    PeriodConstraint(fiscal_year=year, period_type=period_type) for year in range(first, last + 1)
+                )
+        text = pattern.sub(" ", text)
+
+    # Single years: "FY24", "2022"
+    for match in _ANY_YEAR.finditer(text):
+        constraints.append(PeriodConstraint(fiscal_year=_year(match.group(1), match.group(2)), period_type=period_type))
+    text = _ANY_YEAR.sub(" ", text)
+
+    # A bare quarter ("Q3") applies to every year
+    for match in _QUARTER.finditer(text):
+        constraints.append(PeriodConstraint(fiscal_quarter=int(match.group(1)), period_type="quarterly"))
+
+    unique: List[PeriodConstraint] = []
+    for constraint in constraints:
+        if constraint not in unique:
+            unique.append(constraint)
+    return PeriodQuery(constraints=unique, latest=latest)
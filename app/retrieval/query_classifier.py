@@ -1,14 +1,25 @@
+import asyncio
+import logging
+import random
+import re
+import time
 from enum import Enum
-from typing import List, Optional
+from typing import Any, Dict, Optional, Set
 from pydantic import BaseModel, Field
 from langchain_groq import ChatGroq
 from langchain_core.prompts import ChatPromptTemplate
 from langchain_core.output_parsers import JsonOutputParser
 from app.core.config import get_settings
-from tenacity import retry, stop_after_attempt, wait_exponential, retry_if_exception_type
+from app.core.deadline import Deadline, DeadlineExceeded, stop_before_deadline
+from app.core.metric_catalog import metric_catalog
+from app.core.ttl_cache import TTLCache
+from app.llm.rate_limiter import Priority, estimate_tokens, groq_rate_limiter, is_rate_limit_error
+from app.retrieval.period_parser import parse_periods
+from tenacity import retry, stop_after_attempt, wait_exponential, retry_if_exception_type, retry_if_not_exception_type
 # from google.api_core.exceptions import ResourceExhausted
 
 settings = get_settings()
+logger = logging.getLogger(__name__)
 
 class QueryType(Enum):
     NUMERIC = "numeric"  # SQL Tables (Income, Balance, Ratios)
@@ -20,8 +31,99 @@ class ClassificationResult(BaseModel):
     query_type: str = Field(description="The classified type: numeric, factual, hybrid, or general")
     reasoning: str = Field(description="Brief reason for the classification")
 
+class LocalQueryClassifier:
+    """
+    Rule-based first tier: decides clear-cut queries without a model call.
+
+    Numeric evidence is a catalogued metric or a period in the question plus
+    quantitative wording; factual evidence is qualitative wording (business,
+    management, risks, strategy, and nouns such as policy, plan or guidance
+    that make "dividend policy" a question about text, not a figure). A query is only decided when the evidence
+    points one way; anything mixed or unrecognised returns None so the LLM
+    tier classifies it.
+    """
+
+    NUMERIC_PATTERN = re.compile(
+        r"\b(?:how much|how many|calculate|compute|ratio|ratios|margin|margins|growth|grew|grow|increase|increased|"
+        r"decrease|decreased|declined?|trend|compare|comparison|versus|vs|figure|figures|numbers?|amount|"
+        r"percentage|percent|yoy|qoq|cagr|per share|valuation|p/e|pe ratio)\b|%",
+        re.IGNORECASE
+    )
+    FACTUAL_PATTERN = re.compile(
+        r"\b(?:what does .{1,40} do|business model|describe|description|overview|about the company|ceo|cfo|"
+        r"chairman|founders?|founded|headquarter(?:s|ed)?|management|board|directors?|risks?|strategy|strategic|"
+        r"competitors?|competition|products?|services|segments?|subsidiar(?:y|ies)|customers|clients|employees|"
+        r"history|mission|vision|outlook|guidance|acquisitions?|mergers?|lawsuits?|litigation|regulat\w*|esg|"
+        r"sustainability|operates?|industry|polic(?:y|ies)|plans?|planned|approach|philosophy|framework|"
+        r"initiatives?|priorities|objectives?|goals?|targets?|roadmap|commentary|governance|practices?)\b",
+        re.IGNORECASE
+    )
+    CAUSAL_PATTERN = re.compile(
+        r"\b(?:why|reasons?|because|explain|drivers?|drove|driven|caused?|impact(?:ed)?|affect(?:ed)?|due to)\b",
+        re.IGNORECASE
+    )
+    GENERAL_PATTERN = re.compile(
+        r"^\s*(?:hi|hello|hey|thanks|thank you|good (?:morning|afternoon|evening)|who are you|help)\b"
+        r"|^\s*(?:what (?:is|are) (?:a|an)\b|define\b|definition of\b|meaning of\b)",
+        re.IGNORECASE
+    )
+
+    def classify(self, query: str) -> Optional[QueryType]:
+        """
+        Classify a query from its wording alone.
+
+        Args:
+            query: User question
+
+        Returns:
+            QueryType when the wording is unambiguous, otherwise None
+        """
+        numeric = 2 * len(metric_catalog.match(query)) + len(self.NUMERIC_PATTERN.findall(query))
+        if not parse_periods(query).is_empty:
+            numeric += 1
+        factual = len(self.FACTUAL_PATTERN.findall(query))
+        causal = self.CAUSAL_PATTERN.search(query) is not None
+
+        if self.GENERAL_PATTERN.search(query):
+            return QueryType.GENERAL if not numeric and not factual else None
+        if causal:
+            # "Why did revenue drop in 2023?" needs the numbers and the narrative
+            return QueryType.HYBRID if numeric and not factual else None
+        if numeric and not factual:
+            return QueryType.NUMERIC
+        if factual and not numeric:
+            return QueryType.FACTUAL
+        return None
+
+
 class QueryClassifier:
+    """
+    Two-tier query classifier: the local rules decide confident cases, the
+    LLM classifies the rest. LLM results are cached by normalized query text,
+    and concurrent identical queries share one in-flight LLM call. A sample of
+    local decisions (CLASSIFIER_AUDIT_RATE) is re-classified by the LLM in the
+    background to track agreement.
+    """
+
+    _WHITESPACE = re.compile(r"\s+")
+
     def __init__(self):
+        self.local = LocalQueryClassifier() if settings.LOCAL_CLASSIFIER else None
+        self.audit_rate = settings.CLASSIFIER_AUDIT_RATE
+        self._audits: Set[asyncio.Task] = set()
+        self.cache = TTLCache(settings.CLASSIFICATION_CACHE_SIZE, settings.CLASSIFICATION_CACHE_TTL_S,
+                              name="classification")
+
+        # Instrumentation
+        self._tier_hits = {"local": 0, "cache": 0, "llm": 0, "coalesced": 0}  # coalesced: joined another call
+        self._local_types = {query_type.value: 0 for query_type in QueryType}
+        self._local_seconds = 0.0
+        self._llm_errors = 0
+        self._deadline_skips = 0
+        self._audited = 0
+        self._agreed = 0
+        self._disagreements: Dict[str, int] = {}
+
         # Use a lightweight fast model for classification
         self.llm = ChatGroq(
             model="llama-3.1-8b-instant", 
@@ -46,38 +148,153 @@ Output JSON only.
         ])
         
         self.chain = self.prompt | self.llm | self.parser
+        self._prompt_tokens = estimate_tokens(self.prompt.format(query=""))
 
     @retry(
-        retry=retry_if_exception_type(Exception), # Groq might raise different errors, general retry for now + specific
-        stop=stop_after_attempt(5),
+        # Groq might raise different errors, general retry for now + specific
+        retry=retry_if_exception_type(Exception) & retry_if_not_exception_type(DeadlineExceeded),
+        stop=stop_after_attempt(5) | stop_before_deadline,
         wait=wait_exponential(multiplier=1, min=4, max=10)
     )
-    async def _execute_chain(self, query: str):
-        return await self.chain.ainvoke({"query": query})
+    async def _execute_chain(self, query: str, deadline: Optional[Deadline] = None,
+                             priority: Priority = Priority.INTERACTIVE):
+        # System prompt + query + a short JSON reply
+        estimated = self._prompt_tokens + estimate_tokens(query) + 64
+        await groq_rate_limiter.acquire(estimated, priority, deadline)
+        try:
+            if deadline is None:
+                return await self.chain.ainvoke({"query": query})
+            return await deadline.run(self.chain.ainvoke({"query": query}))
+        except Exception as e:
+            if is_rate_limit_error(e):
+                groq_rate_limiter.on_rate_limited()
+            raise
+
+    async def _classify_llm(self, query: str, deadline: Optional[Deadline] = None,
+                            priority: Priority = Priority.INTERACTIVE) -> QueryType:
+        result = await self._execute_chain(query, deadline=deadline, priority=priority)
 
-    async def classify(self, query: str) -> QueryType:
+        q_type_str = result.get("query_type", "hybrid").lower()
+
+        if "numeric" in q_type_str:
+            return QueryType.NUMERIC
+        elif "factual" in q_type_str:
+            return QueryType.FACTUAL
+        elif "general" in q_type_str:
+            return QueryType.GENERAL
+        else:
+            return QueryType.HYBRID
+
+    def classify_fast(self, query: str) -> Optional[QueryType]:
         """
-        Classifies the query using LLM.
+        Classification available without an LLM call: the local rules, then the cache.
+
+        Args:
+            query: User question
+
+        Returns:
+            QueryType, or None when only the LLM can decide
         """
-        try:
-            # We use invoke (sync) wrapped in sync-to-async if needed, or if chain supports async invoke
-            # LangChain chains usually support ainvoke
-            result = await self._execute_chain(query)
-            
-            q_type_str = result.get("query_type", "hybrid").lower()
-            
-            if "numeric" in q_type_str:
-                return QueryType.NUMERIC
-            elif "factual" in q_type_str:
-                return QueryType.FACTUAL
-            elif "general" in q_type_str:
-                return QueryType.GENERAL
-            else:
+        if self.local is not None:
+            started = time.perf_counter()
+            local_type = self.local.classify(query)
+            self._local_seconds += time.perf_counter() - started
+            if local_type is not None:
+                self._tier_hits["local"] += 1
+                self._local_types[local_type.value] += 1
+                if self.audit_rate > 0 and random.random() < self.audit_rate:
+                    task = asyncio.create_task(self._audit(query, local_type))
+                    self._audits.add(task)
+                    task.add_done_callback(self._audits.discard)
+                return local_type
+
+        cached = self.cache.get(self.normalize(query))
+        if cached is not None:
+            self._tier_hits["cache"] += 1
+        return cached
+
+    async def classify(self, query: str, deadline: Optional[Deadline] = None,
+                       fast_checked: bool = False) -> QueryType:
+        """
+        Classifies the query, locally when the wording is unambiguous, else using the LLM.
+
+        With a deadline, the LLM tier gets at most CLASSIFY_BUDGET_MS and must leave
+        ANSWER_RESERVE_MS for generation; past that the query is treated as hybrid.
+        Pass fast_checked=True when classify_fast() has already returned None for
+        this query, so the local rules and cache are not consulted twice.
+        """
+        if not fast_checked:
+            fast = self.classify_fast(query)
+            if fast is not None:
+                return fast
+
+        budget = None
+        if deadline is not None:
+            budget = deadline.child(cap=settings.CLASSIFY_BUDGET_MS / 1000, reserve=settings.ANSWER_RESERVE_MS / 1000)
+            if budget.expired:
+                self._deadline_skips += 1
+                deadline.note("classify")
                 return QueryType.HYBRID
+
+        called_llm = False
+
+        async def load() -> QueryType:
+            nonlocal called_llm
+            called_llm = True
+            return await self._classify_llm(query, deadline=budget)
+
+        try:
+            # classify_fast() has just missed the cache; join or start the in-flight LLM call
+            classification = asyncio.shield(self.cache.load(self.normalize(query), load))
+            # A caller sharing another request's in-flight call still stops at its own budget
+            return await (budget.run(classification) if budget is not None else classification)
         except Exception as e:
             print(f"Classifier Error: {e}")
-            # Fallback to Hybrid on error
+            if called_llm:
+                self._llm_errors += 1
+            if deadline is not None:
+                deadline.note("classify")
+            # Fallback to Hybrid on error (not cached)
             return QueryType.HYBRID
+        finally:
+            self._tier_hits["llm" if called_llm else "coalesced"] += 1
+
+    @classmethod
+    def normalize(cls, query: str) -> str:
+        """Case-fold, collapse whitespace and drop trailing punctuation so trivial variants share an entry"""
+        return cls._WHITESPACE.sub(" ", query.casefold()).strip().rstrip("?!. ")
+
+    async def _audit(self, query: str, local_type: QueryType):
+        """Compare a local decision with the LLM's (runs in the background)"""
+        try:
+            llm_type = await self._classify_llm(query, priority=Priority.BACKGROUND)
+        except Exception as e:
+            logger.debug(f"Classifier audit skipped: {e}")
+            return
+        self._audited += 1
+        if llm_type == local_type:
+            self._agreed += 1
+        else:
+            key = f"{local_type.value}->{llm_type.value}"
+            self._disagreements[key] = self._disagreements.get(key, 0) + 1
+            logger.info(f"Local classifier disagreement ({key}): {query!r}")
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get classifier statistics."""
+        local_calls = sum(self._tier_hits.values()) if self.local is not None else 0
+        return {
+            "local_enabled": self.local is not None,
+            "tier_hits": dict(self._tier_hits),
+            "local_types": dict(self._local_types),
+            "avg_local_us": self._local_seconds / local_calls * 1e6 if local_calls else 0.0,
+            "llm_errors": self._llm_errors,
+            "deadline_skips": self._deadline_skips,
+            "audit_rate": self.audit_rate,
+            "audited": self._audited,
+            "agreement_rate": self._agreed / self._audited if self._audited else None,
+            "disagreements": dict(self._disagreements),
+            "cache": self.cache.get_stats()
+        }
 
 # Global Singleton Instance
 query_classifier = QueryClassifier()
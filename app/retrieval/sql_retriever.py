@@ -1,38 +1,38 @@
 from typing import List, Dict, Optional
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, and_, or_
-from app.models.models import Company, FinancialStatement, FinancialLineItem
+from sqlalchemy import select, and_, or_, func, literal
+from sqlalchemy.orm import aliased
+from sqlalchemy.sql import Select
+from datetime import date
+from app.models.models import Company, FinancialStatement, FinancialLineItem, LatestFinancialSnapshot
+from app.retrieval.company_cache import company_cache, CompanyInfo
+from app.retrieval.financial_cube import financial_cube_cache
+from app.retrieval.period_parser import PeriodQuery, parse_periods
+from app.core.metric_catalog import metric_catalog
 import re
 import logging
 
 logger = logging.getLogger(__name__)
 
+# Questions about more than the latest value must read the full history
+HISTORY_PATTERN = re.compile(
+    r"\b(trend|trends|history|historical|over time|over the (last|past)|growth|grow|grew|compare|compared|"
+    r"comparison|versus|vs|change|changed|since|previous|prior|years|quarters|quarterly|annually)\b",
+    re.IGNORECASE
+)
+
 
 class SQLRetriever:
     def __init__(self, db: AsyncSession):
         self.db = db
         
-        # Financial terminology mappings for better keyword matching
-        self.financial_term_mappings = {
-            # Revenue synonyms
-            "revenue": ["revenue", "sales", "turnover", "income", "earnings"],
-            "profit": ["profit", "income", "earnings", "pbt", "pat"],
-            "margin": ["margin"],
-            "assets": ["assets", "asset"],
-            "liabilities": ["liabilities", "liability", "debt"],
-            "equity": ["equity", "stockholders", "shareholders"],
-            "capex": ["capital expenditure", "capex", "capital spending"],
-            "cash": ["cash", "cash flow"],
-            "ebitda": ["ebitda", "operating income", "operating profit"],
-            "roe": ["return on equity", "roe"],
-            "roa": ["return on assets", "roa"],
-            "ratio": ["ratio", "current ratio", "debt"],
-        }
+        # Canonical metric catalogue (shared with ingestion and ratio calculation)
+        self.metric_catalog = metric_catalog
     
     def extract_financial_keywords(self, query_text: str) -> List[str]:
         """
-        Extract relevant financial keywords from query text.
-        Maps common financial terms to their database equivalents.
+        Extract fallback keywords from query text, used when the question
+        names no catalogued metric or the named metrics have no rows.
         
         Args:
             query_text: Natural language query
@@ -43,14 +43,11 @@ class SQLRetriever:
         query_lower = query_text.lower()
         keywords = []
         
-        # Check for mapped financial terms
-        for term, synonyms in self.financial_term_mappings.items():
-            if term in query_lower:
-                keywords.extend(synonyms)
-        
-        # Also extract simple keywords (longer than 3 chars, not common words)
+        # Extract simple keywords (longer than 3 chars, not common words)
         stop_words = {"what", "when", "where", "which", "who", "how", "the", "is", 
-                     "are", "was", "were", "for", "and", "or", "but", "from", "with"}
+                     "are", "was", "were", "for", "and", "or", "but", "from", "with",
+                     "show", "tell", "about", "much", "many", "does", "have", "give",
+                     "company", "year", "years", "quarter", "latest", "trend"}
         
         words = re.findall(r'\b\w+\b', query_lower)
         for word in words:
@@ -68,56 +65,36 @@ class SQLRetriever:
         logger.debug(f"Extracted keywords from '{query_text}': {unique_keywords}")
         return unique_keywords
 
-    async def retrieve_financial_data(self, ticker: str, query_text: str, limit: int = 200) -> List[Dict]:
+    def build_line_item_query(self, company_id: Optional[int], keywords: List[str],
+                              periods: Optional[PeriodQuery] = None, limit: int = 200,
+                              ticker: Optional[str] = None, metric_ids: Optional[List[str]] = None) -> Select:
         """
-        Retrieve financial data from PostgreSQL based on ticker and query context.
-        Uses improved keyword extraction with financial term mappings.
-        
-        Args:
-            ticker: Company ticker symbol
-            query_text: Natural language query
-            limit: Maximum number of results
-            
-        Returns:
-            List of matching financial line items
-        """
-        
-        # 1. Get Company ID
-        company_stmt = select(Company).where(Company.ticker == ticker)
-        result = await self.db.execute(company_stmt)
-        company = result.scalar_one_or_none()
-        
-        if not company:
-            logger.warning(f"Company not found: {ticker}")
-            return []
+        Build the line item lookup for one company.
 
-        # 2. Extract keywords using improved method
-        keywords = self.extract_financial_keywords(query_text)
-        
-        if not keywords:
-            logger.warning(f"No keywords extracted from query: {query_text}")
-            return []
+        With `metric_ids` this is an exact `metric_id IN (...)` lookup served
+        by idx_line_items_statement_metric, newest periods first.
 
-        # 3. Extract Year from query (e.g., "2022", "FY24", "FY 2023")
-        target_year = None
-        
-        # Match "FY22", "FY 22", "FY2022", "FY 2022"
-        fy_match = re.search(r'fy\s*(\d{2,4})', query_text, re.IGNORECASE)
-        if fy_match:
-            year_str = fy_match.group(1)
-            target_year = int("20" + year_str) if len(year_str) == 2 else int(year_str)
-        
-        # Match full year "2022", "2023"
-        if not target_year:
-            full_year_match = re.search(r'\b(20\d{2})\b', query_text)
-            if full_year_match:
-                target_year = int(full_year_match.group(1))
-        
-        if target_year:
-            logger.debug(f"Extracted fiscal year from query: {target_year}")
+        Otherwise each keyword becomes an `ILIKE '%kw%'` condition; the OR of
+        these is served by the pg_trgm GIN index (idx_line_items_name_trgm)
+        instead of scanning every line item. Rows are ranked by trigram word
+        similarity to the closest keyword, then by most recent period.
+
+        Without a `company_id` the company is joined on `ticker` and its key
+        columns are selected too, so an uncached lookup is still one round trip.
 
-        # 4. Build dynamic OR clause for line items
-        conditions = [FinancialLineItem.line_item_name.ilike(f"%{kw}%") for kw in keywords]
+        Args:
+            company_id: Database id of the company (None to match on ticker)
+            keywords: Keywords from extract_financial_keywords
+            periods: Period constraints from parse_periods (None for all periods)
+            limit: Maximum number of rows
+            ticker: Company ticker, used when company_id is None
+            metric_ids: Canonical metric ids resolved from the question
+
+        Returns:
+            SQLAlchemy select statement
+        """
+        # 4. Exact metric lookup, or a dynamic OR clause of keyword patterns
+        match, rank = self._match_clause(FinancialLineItem, keywords, metric_ids)
         
         # 5. Base query
         base_query = (
@@ -128,38 +105,229 @@ class SQLRetriever:
                 FinancialStatement.fiscal_year,
                 FinancialStatement.fiscal_quarter,
                 FinancialStatement.statement_type,
-                FinancialStatement.period_date
+                FinancialStatement.period_date,
+                rank
             )
             .join(FinancialStatement, FinancialLineItem.statement_id == FinancialStatement.id)
-            .where(
-                and_(
-                    FinancialStatement.company_id == company.id,
-                    or_(*conditions)
-                )
+            .where(match)
+        )
+        if company_id is not None:
+            base_query = base_query.where(FinancialStatement.company_id == company_id)
+        else:
+            base_query = (
+                base_query
+                .add_columns(Company.id.label("company_id"), Company.name.label("company_name"), Company.sector)
+                .join(Company, FinancialStatement.company_id == Company.id)
+                .where(Company.ticker == ticker)
             )
+
+        # 6. Only the requested periods (range predicates on idx_statements_company_type_date)
+        if periods is not None and not periods.is_empty:
+            base_query = base_query.where(self._period_clause(periods, company_id, ticker))
+        
+        # 7. Closest matches first, most recent first within equal similarity
+        if metric_ids:
+            return base_query.order_by(FinancialStatement.period_date.desc()).limit(limit)
+        return base_query.order_by(rank.desc(), FinancialStatement.period_date.desc()).limit(limit)
+
+    @staticmethod
+    def _period_clause(periods: PeriodQuery, company_id: Optional[int], ticker: Optional[str]):
+        """OR of the question's period constraints as period_type/period_date predicates"""
+        clauses = []
+        for constraint in periods.constraints:
+            parts = []
+            if constraint.period_type:
+                parts.append(FinancialStatement.period_type == constraint.period_type)
+            date_range = constraint.date_range()
+            if date_range:
+                parts.append(FinancialStatement.period_date >= date_range[0])
+                parts.append(FinancialStatement.period_date < date_range[1])
+            elif constraint.fiscal_quarter:
+                parts.append(FinancialStatement.fiscal_quarter == constraint.fiscal_quarter)
+            clauses.append(and_(*parts))
+
+        # "last N years/quarters": period_date on or after the company's Nth most recent period
+        for period_type, count in periods.latest.items():
+            recent = aliased(FinancialStatement)
+            company = company_id if company_id is not None else (
+                select(Company.id).where(Company.ticker == ticker).scalar_subquery()
+            )
+            cutoff = (
+                select(recent.period_date)
+                .where(recent.company_id == company, recent.period_type == period_type)
+                .distinct()
+                .order_by(recent.period_date.desc())
+                .offset(count - 1)
+                .limit(1)
+                .scalar_subquery()
+            )
+            clauses.append(and_(
+                FinancialStatement.period_type == period_type,
+                FinancialStatement.period_date >= func.coalesce(cutoff, date(1900, 1, 1))
+            ))
+        return or_(*clauses)
+
+    @staticmethod
+    def _match_clause(table, keywords: List[str], metric_ids: Optional[List[str]]):
+        """(where clause, rank column) selecting line items by metric id or keyword"""
+        if metric_ids:
+            return table.metric_id.in_(metric_ids), literal(1.0).label("rank")
+        match = or_(*[table.line_item_name.ilike(f"%{kw}%") for kw in keywords])
+        similarities = [func.word_similarity(kw, table.line_item_name) for kw in keywords]
+        rank = (func.greatest(*similarities) if len(similarities) > 1 else similarities[0]).label("rank")
+        return match, rank
+
+    def build_snapshot_query(self, company_id: Optional[int], keywords: List[str], limit: int = 200,
+                             ticker: Optional[str] = None, metric_ids: Optional[List[str]] = None) -> Select:
+        """
+        Build the latest-value lookup against latest_financial_snapshots.
+
+        The company's rows are a primary-key range (company_id, period_type,
+        line_item_name), at most one annual and one quarterly row per line
+        item, so no statement join or period sort over the history is needed.
+
+        Args:
+            company_id: Database id of the company (None to match on ticker)
+            keywords: Keywords from extract_financial_keywords
+            limit: Maximum number of rows
+            ticker: Company ticker, used when company_id is None
+            metric_ids: Canonical metric ids resolved from the question
+
+        Returns:
+            SQLAlchemy select statement
+        """
+        match, rank = self._match_clause(LatestFinancialSnapshot, keywords, metric_ids)
+        snapshot_query = (
+            select(
+                LatestFinancialSnapshot.line_item_name,
+                LatestFinancialSnapshot.line_item_value,
+                LatestFinancialSnapshot.period_type,
+                LatestFinancialSnapshot.fiscal_year,
+                LatestFinancialSnapshot.fiscal_quarter,
+                LatestFinancialSnapshot.statement_type,
+                LatestFinancialSnapshot.period_date,
+                rank
+            )
+            .where(match)
         )
+        if company_id is not None:
+            snapshot_query = snapshot_query.where(LatestFinancialSnapshot.company_id == company_id)
+        else:
+            snapshot_query = (
+                snapshot_query
+                .add_columns(Company.id.label("company_id"), Company.name.label("company_name"), Company.sector)
+                .join(Company, LatestFinancialSnapshot.company_id == Company.id)
+                .where(Company.ticker == ticker)
+            )
 
-        # 6. Apply Year Filter if detected
-        if target_year:
-            base_query = base_query.where(FinancialStatement.fiscal_year == target_year)
+        if metric_ids:
+            return snapshot_query.order_by(LatestFinancialSnapshot.period_date.desc()).limit(limit)
+        return snapshot_query.order_by(rank.desc(), LatestFinancialSnapshot.period_date.desc()).limit(limit)
+
+    async def retrieve_financial_data(self, ticker: str, query_text: str, limit: int = 200) -> List[Dict]:
+        """
+        Retrieve financial data from PostgreSQL based on ticker and query context.
+        Resolves metrics from the metric catalogue (keywords as a fallback).
+        "Latest value" questions read the snapshot table; everything else reads
+        the history from the in-memory financial cube (same matches and order
+        as the indexed history query, which is used when the cube is disabled).
         
-        # 7. Order by most recent first, limit results
-        stmt = base_query.order_by(FinancialStatement.period_date.desc()).limit(limit)
+        Args:
+            ticker: Company ticker symbol
+            query_text: Natural language query
+            limit: Maximum number of results
+            
+        Returns:
+            List of matching financial line items
+        """
+        
+        # 1. Resolve catalogued metrics in memory; keywords are the fallback for anything else
+        metric_ids = self.metric_catalog.match(query_text)
+        keywords = self.extract_financial_keywords(query_text)
+        
+        if not metric_ids and not keywords:
+            logger.warning(f"No metrics or keywords extracted from query: {query_text}")
+            return []
+        logger.debug(f"Resolved metrics for '{query_text}': {metric_ids}")
+
+        # Exact metric lookup first; keyword search if no metric is named or it has no rows
+        lookups = ([(metric_ids, [])] if metric_ids else []) + ([([], keywords)] if keywords else [])
+
+        # 2. Period constraints ("FY24", "Q2 FY24 vs Q2 FY23", "last 3 years", ...)
+        periods = parse_periods(query_text)
+        if not periods.is_empty:
+            logger.debug(f"Extracted periods from query: {periods}")
+        latest_only = periods.is_empty and not HISTORY_PATTERN.search(query_text)
+
+        # 3. Get Company ID from the in-process cache (joined on ticker below if not cached)
+        company = company_cache.get(ticker)
+        cache_generation = company_cache.generation
+        company_id = company.id if company else None
+
+        # 4. "Latest value" questions are served from the snapshot table (cube or not)
+        results = []
+        if latest_only:
+            for lookup_metrics, lookup_keywords in lookups:
+                stmt = self.build_snapshot_query(company_id, lookup_keywords, limit, ticker=ticker, metric_ids=lookup_metrics)
+                results = (await self.db.execute(stmt)).all()
+                if results:
+                    break
+
+        # 5. Anything else (or a company whose snapshot is not built yet) reads the
+        # history: from the in-memory cube when enabled (one query per ticker load)
+        if not results and financial_cube_cache.enabled:
+            cube = await financial_cube_cache.get(ticker)
+            if cube is None:
+                logger.warning(f"No financial data stored for {ticker}")
+                return []
+            rows = []
+            for lookup_metrics, lookup_keywords in lookups:
+                rows = cube.select(lookup_metrics, lookup_keywords, periods, limit)
+                if rows:
+                    break
+            data = [self._format_row(*row) for row in rows]
+            logger.info(f"Retrieved {len(data)} financial records for {ticker} from cube")
+            return data
+
+        # 6-7. Or from the indexed tables: metric lookup (or trigram keyword match), best matches first
+        if not results:
+            for lookup_metrics, lookup_keywords in lookups:
+                stmt = self.build_line_item_query(
+                    company_id, lookup_keywords, periods, limit,
+                    ticker=ticker, metric_ids=lookup_metrics
+                )
+                results = (await self.db.execute(stmt)).all()
+                if results:
+                    break
         
-        results = await self.db.execute(stmt)
+        if company is None and results:
+            first = results[0]
+            company_cache.put(
+                CompanyInfo(id=first.company_id, ticker=ticker, name=first.company_name, sector=first.sector),
+                cache_generation
+            )
         
         # 8. Format results
-        data = []
-        for row in results:
-            data.append({
-                "source": "sql",
-                "line_item": row.line_item_name,
-                "value": float(row.line_item_value),
-                "period": f"FY{row.fiscal_year} (Annual)" if row.period_type == "annual" else (
-                    f"FY{row.fiscal_year} Q{row.fiscal_quarter}" if row.fiscal_quarter else f"FY{row.fiscal_year}"
-                ),
-                "statement": row.statement_type
-            })
+        data = [
+            self._format_row(
+                row.line_item_name, row.line_item_value, row.period_type,
+                row.fiscal_year, row.fiscal_quarter, row.statement_type
+            )
+            for row in results
+        ]
         
         logger.info(f"Retrieved {len(data)} financial records for {ticker}")
         return data
+
+    @staticmethod
+    def _format_row(line_item: str, value, period_type: str, fiscal_year: int,
+                    fiscal_quarter: Optional[int], statement_type: str) -> Dict:
+        return {
+            "source": "sql",
+            "line_item": line_item,
+            "value": float(value),
+            "period": f"FY{fiscal_year} (Annual)" if period_type == "annual" else (
+                f"FY{fiscal_year} Q{fiscal_quarter}" if fiscal_quarter else f"FY{fiscal_year}"
+            ),
+            "statement": statement_type
+        }
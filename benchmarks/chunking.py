@@ -0,0 +1,162 @@
+"""
+Chunking strategy benchmark.
+
+Builds a synthetic company (3 statements x annual/quarterly periods x
+realistic Yahoo line items), chunks it with each strategy, embeds the chunks
+with EMBEDDING_MODEL and reports chunk count, embedding time, query latency
+and hit@k: whether a top-k chunk covers the (line item, statement, period)
+the question asks about.
+
+Usage:
+    python -m benchmarks.chunking --years 10 --quarters 8 --queries 100 --k 5
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime
+from typing import Dict, List
+
+import numpy as np
+
+from app.core.config import get_settings
+from app.core.numpy_store import NumpyVectorIndex
+from app.ingestion.chunking import FinancialChunker
+from app.ingestion.data_normalizer import LineItem, StandardizedFinancials
+
+TICKER = "BENCH.NS"
+
+LINE_ITEMS = {
+    "income_statement": [
+        "Total Revenue", "Operating Revenue", "Cost Of Revenue", "Gross Profit", "Operating Expense",
+        "Selling General And Administration", "Research And Development", "Operating Income",
+        "Interest Expense", "Interest Income", "Pretax Income", "Tax Provision", "Net Income",
+        "Net Income Common Stockholders", "Basic EPS", "Diluted EPS", "EBIT", "EBITDA",
+        "Normalized EBITDA", "Total Expenses", "Depreciation And Amortization In Income Statement",
+        "Other Income Expense", "Special Income Charges", "Tax Rate For Calcs", "Reconciled Depreciation",
+    ],
+    "balance_sheet": [
+        "Total Assets", "Current Assets", "Cash And Cash Equivalents", "Accounts Receivable", "Inventory",
+        "Other Current Assets", "Net PPE", "Goodwill", "Other Intangible Assets", "Investments And Advances",
+        "Total Liabilities Net Minority Interest", "Current Liabilities", "Accounts Payable", "Current Debt",
+        "Long Term Debt", "Total Debt", "Net Debt", "Stockholders Equity", "Retained Earnings",
+        "Common Stock", "Minority Interest", "Working Capital", "Invested Capital", "Tangible Book Value",
+        "Share Issued", "Ordinary Shares Number", "Total Capitalization", "Capital Lease Obligations",
+    ],
+    "cash_flow": [
+        "Operating Cash Flow", "Investing Cash Flow", "Financing Cash Flow", "Free Cash Flow",
+        "Capital Expenditure", "Depreciation And Amortization", "Change In Working Capital",
+        "Change In Receivables", "Change In Inventory", "Change In Payables And Accrued Expense",
+        "Cash Dividends Paid", "Repurchase Of Capital Stock", "Issuance Of Debt", "Repayment Of Debt",
+        "Purchase Of Investment", "Sale Of Investment", "Interest Paid Cfo", "Taxes Refund Paid",
+        "Beginning Cash Position", "End Cash Position", "Changes In Cash", "Stock Based Compensation",
+    ],
+}
+
+
+def synthetic_financials(years: int, quarters: int, seed: int = 11) -> List[StandardizedFinancials]:
+    rng = random.Random(seed)
+    financials = []
+    periods = [("annual", datetime(2025 - i, 3, 31)) for i in range(years)]
+    for i in range(quarters):
+        year, month = 2025 - (i // 4), [12, 9, 6, 3][i % 4]
+        periods.append(("quarterly", datetime(year, month, 28 if month != 12 else 31)))
+
+    for statement_type, names in LINE_ITEMS.items():
+        for period_type, period_date in periods:
+            items = [LineItem(name=name, value=round(rng.uniform(-5e9, 5e10), 2)) for name in names]
+            financials.append(StandardizedFinancials(
+                statement_type=statement_type,
+                period_type=period_type,
+                period_date=period_date,
+                fiscal_year=period_date.year,
+                fiscal_quarter=(period_date.month - 1) // 3 + 1,
+                line_items=items,
+                raw_data={}
+            ))
+    return financials
+
+
+def covers(metadata: Dict, target: Dict) -> bool:
+    """Does a retrieved chunk contain the target fact?"""
+    for field in ("statement_type", "period_type", "period_date"):
+        if metadata.get(field) != target[field]:
+            return False
+    if "line_item" in metadata:
+        return metadata["line_item"] == target["line_item"]
+    return any(name == target["line_item"] for name, _ in json.loads(metadata.get("line_items", "[]")))
+
+
+async def run_strategy(strategy: str, financials, embed, questions, k: int) -> Dict:
+    chunker = FinancialChunker(strategy=strategy)
+    chunks = list(chunker.iter_chunks(1, "Benchmark Industries", TICKER, financials))
+
+    began = time.perf_counter()
+    embeddings = []
+    for start in range(0, len(chunks), 128):
+        embeddings.extend(embed([text for _, text, _ in chunks[start:start + 128]]))
+    embed_seconds = time.perf_counter() - began
+
+    index = NumpyVectorIndex(tempfile.mkdtemp(prefix=f"chunk_{strategy}_"))
+    await index.add(TICKER, [c[0] for c in chunks], [c[1] for c in chunks], [c[2] for c in chunks], embeddings)
+
+    hits, latencies = 0, []
+    query_vectors = embed([question for question, _ in questions])
+    for (_, target), vector in zip(questions, query_vectors):
+        began = time.perf_counter()
+        results = await index.query(TICKER, "", vector, k, {})
+        latencies.append((time.perf_counter() - began) * 1000)
+        hits += any(covers(r["metadata"], target) for r in results)
+
+    return {
+        "strategy": strategy,
+        "chunks": len(chunks),
+        "embed_seconds": embed_seconds,
+        "query_p50_ms": float(np.percentile(latencies, 50)),
+        "hit_at_k": hits / len(questions),
+    }
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--years", type=int, default=10)
+    parser.add_argument("--quarters", type=int, default=8)
+    parser.add_argument("--queries", type=int, default=100)
+    parser.add_argument("--k", type=int, default=5)
+    args = parser.parse_args()
+
+    from chromadb.utils import embedding_functions
+    embed = embedding_functions.SentenceTransformerEmbeddingFunction(model_name=get_settings().EMBEDDING_MODEL)
+
+    financials = synthetic_financials(args.years, args.quarters)
+    rng = random.Random(3)
+    questions = []
+    for _ in range(args.queries):
+        fin = rng.choice(financials)
+        item = rng.choice(fin.line_items)
+        question = (f"What was {item.name} in the {fin.statement_type.replace('_', ' ')} "
+                    f"for the {fin.period_type} period ending {fin.period_date.strftime('%Y-%m-%d')}?")
+        questions.append((question, {
+            "statement_type": fin.statement_type,
+            "period_type": fin.period_type,
+            "period_date": fin.period_date.isoformat(),
+            "line_item": item.name,
+        }))
+
+    print(f"Statements: {len(financials)}  Line items: {sum(len(f.line_items) for f in financials)}  "
+          f"Queries: {args.queries}  k: {args.k}")
+    print(f"{'strategy':<10} {'chunks':>7} {'embed s':>8} {'query p50 ms':>13} {'hit@k':>6}")
+    for strategy in ("line_item", "period"):
+        report = await run_strategy(strategy, financials, embed, questions, args.k)
+        print(f"{strategy:<10} {report['chunks']:>7} {report['embed_seconds']:>8.2f} "
+              f"{report['query_p50_ms']:>13.3f} {report['hit_at_k']:>6.2f}")
+
+
+if __name__ == "__main__":
+    if sys.platform == "win32":
+        asyncio.set_event_loop_policy(asyncio.WindowsSelectorEventLoopPolicy())
+    asyncio.run(main())
@@ -0,0 +1,186 @@
+"""
+Line item search benchmark (PostgreSQL).
+
+Loads a few hundred synthetic companies into a scratch schema, then runs
+SQLRetriever's keyword query with and without the pg_trgm GIN index, and the
+catalogued metric_id lookup, reporting latency, rows returned and the access
+path EXPLAIN chose for financial_line_items.
+Needs DATABASE_URL to point at a PostgreSQL database where pg_trgm can be
+created; the scratch schema is dropped afterwards unless --keep is given.
+
+Usage:
+    python -m benchmarks.line_item_search --companies 300 --queries 200
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import sys
+import time
+from datetime import date
+from typing import Dict, List
+
+import numpy as np
+from sqlalchemy import insert, text
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from app.core.config import get_settings
+from app.core.database import Base
+from app.core.metric_catalog import metric_catalog
+from app.models.models import Company, FinancialStatement, FinancialLineItem
+from app.retrieval.sql_retriever import SQLRetriever
+from benchmarks.chunking import LINE_ITEMS
+
+SCHEMA = "line_item_bench"
+TRGM_INDEX = "idx_line_items_name_trgm"
+
+QUESTIONS = [
+    "What was the revenue in FY2023?",
+    "Show total debt for 2022",
+    "How much free cash flow did they generate?",
+    "What is the net income trend?",
+    "Report stockholders equity and total assets",
+    "What was capital expenditure in FY24?",
+    "Operating cash flow for 2021",
+    "What are the current liabilities?",
+]
+
+
+async def load(conn, companies: int, years: int, quarters: int, seed: int = 5):
+    """Insert synthetic companies, statements and line items"""
+    rng = random.Random(seed)
+    periods = [("annual", date(2025 - i, 3, 31), None) for i in range(years)]
+    for i in range(quarters):
+        year, month = 2025 - (i // 4), [12, 9, 6, 3][i % 4]
+        periods.append(("quarterly", date(year, month, 28), (month - 1) // 3 + 1))
+
+    await conn.execute(insert(Company), [
+        {"ticker": f"BENCH{n:04d}.NS", "name": f"Benchmark Company {n}"} for n in range(companies)
+    ])
+    company_ids = (await conn.execute(text("SELECT id FROM companies ORDER BY id"))).scalars().all()
+
+    await conn.execute(insert(FinancialStatement), [
+        {
+            "company_id": company_id,
+            "statement_type": statement_type,
+            "period_type": period_type,
+            "period_date": period_date,
+            "fiscal_year": period_date.year,
+            "fiscal_quarter": quarter,
+            "source": "benchmark",
+        }
+        for company_id in company_ids
+        for statement_type in LINE_ITEMS
+        for period_type, period_date, quarter in periods
+    ])
+    statements = (await conn.execute(text("SELECT id, statement_type FROM financial_statements"))).all()
+
+    rows = [
+        {
+            "statement_id": statement_id,
+            "line_item_name": name,
+            "line_item_value": round(rng.uniform(-5e9, 5e10), 2),
+            "metric_id": metric_catalog.metric_for_line_item(name),
+        }
+        for statement_id, statement_type in statements
+        for name in LINE_ITEMS[statement_type]
+    ]
+    for start in range(0, len(rows), 10000):
+        await conn.execute(insert(FinancialLineItem), rows[start:start + 10000])
+    await conn.execute(text("ANALYZE"))
+    return company_ids, len(rows)
+
+
+def line_item_access(plan: Dict) -> List[str]:
+    """Plan node types that read financial_line_items"""
+    found = []
+    if plan.get("Relation Name") == "financial_line_items" or plan.get("Index Name", "").startswith("idx_line_items"):
+        found.append(f"{plan['Node Type']}" + (f" ({plan['Index Name']})" if "Index Name" in plan else ""))
+    for child in plan.get("Plans", []):
+        found.extend(line_item_access(child))
+    return found
+
+
+async def run_mode(conn, mode: str, company_ids: List[int], queries: int) -> Dict:
+    retriever = SQLRetriever(None)
+    rng = random.Random(9)
+    latencies, rows, access = [], [], set()
+    for _ in range(queries):
+        question = rng.choice(QUESTIONS)
+        if mode == "metric":
+            stmt = retriever.build_line_item_query(
+                rng.choice(company_ids), [], limit=30, metric_ids=metric_catalog.match(question)
+            )
+        else:
+            stmt = retriever.build_line_item_query(
+                rng.choice(company_ids), retriever.extract_financial_keywords(question), limit=30
+            )
+
+        began = time.perf_counter()
+        result = await conn.execute(stmt)
+        latencies.append((time.perf_counter() - began) * 1000)
+        rows.append(len(result.all()))
+
+        compiled = stmt.compile(dialect=conn.dialect)
+        plan = (await conn.exec_driver_sql(f"EXPLAIN (FORMAT JSON) {compiled}", compiled.params)).scalar()
+        plan = json.loads(plan) if isinstance(plan, str) else plan
+        access.update(line_item_access(plan[0]["Plan"]))
+
+    return {
+        "mode": mode,
+        "p50_ms": float(np.percentile(latencies, 50)),
+        "p95_ms": float(np.percentile(latencies, 95)),
+        "avg_rows": float(np.mean(rows)),
+        "access": ", ".join(sorted(access)),
+    }
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--companies", type=int, default=300)
+    parser.add_argument("--years", type=int, default=10)
+    parser.add_argument("--quarters", type=int, default=8)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--keep", action="store_true", help="Keep the scratch schema afterwards")
+    args = parser.parse_args()
+
+    engine = create_async_engine(
+        get_settings().DATABASE_URL,
+        connect_args={"options": f"-csearch_path={SCHEMA},public"}
+    )
+    try:
+        async with engine.begin() as conn:
+            # Keep the extension in public so dropping the scratch schema leaves it alone
+            await conn.execute(text("CREATE EXTENSION IF NOT EXISTS pg_trgm SCHEMA public"))
+            await conn.execute(text(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE"))
+            await conn.execute(text(f"CREATE SCHEMA {SCHEMA}"))
+            await conn.run_sync(Base.metadata.create_all)
+            company_ids, line_items = await load(conn, args.companies, args.years, args.quarters)
+
+        print(f"Companies: {args.companies}  Line items: {line_items}  Queries: {args.queries}")
+        print(f"{'mode':<8} {'p50 ms':>8} {'p95 ms':>8} {'rows':>6}  line item access path")
+        for mode in ("btree", "trigram", "metric"):
+            async with engine.begin() as conn:
+                if mode == "btree":
+                    await conn.execute(text(f"DROP INDEX IF EXISTS {TRGM_INDEX}"))
+                elif mode == "trigram":
+                    await conn.execute(text(
+                        f"CREATE INDEX IF NOT EXISTS {TRGM_INDEX} "
+                        f"ON financial_line_items USING gin (line_item_name gin_trgm_ops)"
+                    ))
+                await conn.execute(text("ANALYZE financial_line_items"))
+                report = await run_mode(conn, mode, company_ids, args.queries)
+            print(f"{mode:<8} {report['p50_ms']:>8.3f} {report['p95_ms']:>8.3f} "
+                  f"{report['avg_rows']:>6.1f}  {report['access']}")
+    finally:
+        if not args.keep:
+            async with engine.begin() as conn:
+                await conn.execute(text(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE"))
+        await engine.dispose()
+
+
+if __name__ == "__main__":
+    if sys.platform == "win32":
+        asyncio.set_event_loop_policy(asyncio.WindowsSelectorEventLoopPolicy())
+    asyncio.run(main())
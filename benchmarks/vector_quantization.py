@@ -0,0 +1,110 @@
+"""
+Quantized vector storage benchmark.
+
+Builds the NumPy vector index once per storage mode (float32 baseline,
+float16, int8) over the same embeddings and reports resident memory, query
+latency and recall@k against the exact float32 results.
+
+Usage:
+    python -m benchmarks.vector_quantization --chunks 20000 --queries 200 --k 5
+    python -m benchmarks.vector_quantization --real   # encode text with EMBEDDING_MODEL
+"""
+
+import argparse
+import asyncio
+import sys
+import tempfile
+import time
+from typing import Dict, List
+
+import numpy as np
+
+from app.core.config import get_settings
+from app.core.numpy_store import NumpyVectorIndex
+
+TICKER = "BENCH.NS"
+
+
+def synthetic_embeddings(n: int, dim: int, seed: int = 7) -> np.ndarray:
+    """Clustered unit vectors, roughly shaped like sentence embeddings of line items"""
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(max(n // 50, 1), dim)).astype(np.float32)
+    labels = rng.integers(0, centers.shape[0], size=n)
+    vectors = centers[labels] + 0.35 * rng.normal(size=(n, dim)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def real_embeddings(n: int) -> List[np.ndarray]:
+    """Encode line-item style texts with the configured embedding model"""
+    from chromadb.utils import embedding_functions
+    embed = embedding_functions.SentenceTransformerEmbeddingFunction(model_name=get_settings().EMBEDDING_MODEL)
+    items = ["Total Revenue", "Net Income", "Total Assets", "Operating Cash Flow", "Total Debt",
+             "Cost Of Revenue", "Gross Profit", "Capital Expenditure", "Stockholders Equity", "EBITDA"]
+    texts = [
+        f"Statement: income_statement\nPeriod: {2015 + i % 10}-03-31\nLine Item: {items[i % len(items)]} {i}\nValue: {i * 1000:,.2f}"
+        for i in range(n)
+    ]
+    return np.asarray(embed(texts), dtype=np.float32)
+
+
+async def run_mode(mode: str, vectors: np.ndarray, queries: np.ndarray, k: int, rescore_factor: int) -> Dict:
+    index = NumpyVectorIndex(tempfile.mkdtemp(prefix=f"vq_{mode}_"), quantization=mode, rescore_factor=rescore_factor)
+    ids = [f"chunk-{i}" for i in range(len(vectors))]
+    metadatas = [{"ticker": TICKER} for _ in ids]
+    for start in range(0, len(vectors), 1000):
+        end = start + 1000
+        await index.add(TICKER, ids[start:end], ids[start:end], metadatas[start:end], vectors[start:end])
+
+    latencies, results = [], []
+    for query in queries:
+        began = time.perf_counter()
+        hits = await index.query(TICKER, "", query, k, {})
+        latencies.append((time.perf_counter() - began) * 1000)
+        results.append([hit["text"] for hit in hits])
+
+    return {
+        "mode": mode,
+        "resident_bytes": index.resident_bytes(),
+        "p50_ms": float(np.percentile(latencies, 50)),
+        "p95_ms": float(np.percentile(latencies, 95)),
+        "results": results,
+    }
+
+
+def recall_at_k(baseline: List[List[str]], candidate: List[List[str]]) -> float:
+    overlaps = [len(set(b) & set(c)) / max(len(b), 1) for b, c in zip(baseline, candidate)]
+    return float(np.mean(overlaps))
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--chunks", type=int, default=20000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--rescore-factor", type=int, default=get_settings().VECTOR_RESCORE_FACTOR)
+    parser.add_argument("--real", action="store_true", help="Encode texts with the embedding model instead of synthetic vectors")
+    args = parser.parse_args()
+
+    if args.real:
+        data = real_embeddings(args.chunks + args.queries)
+    else:
+        data = synthetic_embeddings(args.chunks + args.queries, args.dim)
+    vectors, queries = data[:args.chunks], data[args.chunks:]
+
+    print(f"Chunks: {args.chunks}  Queries: {args.queries}  Dim: {vectors.shape[1]}  k: {args.k}  "
+          f"Rescore factor: {args.rescore_factor}")
+    print(f"{'mode':<8} {'resident MB':>12} {'p50 ms':>8} {'p95 ms':>8} {'recall@k':>9}")
+
+    baseline = None
+    for mode in ("none", "float16", "int8"):
+        report = await run_mode(mode, vectors, queries, args.k, args.rescore_factor)
+        baseline = baseline or report["results"]
+        print(f"{mode:<8} {report['resident_bytes'] / 1e6:>12.2f} {report['p50_ms']:>8.3f} "
+              f"{report['p95_ms']:>8.3f} {recall_at_k(baseline, report['results']):>9.4f}")
+
+
+if __name__ == "__main__":
+    if sys.platform == "win32":
+        asyncio.set_event_loop_policy(asyncio.WindowsSelectorEventLoopPolicy())
+    asyncio.run(main())
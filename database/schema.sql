@@ -1,3 +1,6 @@
+-- Trigram matching for line item search
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+
 -- Companies master table
 CREATE TABLE IF NOT EXISTS companies (
     id SERIAL PRIMARY KEY,
@@ -30,13 +33,39 @@ CREATE TABLE IF NOT EXISTS financial_line_items (
     statement_id INTEGER REFERENCES financial_statements(id) ON DELETE CASCADE,
     line_item_name VARCHAR(255) NOT NULL,
     line_item_value NUMERIC(20, 2),
+    metric_id VARCHAR(50),               -- canonical metric id (app/core/metric_catalog.py)
     currency VARCHAR(10) DEFAULT 'INR',
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
     UNIQUE(statement_id, line_item_name)
 );
 
+-- Latest annual/quarterly value per line item (refreshed at the end of each ingestion)
+CREATE TABLE IF NOT EXISTS latest_financial_snapshots (
+    company_id INTEGER REFERENCES companies(id) ON DELETE CASCADE,
+    period_type VARCHAR(20) NOT NULL,
+    line_item_name VARCHAR(255) NOT NULL,
+    metric_id VARCHAR(50),
+    line_item_value NUMERIC(20, 2),
+    statement_type VARCHAR(50) NOT NULL,
+    period_date DATE NOT NULL,
+    fiscal_year INTEGER,
+    fiscal_quarter INTEGER,
+    refreshed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (company_id, period_type, line_item_name)
+);
+
+-- One-time data migrations run at startup (e.g. the metric_id backfill), keyed by version
+CREATE TABLE IF NOT EXISTS schema_migrations (
+    name VARCHAR(100) PRIMARY KEY,
+    version VARCHAR(64) NOT NULL,
+    applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
 -- Indexes for performance
 CREATE INDEX IF NOT EXISTS idx_companies_ticker ON companies(ticker);
 CREATE INDEX IF NOT EXISTS idx_statements_company_period ON financial_statements(company_id, period_date DESC);
+CREATE INDEX IF NOT EXISTS idx_statements_company_type_date ON financial_statements(company_id, period_type, period_date);
 CREATE INDEX IF NOT EXISTS idx_line_items_statement ON financial_line_items(statement_id);
 CREATE INDEX IF NOT EXISTS idx_line_items_name ON financial_line_items(line_item_name);
+CREATE INDEX IF NOT EXISTS idx_line_items_name_trgm ON financial_line_items USING gin (line_item_name gin_trgm_ops);
+CREATE INDEX IF NOT EXISTS idx_line_items_statement_metric ON financial_line_items(statement_id, metric_id);
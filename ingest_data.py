@@ -25,6 +25,8 @@ async def main():
                 print(f"Company: {result.get('company')}")
                 print(f"Statements Ingested: {result.get('statements')}")
                 print(f"Chunks Created: {result.get('chunks')}")
+                print(f"Chunks Added/Skipped/Removed: {result.get('chunks_added')}/"
+                      f"{result.get('chunks_skipped')}/{result.get('chunks_removed')}")
                 
             await db.commit()
             print("Transaction Committed.")
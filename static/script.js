@@ -51,6 +51,59 @@ function appendMessage(role, text, isLoading = false) {
 
     // Scroll to bottom
     messagesContainer.scrollTop = messagesContainer.scrollHeight;
+    return bubble;
+}
+
+// Parse one Server-Sent Events frame ("event: x\ndata: {...}")
+function parseSseFrame(frame) {
+    let event = 'message';
+    const dataLines = [];
+    for (const line of frame.split('\n')) {
+        if (line.startsWith('event:')) event = line.slice(6).trim();
+        else if (line.startsWith('data:')) dataLines.push(line.slice(5).trim());
+    }
+    return { event, data: dataLines.length ? JSON.parse(dataLines.join('\n')) : null };
+}
+
+// Read the /query/stream response, re-rendering the answer as tokens arrive
+async function renderAnswerStream(res) {
+    const reader = res.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = '';
+    let answer = '';
+    let bubble = null;
+
+    while (true) {
+        const { value, done } = await reader.read();
+        if (done) break;
+        buffer += decoder.decode(value, { stream: true });
+
+        let boundary;
+        while ((boundary = buffer.indexOf('\n\n')) !== -1) {
+            const { event, data } = parseSseFrame(buffer.slice(0, boundary));
+            buffer = buffer.slice(boundary + 2);
+
+            if (event === 'token') {
+                if (!bubble) {
+                    const loadingMsg = document.getElementById('loading-msg');
+                    if (loadingMsg) loadingMsg.remove();
+                    bubble = appendMessage('ai', '');
+                }
+                answer += data.text;
+                bubble.innerHTML = marked.parse(answer);
+                messagesContainer.scrollTop = messagesContainer.scrollHeight;
+            } else if (event === 'error') {
+                answer += `\n\n**Error**: ${data.detail}`;
+                if (bubble) bubble.innerHTML = marked.parse(answer);
+                else bubble = appendMessage('ai', answer);
+            }
+            // 'metadata' (query type, sources) and 'done' (timings) are available here if needed
+        }
+    }
+
+    const loadingMsg = document.getElementById('loading-msg');
+    if (loadingMsg) loadingMsg.remove();
+    if (!bubble) appendMessage('ai', '**Error**: The answer stream ended without a response.');
 }
 
 async function ingestCompany() {
@@ -96,21 +149,19 @@ async function sendQuery() {
     appendMessage('ai', '', true); // Loading state
 
     try {
-        const res = await fetch(`${API_BASE}/query/`, {
+        const res = await fetch(`${API_BASE}/query/stream`, {
             method: 'POST',
             headers: { 'Content-Type': 'application/json' },
             body: JSON.stringify({ query: text, ticker: ticker })
         });
 
-        const data = await res.json();
-        const loadingMsg = document.getElementById('loading-msg');
-        if (loadingMsg) loadingMsg.remove();
-
         if (res.ok) {
-            // Display Answer
-            // We can also display classification info if desired (data.query_type)
-            appendMessage('ai', data.answer);
+            // Tokens are rendered as they arrive
+            await renderAnswerStream(res);
         } else {
+            const data = await res.json();
+            const loadingMsg = document.getElementById('loading-msg');
+            if (loadingMsg) loadingMsg.remove();
             appendMessage('ai', `**Error**: ${data.detail || 'Something went wrong.'}`);
         }
     } catch (e) {
@@ -0,0 +1,52 @@
+from datetime import date
+from types import SimpleNamespace
+
+import pytest
+
+from app.retrieval.financial_cube import FinancialCube, word_similarity
+from app.retrieval.period_parser import parse_periods
+
+
+def row(name, value, period_date, period_type="annual", statement_type="income_statement", metric_id=None):
+    return SimpleNamespace(
+        line_item_name=name, line_item_value=value, metric_id=metric_id,
+        period_date=period_date, period_type=period_type, statement_type=statement_type,
+        fiscal_year=period_date.year, fiscal_quarter=(period_date.month - 1) // 3 + 1 if period_type == "quarterly" else None
+    )
+
+
+CUBE = FinancialCube(1, [
+    row("Total Revenue", 100, date(2023, 3, 31), metric_id="total_revenue"),
+    row("Total Revenue", 120, date(2024, 3, 31), metric_id="total_revenue"),
+    row("Operating Revenue", 90, date(2024, 3, 31), metric_id="total_revenue"),
+    row("Revenues Per Share", 5, date(2024, 3, 31)),
+    row("Total Revenue", 30, date(2024, 6, 30), period_type="quarterly", metric_id="total_revenue"),
+    row(None, None, date(2025, 3, 31), statement_type="balance_sheet"),
+])
+
+
+def test_word_similarity_matches_pg_trgm():
+    # Example from the pg_trgm documentation
+    assert word_similarity("word", "two words") == pytest.approx(0.8)
+    assert word_similarity("revenue", "Total Revenue") == 1.0
+    assert word_similarity("revenues", "Total Revenue") == pytest.approx(7 / 9)
+    assert word_similarity("debt", "Total Revenue") == 0.0
+
+
+def test_keyword_rows_ranked_by_similarity_then_newest():
+    rows = CUBE.select([], ["revenue"])
+    assert [(r[0], r[1]) for r in rows] == [
+        ("Total Revenue", 30.0), ("Operating Revenue", 90.0), ("Total Revenue", 120.0), ("Total Revenue", 100.0),
+        ("Revenues Per Share", 5.0),  # word_similarity 0.875
+    ]
+    # ILIKE semantics: substring, case-insensitive, "_" is a wildcard
+    assert {r[0] for r in CUBE.select([], ["per_share"])} == {"Revenues Per Share"}
+    assert CUBE.select([], ["revenues net"]) == []
+
+
+def test_metric_rows_newest_first_with_period_filters():
+    rows = CUBE.select(["total_revenue"], [], parse_periods("revenue in FY2024"))
+    assert [(r[1], r[2]) for r in rows] == [(30.0, "quarterly"), (90.0, "annual"), (120.0, "annual")]
+    # The newest annual statement has no line items but still counts as a period
+    assert CUBE.select(["total_revenue"], [], parse_periods("revenue over the last 1 years")) == []
+    assert [r[1] for r in CUBE.select(["total_revenue"], [], parse_periods("revenue over the last 2 years"))] == [90.0, 120.0]
@@ -0,0 +1,52 @@
+from datetime import date
+
+from app.retrieval.period_parser import PeriodConstraint, parse_periods
+
+
+def test_quarter_comparison():
+    periods = parse_periods("Revenue Q2 FY24 vs Q2 FY23")
+    assert periods.constraints == [
+        PeriodConstraint(fiscal_year=2024, fiscal_quarter=2, period_type="quarterly"),
+        PeriodConstraint(fiscal_year=2023, fiscal_quarter=2, period_type="quarterly"),
+    ]
+    assert periods.latest == {}
+
+
+def test_last_n_years():
+    periods = parse_periods("Net income for the last 3 years")
+    assert periods.constraints == []
+    assert periods.latest == {"annual": 3}
+
+
+def test_zero_window_is_ignored():
+    periods = parse_periods("Net income for the last 0 years")
+    assert periods.latest == {}
+    assert periods.is_empty
+
+
+def test_trailing_quarters_in_words():
+    periods = parse_periods("Revenue over the trailing four quarters")
+    assert periods.constraints == []
+    assert periods.latest == {"quarterly": 4}
+
+
+def test_year_range_is_inclusive():
+    periods = parse_periods("Profit 2021-2023")
+    assert [c.fiscal_year for c in periods.constraints] == [2021, 2022, 2023]
+    assert all(c.fiscal_quarter is None and c.period_type is None for c in periods.constraints)
+
+
+def test_single_fiscal_year_and_annual_hint():
+    assert parse_periods("Total assets in FY2024").constraints == [PeriodConstraint(fiscal_year=2024)]
+    assert parse_periods("Annual revenue 2023").constraints == [PeriodConstraint(fiscal_year=2023, period_type="annual")]
+
+
+def test_question_without_periods():
+    assert parse_periods("What does the company do?").is_empty
+
+
+def test_constraint_date_ranges():
+    assert PeriodConstraint(fiscal_year=2024).date_range() == (date(2024, 1, 1), date(2025, 1, 1))
+    assert PeriodConstraint(fiscal_year=2024, fiscal_quarter=2).date_range() == (date(2024, 4, 1), date(2024, 7, 1))
+    assert PeriodConstraint(fiscal_year=2024, fiscal_quarter=4).date_range() == (date(2024, 10, 1), date(2025, 1, 1))
+    assert PeriodConstraint(fiscal_quarter=3).date_range() is None
@@ -0,0 +1,34 @@
+import pytest
+
+from app.retrieval.query_classifier import LocalQueryClassifier, QueryType
+
+classifier = LocalQueryClassifier()
+
+
+@pytest.mark.parametrize("query", [
+    "What is the dividend policy?",
+    "What is the capex plan?",
+    "What is the company's approach to debt?",
+    "What are the revenue targets?",
+    "What is the debt strategy?",
+    "Revenue guidance for FY2025",
+])
+def test_qualitative_question_about_a_metric_defers_to_llm(query):
+    assert classifier.classify(query) is None
+
+
+@pytest.mark.parametrize("query", [
+    "What is total revenue in FY2024?",
+    "How much cash does the company have?",
+    "What was the operating margin in Q2 FY24?",
+])
+def test_numeric_questions_decided_locally(query):
+    assert classifier.classify(query) == QueryType.NUMERIC
+
+
+@pytest.mark.parametrize("query", [
+    "Who is the CEO?",
+    "Describe the company's ESG practices",
+])
+def test_qualitative_questions_decided_locally(query):
+    assert classifier.classify(query) == QueryType.FACTUAL
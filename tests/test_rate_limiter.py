@@ -0,0 +1,129 @@
+import asyncio
+
+import pytest
+
+from app.core.deadline import Deadline, DeadlineExceeded
+from app.llm.rate_limiter import Priority, RateLimiter
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+    def advance(self, seconds: float):
+        self.now += seconds
+
+
+def make_limiter(clock: FakeClock, requests_per_minute: int = 60, tokens_per_minute: int = 6000) -> RateLimiter:
+    return RateLimiter("test", requests_per_minute=requests_per_minute, tokens_per_minute=tokens_per_minute, clock=clock)
+
+
+@pytest.mark.asyncio
+async def test_reserve_within_budget_is_immediate():
+    limiter = make_limiter(FakeClock())
+    await limiter.acquire(1000)
+    stats = limiter.get_stats()
+    assert stats["requests_available"] == 59
+    assert stats["tokens_available"] == 5000
+    assert stats["admitted"]["interactive"] == 1
+    assert stats["queue_depth"] == 0
+
+
+@pytest.mark.asyncio
+async def test_settle_and_refund_correct_the_reservation():
+    limiter = make_limiter(FakeClock())
+    await limiter.acquire(1000)
+    limiter.settle(1000, 400)
+    assert limiter.get_stats()["tokens_available"] == 5600
+    # Unknown usage keeps the estimate
+    limiter.settle(1000, None)
+    assert limiter.get_stats()["tokens_available"] == 5600
+
+    await limiter.acquire(1000)
+    limiter.refund(1000)
+    assert limiter.get_stats()["tokens_available"] == 5600
+    # Never above capacity
+    limiter.settle(1000, 1)
+    assert limiter.get_stats()["tokens_available"] == 6000
+
+
+@pytest.mark.asyncio
+async def test_budget_refills_continuously_up_to_capacity():
+    clock = FakeClock()
+    limiter = make_limiter(clock)
+    await limiter.acquire(6000)
+    assert limiter.get_stats()["tokens_available"] == 0
+
+    clock.advance(30)
+    assert limiter.get_stats()["tokens_available"] == 3000
+
+    clock.advance(600)
+    stats = limiter.get_stats()
+    assert stats["tokens_available"] == 6000
+    assert stats["requests_available"] == 60
+
+
+@pytest.mark.asyncio
+async def test_rate_limited_response_holds_calls_until_refill():
+    clock = FakeClock()
+    # 1000 tokens/s: the dispatcher re-checks the (fake) clock every few milliseconds
+    limiter = make_limiter(clock, requests_per_minute=60000, tokens_per_minute=60000)
+    limiter.on_rate_limited()
+    stats = limiter.get_stats()
+    assert stats["requests_available"] == 0 and stats["tokens_available"] == 0
+    assert stats["rate_limited_responses"] == 1
+
+    call = asyncio.create_task(limiter.acquire(10))
+    await asyncio.sleep(0.05)
+    assert not call.done()
+    assert limiter.get_stats()["queue_depth"] == 1
+
+    clock.advance(0.02)
+    await asyncio.wait_for(call, 1)
+    stats = limiter.get_stats()
+    assert stats["queue_depth"] == 0
+    assert stats["wait"]["interactive"]["max_ms"] == pytest.approx(20)
+
+
+@pytest.mark.asyncio
+async def test_interactive_admitted_before_background():
+    clock = FakeClock()
+    limiter = make_limiter(clock, requests_per_minute=60000, tokens_per_minute=60000)
+    order = []
+
+    async def call(priority: Priority, name: str):
+        await limiter.acquire(10, priority)
+        order.append(name)
+
+    limiter.on_rate_limited()
+    calls = [asyncio.create_task(call(Priority.BACKGROUND, "background")),
+             asyncio.create_task(call(Priority.INTERACTIVE, "interactive"))]
+    await asyncio.sleep(0)
+    clock.advance(1)
+    await asyncio.wait_for(asyncio.gather(*calls), 1)
+
+    assert order == ["interactive", "background"]
+    assert limiter.get_stats()["admitted"] == {"interactive": 1, "background": 1}
+
+
+@pytest.mark.asyncio
+async def test_queue_wait_bounded_by_deadline():
+    limiter = make_limiter(FakeClock())
+    limiter.on_rate_limited()
+    with pytest.raises(DeadlineExceeded):
+        await limiter.acquire(600, deadline=Deadline.after_ms(10))
+    stats = limiter.get_stats()
+    assert stats["timeouts"] == 1
+    assert stats["queue_depth"] == 0
+
+
+@pytest.mark.asyncio
+async def test_disabled_limiter_admits_everything():
+    limiter = RateLimiter("test", requests_per_minute=0, tokens_per_minute=0, clock=FakeClock())
+    await limiter.acquire(10 ** 9)
+    stats = limiter.get_stats()
+    assert not stats["enabled"]
+    assert stats["admitted"]["interactive"] == 0